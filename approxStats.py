@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+import math
+import zlib
+import collections
+import numpy as np
+
+DEFAULT_ERROR = 0.01
+CONFIDENCE = 0.95
+# Reservoir positions drawn per numpy call, and a cap on one gap so the
+# positions cannot overflow however small the acceptance probability gets.
+PLAN_BATCH = 1024
+MAX_GAP = 2 ** 40
+
+def sample_size(error=DEFAULT_ERROR, confidence=CONFIDENCE):
+    """
+    Sample size for which the sample's distribution (shares, quantile ranks) is
+    within error of the population's with the given confidence, from the
+    Dvoretzky-Kiefer-Wolfowitz inequality. 0.01 at 95% needs 18445 items.
+    """
+    return math.ceil(math.log(2 / (1 - confidence)) / (2 * error ** 2))
+
+# -------------------------
+# Reservoir Sampling
+# -------------------------
+class Reservoir:
+    """
+    Uniform sample of at most size items from a stream (Algorithm L). The
+    positions of the items that enter the sample are drawn up front, in
+    numpy batches, so extend() on a list only reads the items it keeps:
+    O(size * log(n / size)) instead of O(n).
+    """
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.items = []
+        self.seen = 0
+        if isinstance(seed, str):
+            seed = zlib.crc32(seed.encode())
+        self._rng = np.random.default_rng(seed)
+        self._log_w = 0.0
+        self._last = size - 1
+        self._positions = np.zeros(0, dtype=np.int64)
+        self._slots = np.zeros(0, dtype=np.int64)
+        self._cursor = 0
+
+    def _uniform(self, n):
+        # 1 - random() is in (0, 1], so the logs are defined.
+        return 1.0 - self._rng.random(n)
+
+    def _plan(self):
+        """Draw the next PLAN_BATCH stream positions that replace a sample slot."""
+        log_w = self._log_w + np.cumsum(np.log(self._uniform(PLAN_BATCH)) / self.size)
+        with np.errstate(divide="ignore"):
+            gaps = np.floor(np.log(self._uniform(PLAN_BATCH)) / np.log1p(-np.exp(log_w))) + 1
+        self._positions = self._last + np.cumsum(np.minimum(gaps, MAX_GAP).astype(np.int64))
+        self._slots = self._rng.integers(0, self.size, PLAN_BATCH)
+        self._cursor = 0
+        self._log_w = float(log_w[-1])
+        self._last = int(self._positions[-1])
+
+    def extend(self, sequence):
+        """Feed the next len(sequence) items of the stream; sequence must support indexing."""
+        start = self.seen
+        end = start + len(sequence)
+        fill = min(end, self.size)
+        if start < fill:
+            self.items.extend(sequence[:fill - start])
+        while len(self.items) == self.size:
+            if self._cursor == len(self._positions):
+                self._plan()
+            stop = int(np.searchsorted(self._positions, end))
+            for position, slot in zip(self._positions[self._cursor:stop].tolist(), self._slots[self._cursor:stop].tolist()):
+                self.items[slot] = sequence[position - start]
+            if stop < len(self._positions):
+                self._cursor = stop
+                break
+            self._cursor = stop
+        self.seen = end
+
+    def add(self, item):
+        self.extend([item])
+
+# -------------------------
+# Quantile Sketch
+# -------------------------
+class QuantileSketch:
+    """
+    Relative-error quantile sketch (DDSketch) for non-negative values: every
+    quantile it returns is within relative_error of the true value of that
+    rank. Values fall into logarithmic bins, so sketches built with the same
+    error merge exactly by adding their bin counts.
+    """
+
+    def __init__(self, relative_error=DEFAULT_ERROR):
+        self.relative_error = relative_error
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = collections.Counter()
+        self.zeros = 0.0
+        self.count = 0.0
+
+    def add_array(self, values, weight=1.0):
+        """Add the non-NaN values, each counting weight times (a sample scaled up to its population)."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        positive = values[values > 0]
+        self.zeros += (values.size - positive.size) * weight
+        if positive.size:
+            indexes, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True)
+            for index, count in zip(indexes.tolist(), counts.tolist()):
+                self.bins[index] += count * weight
+        self.count += values.size * weight
+
+    def merge(self, other):
+        if other.relative_error != self.relative_error:
+            raise ValueError("Only sketches with the same relative error can be merged")
+        self.bins.update(other.bins)
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen >= rank:
+                # Midpoint of the bin (gamma^(i-1), gamma^i] in relative terms.
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Bytes-over-wire and decode-time comparison per endpoint on recorded payloads.
+
+Payloads are the raw responses saved by the report scripts with the "on"
+argument (outputs/<org>/json/*.json). For each endpoint it reports the
+uncompressed body size, the gzip (and brotli, when installed) size, and the
+decode time with the stdlib json module and with orjson (when installed).
+
+requests already asks for gzip on every call, so gzip is the baseline wire
+size; the API layer only changes it when brotli is installed, by br_vs_gzip_pct.
+
+Usage: python benchmarks/apiPayloadBenchmark.py [payload dir ...] [--repeat N]
+"""
+import os
+import re
+import sys
+import glob
+import gzip
+import json
+import time
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# File names are <endpoint>_<cluster id>[_<month>].json; a few org-level ones have no id.
+CLUSTER_ID_SUFFIX = re.compile(r"_[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}.*$")
+
+def endpoint_of(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return CLUSTER_ID_SUFFIX.sub("", stem)
+
+def time_decode(loads, body, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        loads(body)
+    return (time.perf_counter() - start) / repeat * 1000
+
+def benchmark_payload(path, repeat):
+    with open(path, "rb") as f:
+        data = json.loads(f.read())
+    # Saved files are pretty printed; the API sends compact JSON.
+    body = json.dumps(data, separators=(",", ":")).encode()
+    row = {
+        "endpoint": endpoint_of(path),
+        "raw_bytes": len(body),
+        "gzip_bytes": len(gzip.compress(body, compresslevel=6)),
+        "br_bytes": len(brotli.compress(body, quality=5)) if brotli else None,
+        "stdlib_ms": time_decode(json.loads, body, repeat),
+        "orjson_ms": time_decode(orjson.loads, body, repeat) if orjson else None,
+    }
+    return row
+
+def main():
+    args = sys.argv[1:]
+    repeat = 20
+    if "--repeat" in args:
+        i = args.index("--repeat")
+        repeat = int(args[i + 1])
+        del args[i:i + 2]
+    dirs = args or glob.glob(os.path.join("outputs", "*", "json"))
+    paths = [p for d in dirs for p in glob.glob(os.path.join(d, "*.json"))]
+    if not paths:
+        print("No recorded payloads found. Run a report with the 'on' argument first.", flush=True)
+        sys.exit(1)
+
+    rows = []
+    for path in paths:
+        try:
+            rows.append(benchmark_payload(path, repeat))
+        except ValueError as e:
+            print(f"Skipping {path}: {e}", flush=True)
+    df = pd.DataFrame(rows)
+    summary = df.groupby("endpoint").agg(
+        payloads=("raw_bytes", "size"),
+        raw_bytes=("raw_bytes", "sum"),
+        gzip_bytes=("gzip_bytes", "sum"),
+        br_bytes=("br_bytes", "sum"),
+        stdlib_ms=("stdlib_ms", "sum"),
+        orjson_ms=("orjson_ms", "sum"),
+    )
+    # gzip is the default of any requests client: shown for reference, not a gain.
+    summary["gzip_saving_pct"] = (100 - summary["gzip_bytes"] / summary["raw_bytes"] * 100).round(1)
+    if brotli:
+        summary["br_vs_gzip_pct"] = (100 - summary["br_bytes"] / summary["gzip_bytes"] * 100).round(1)
+    else:
+        summary = summary.drop(columns=["br_bytes"])
+    if orjson:
+        summary["decode_speedup"] = (summary["stdlib_ms"] / summary["orjson_ms"]).round(2)
+    else:
+        summary = summary.drop(columns=["orjson_ms"])
+    summary = summary.sort_values("raw_bytes", ascending=False)
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:.3f}".format):
+        print(summary.to_string())
+    print(f"\n{len(df)} payloads, decode times are per payload averaged over {repeat} runs.")
+    if not orjson:
+        print("orjson is not installed: only the stdlib decoder was measured.")
+    if not brotli:
+        print("brotli is not installed: br sizes were not measured, and the API layer gets gzip like any requests client.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the hot functions of the report scripts, fed with the
+synthetic payloads of syntheticPayloads.py instead of the CastAI API.
+
+Each case is timed over several runs (best and median wall time) and run once
+more under tracemalloc for its peak allocation. Results are compared with a
+saved baseline and the script exits with status 1 when a case got slower or
+allocates more than the threshold allows, or has no baseline yet.
+
+Usage: python benchmarks/hotPathBenchmark.py [case ...] [--repeat N] [--threshold PCT]
+                                             [--baseline PATH] [--save-baseline]
+"""
+import os
+import sys
+import json
+import time
+import datetime
+import statistics
+import contextlib
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import castaiApi
+import approxStats
+import orgClusterDetails
+import monthlySavingsReport
+import syntheticPayloads as payloads
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hotPathBaseline.json")
+DEFAULT_REPEAT = 10
+DEFAULT_THRESHOLD = 25.0
+
+NODE_COUNTS = [500, 5000, 50000]
+APPROX_NODE_COUNT = 50000
+USAGE_POINTS_PER_DAY = 288
+SAVINGS_MONTHS = 36
+NAME_COUNT = 2000
+VERSION_COUNT = 2000
+OFFERING_COUNT = 20000
+SCHEDULE_CLUSTERS = 500
+
+# -------------------------
+# Fake API
+# -------------------------
+@contextlib.contextmanager
+def fake_api(routes):
+    """
+    Serve castaiApi.get_json / post_json from routes, a list of (URL fragment,
+    payload) pairs; the first fragment found in the URL wins.
+    """
+    def lookup(url):
+        for fragment, payload in routes:
+            if fragment in url:
+                return payload
+        return {}
+
+    def get_json(api_key, url, error_label, save_as=None, priority=castaiApi.PRIORITY_ENRICHMENT):
+        return lookup(url)
+
+    def post_json(api_key, url, body, error_label, save_as=None, priority=castaiApi.PRIORITY_ENRICHMENT):
+        return lookup(url)
+
+    original = castaiApi.get_json, castaiApi.post_json
+    castaiApi.get_json, castaiApi.post_json = get_json, post_json
+    try:
+        yield
+    finally:
+        castaiApi.get_json, castaiApi.post_json = original
+
+# -------------------------
+# Cases
+# -------------------------
+# Each case builds its inputs once and returns (routes, function to time).
+def nodes_managed_case(node_count):
+    def build():
+        routes = [("/nodes", payloads.make_nodes(node_count, seed=node_count))]
+        return routes, lambda: orgClusterDetails.get_nodes_managed("key", "cluster", "EKS", stats_rows=[])
+    return build
+
+def nodes_managed_approx_case(node_count):
+    def build():
+        routes = [("/nodes", payloads.make_nodes(node_count, seed=node_count))]
+        return routes, lambda: orgClusterDetails.get_nodes_managed("key", "cluster", "EKS", stats_rows=[],
+                                                                   approx_error=approxStats.DEFAULT_ERROR)
+    return build
+
+def resource_usage_case():
+    routes = [("/resource-usage", payloads.make_resource_usage(2025, 1, points_per_day=USAGE_POINTS_PER_DAY))]
+    start_str, end_str = monthlySavingsReport.get_month_range(2025, 1)
+    return routes, lambda: monthlySavingsReport.get_monthly_resource_usage("key", "cluster", start_str, end_str)
+
+def detect_environment_case():
+    names = payloads.make_cluster_names(NAME_COUNT)
+
+    def run():
+        for name in names:
+            orgClusterDetails.detect_environment(name)
+    return [], run
+
+def support_status_case():
+    cases = []
+    for i, provider in enumerate(payloads.PROVIDERS):
+        support_data = payloads.make_support_data(provider)
+        for version in payloads.make_versions(provider, VERSION_COUNT // len(payloads.PROVIDERS), seed=i):
+            cases.append((provider, version, support_data))
+
+    def run():
+        for provider, version, support_data in cases:
+            orgClusterDetails.determine_support_status(provider, version, support_data)
+    return [], run
+
+def resource_offering_case():
+    offerings = [payloads.make_offerings(seed=i) for i in range(OFFERING_COUNT)]
+
+    def run():
+        for offering in offerings:
+            orgClusterDetails.compute_resource_offering(offering)
+    return [], run
+
+def rebalancing_schedules_case():
+    cluster_ids = [f"cluster-{i}" for i in range(SCHEDULE_CLUSTERS)]
+    routes = [("/rebalancing-schedules", payloads.make_rebalancing_schedules(cluster_ids, schedules=SCHEDULE_CLUSTERS // 5))]
+    return routes, lambda: orgClusterDetails.get_all_rebalancing_schedules("key")
+
+def savings_month_loop_case():
+    routes = [
+        ("/efficiency", payloads.make_efficiency()),
+        ("/resource-usage", payloads.make_resource_usage(2025, 1, points_per_day=24)),
+    ]
+    months = [(2023 + i // 12, i % 12 + 1) for i in range(SAVINGS_MONTHS)]
+
+    def run():
+        baseline = monthlySavingsReport.get_preonboard_efficiency("key", "cluster", datetime.date(2023, 1, 1))
+        for year, month in months:
+            monthlySavingsReport.compute_month_unit("key", "cluster", "prod-cluster", "2023-01-01", year, month, baseline)
+    return routes, run
+
+CASES = {f"get_nodes_managed_{count}": nodes_managed_case(count) for count in NODE_COUNTS}
+CASES[f"get_nodes_managed_{APPROX_NODE_COUNT}_approx"] = nodes_managed_approx_case(APPROX_NODE_COUNT)
+CASES.update({
+    "get_monthly_resource_usage": resource_usage_case,
+    "detect_environment": detect_environment_case,
+    "determine_support_status": support_status_case,
+    "compute_resource_offering": resource_offering_case,
+    "get_all_rebalancing_schedules": rebalancing_schedules_case,
+    "savings_month_loop": savings_month_loop_case,
+})
+
+# -------------------------
+# Measurement
+# -------------------------
+def measure(build, repeat):
+    routes, fn = build()
+    with fake_api(routes):
+        fn()  # warm up caches (compiled regexes, imports)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        "best_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+def find_regressions(results, baseline, threshold):
+    """Cases whose best time or peak allocation grew by more than threshold percent."""
+    regressions = []
+    limit = 1 + threshold / 100
+    for name, result in results.items():
+        previous = baseline[name]
+        for metric in ["best_ms", "peak_kib"]:
+            if previous.get(metric) and result[metric] > previous[metric] * limit:
+                change = (result[metric] / previous[metric] - 1) * 100
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {result[metric]} (+{change:.1f}%)")
+    return regressions
+
+def main():
+    args = sys.argv[1:]
+    repeat = DEFAULT_REPEAT
+    threshold = DEFAULT_THRESHOLD
+    baseline_path = DEFAULT_BASELINE
+    save_baseline = "--save-baseline" in args
+    args = [a for a in args if a != "--save-baseline"]
+    for flag in ["--repeat", "--threshold", "--baseline"]:
+        if flag in args:
+            i = args.index(flag)
+            value = args[i + 1]
+            del args[i:i + 2]
+            if flag == "--repeat":
+                repeat = int(value)
+            elif flag == "--threshold":
+                threshold = float(value)
+            else:
+                baseline_path = value
+    unknown = [name for name in args if name not in CASES]
+    if unknown:
+        print(f"Unknown cases: {', '.join(unknown)}. Choose from: {', '.join(CASES)}", flush=True)
+        sys.exit(1)
+    selected = args or list(CASES)
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(f"{'case':32} {'best ms':>10} {'median ms':>10} {'peak KiB':>10} {'baseline ms':>12}")
+    for name in selected:
+        results[name] = measure(CASES[name], repeat)
+        previous = baseline.get(name, {}).get("best_ms", "")
+        r = results[name]
+        print(f"{name:32} {r['best_ms']:>10} {r['median_ms']:>10} {r['peak_kib']:>10} {previous:>12}", flush=True)
+
+    if save_baseline:
+        baseline.update(results)
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+        print(f"Baseline saved to {baseline_path}")
+        return
+    # A gate without a reference must fail, not pass silently.
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        print(f"\nNo baseline at {baseline_path} for: {', '.join(missing)}; run with --save-baseline to record one.")
+        sys.exit(1)
+    regressions = find_regressions(results, baseline, threshold)
+    if regressions:
+        print(f"\nRegressions beyond {threshold:g}%:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {threshold:g}%.")
+
+if __name__ == "__main__":
+    main()
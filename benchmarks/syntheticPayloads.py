@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Generators for realistic synthetic CastAI payloads, shaped like the responses
+the report scripts parse. Every generator takes a seed so a benchmark run
+always sees the same data.
+"""
+import random
+import datetime
+
+PROVIDERS = ["EKS", "GKE", "AKS"]
+
+# Fractions of nodes labelled for each manager; the rest belong to the provider.
+DEFAULT_LABEL_MIX = {"CastAI": 0.5, "Karpenter": 0.2}
+
+INSTANCE_SHAPES = [
+    # (cpu millicores, memory MiB)
+    (2000, 8192),
+    (4000, 16384),
+    (8000, 32768),
+    (16000, 65536),
+    (32000, 131072),
+]
+
+CLUSTER_NAME_PARTS = [
+    ["prod", "production", "prd", "qa", "uat", "staging", "dev", "desa", "ci", "argo", "sandbox", "data"],
+    ["eu-west-1", "us-east-1", "apac", "core", "payments", "search", "ml", "web"],
+]
+
+def make_nodes(node_count, label_mix=None, seed=0, extra_labels=8):
+    """
+    Nodes payload ({"items": [...]}) with node_count nodes. label_mix maps
+    "CastAI" / "Karpenter" to the fraction of nodes they manage; a few nodes
+    have no capacity reported, like nodes that are still joining.
+    """
+    rng = random.Random(seed)
+    label_mix = DEFAULT_LABEL_MIX if label_mix is None else label_mix
+    castai_share = label_mix.get("CastAI", 0)
+    karpenter_share = label_mix.get("Karpenter", 0)
+    items = []
+    for i in range(node_count):
+        labels = {f"example.com/label-{j}": f"value-{rng.randint(0, 9)}" for j in range(extra_labels)}
+        labels["kubernetes.io/hostname"] = f"node-{i}"
+        draw = rng.random()
+        if draw < castai_share:
+            labels["provisioner.cast.ai/managed-by"] = "cast.ai"
+        elif draw < castai_share + karpenter_share:
+            labels["karpenter.sh/registered"] = "true"
+        cpu_capacity, mem_capacity = rng.choice(INSTANCE_SHAPES)
+        if rng.random() < 0.02:
+            cpu_capacity, mem_capacity = 0, 0
+        items.append({
+            "id": f"node-{seed}-{i}",
+            "name": f"node-{i}",
+            "labels": labels,
+            "resources": {
+                "cpuCapacityMilli": cpu_capacity,
+                "cpuRequestsMilli": int(cpu_capacity * rng.uniform(0.05, 1.1)),
+                "memCapacityMib": mem_capacity,
+                "memRequestsMib": int(mem_capacity * rng.uniform(0.05, 1.1)),
+            },
+        })
+    return {"items": items}
+
+def make_resource_usage(year, month, points_per_day=24, seed=0):
+    """resource-usage payload with one item per sample over the month."""
+    rng = random.Random(seed)
+    start = datetime.datetime(year, month, 1)
+    next_month = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+    step = datetime.timedelta(days=1) / points_per_day
+    items = []
+    timestamp = start
+    cpu = rng.uniform(50, 500)
+    while timestamp < next_month:
+        cpu = max(1.0, cpu * rng.uniform(0.97, 1.03))
+        ram = cpu * rng.uniform(3.5, 4.5)
+        items.append({
+            "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "cpuProvisioned": f"{cpu:.3f}",
+            "cpuRequested": f"{cpu * rng.uniform(0.4, 0.9):.3f}",
+            "cpuUsed": f"{cpu * rng.uniform(0.1, 0.5):.3f}",
+            "ramProvisioned": f"{ram:.3f}",
+            "ramRequested": f"{ram * rng.uniform(0.4, 0.9):.3f}",
+            "ramUsed": f"{ram * rng.uniform(0.2, 0.6):.3f}",
+            "storageProvisionedGib": f"{rng.uniform(100, 2000):.3f}",
+            "requestedStorageGib": f"{rng.uniform(50, 1500):.3f}",
+        })
+        timestamp += step
+    return {"items": items}
+
+def make_efficiency(seed=0):
+    """efficiency payload; only the summary prices are read by the reports."""
+    rng = random.Random(seed)
+    return {
+        "summary": {
+            "costPerCpuProvisioned": f"{rng.uniform(0.02, 0.05):.6f}",
+            "costPerRamGibProvisioned": f"{rng.uniform(0.002, 0.006):.6f}",
+            "costPerStorageGibProvisioned": f"{rng.uniform(0.0001, 0.0003):.6f}",
+            "cpuEfficiency": f"{rng.uniform(20, 80):.2f}",
+            "ramEfficiency": f"{rng.uniform(20, 80):.2f}",
+        },
+        "items": [],
+    }
+
+def make_rebalancing_schedules(cluster_ids, schedules=10, seed=0):
+    """rebalancing-schedules payload with jobs spread over the given clusters."""
+    rng = random.Random(seed)
+    result = []
+    for i in range(schedules):
+        jobs = [{"clusterId": cid, "enabled": True} for cid in rng.sample(cluster_ids, min(len(cluster_ids), rng.randint(1, 5)))]
+        result.append({
+            "id": f"schedule-{i}",
+            "schedule": {"cron": f"{rng.randint(0, 59)} {rng.randint(0, 23)} * * *"},
+            "nextTriggerAt": "2026-01-01T00:00:00Z",
+            "jobs": jobs,
+        })
+    return {"schedules": result}
+
+def make_offerings(seed=0):
+    """One clusters/summary item with its node counts per offering."""
+    rng = random.Random(seed)
+    return {
+        "nodeCountOnDemand": rng.randint(0, 50),
+        "nodeCountOnDemandCastai": rng.randint(0, 50),
+        "nodeCountSpot": rng.randint(0, 50),
+        "nodeCountSpotCastai": rng.randint(0, 50),
+        "nodeCountSpotFallbackCastai": rng.randint(0, 5),
+    }
+
+def make_cluster_names(count, seed=0):
+    rng = random.Random(seed)
+    names = []
+    for i in range(count):
+        parts = [rng.choice(CLUSTER_NAME_PARTS[0]), rng.choice(CLUSTER_NAME_PARTS[1])]
+        rng.shuffle(parts)
+        names.append(f"{'-'.join(parts)}-{i}")
+    return names
+
+def make_support_data(provider, cycles=20):
+    """endoflife.date payload for a provider: Kubernetes 1.10 onwards, newest first."""
+    today = datetime.date.today()
+    data = []
+    for i in range(cycles):
+        minor = 10 + cycles - 1 - i
+        standard_end = today + datetime.timedelta(days=120 * (2 - i))
+        extended_end = standard_end + datetime.timedelta(days=365)
+        if provider.upper() == "EKS":
+            item = {"cycle": f"1.{minor}", "eol": standard_end.isoformat(), "extendedSupport": extended_end.isoformat()}
+        elif provider.upper() == "GKE":
+            item = {"cycle": f"1.{minor}", "support": standard_end.isoformat(), "eol": extended_end.isoformat()}
+        else:
+            item = {"cycle": f"1.{minor}", "eol": standard_end.isoformat(), "lts": extended_end.isoformat()}
+        data.append(item)
+    return data
+
+def make_versions(provider, count, cycles=20, seed=0):
+    """Cluster versions as each provider reports them, including some unknown ones."""
+    rng = random.Random(seed)
+    versions = []
+    for _ in range(count):
+        minor = rng.randint(10, 10 + cycles + 1)
+        patch = rng.randint(0, 15)
+        if provider.upper() == "GKE":
+            versions.append(f"1.{minor}.{patch}-gke.{rng.randint(1000, 2000)}")
+        else:
+            versions.append(f"1.{minor}.{patch}")
+    return versions
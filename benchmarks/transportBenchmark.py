@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Throughput of the API transports against a local stub server: the pooled
+keep-alive HTTP/1.1 session (the default) and the shared HTTP/2 client of
+castaiApi.enable_http2(), at several concurrency levels.
+
+The stub answers every GET with a synthetic efficiency payload after a fixed
+latency, speaking HTTP/1.1 or, when the client opens with the HTTP/2 preface,
+cleartext HTTP/2. It counts the connections each transport opens. There is no
+TLS on localhost, so the handshakes of the extra HTTP/1.1 connections against
+api.cast.ai are not in these numbers.
+
+Needs httpx and h2 for the HTTP/2 rows.
+
+Usage: python benchmarks/transportBenchmark.py [--concurrency 8,32,128] [--requests N] [--latency-ms MS]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import castaiApi
+import syntheticPayloads as payloads
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+except ImportError:
+    h2 = None
+
+DEFAULT_CONCURRENCY = [8, 32, 128]
+DEFAULT_REQUESTS = 1000
+DEFAULT_LATENCY_MS = 20
+H2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+STUB_API_KEY = "transport-benchmark"
+
+# -------------------------
+# Stub Server
+# -------------------------
+class StubProtocol(asyncio.Protocol):
+    """One connection of the stub: HTTP/1.1 with keep-alive, or HTTP/2 after the preface."""
+
+    def __init__(self, server):
+        self.server = server
+        self.buffer = b""
+        self.mode = None
+        self.h2 = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connections += 1
+
+    def data_received(self, data):
+        if self.mode is None:
+            self.buffer += data
+            if len(self.buffer) < len(H2_PREFACE) and H2_PREFACE.startswith(self.buffer):
+                return
+            data, self.buffer = self.buffer, b""
+            self.mode = "h2" if data.startswith(H2_PREFACE) and h2 is not None else "h1"
+            if self.mode == "h2":
+                self.h2 = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+                self.h2.initiate_connection()
+        if self.mode == "h2":
+            self.h2_received(data)
+        else:
+            self.h1_received(data)
+
+    def respond_later(self, callback, *args):
+        asyncio.get_running_loop().call_later(self.server.latency, callback, *args)
+
+    # HTTP/1.1: the clients never pipeline, so a request is complete at the blank line.
+    def h1_received(self, data):
+        self.buffer += data
+        while b"\r\n\r\n" in self.buffer:
+            head, self.buffer = self.buffer.split(b"\r\n\r\n", 1)
+            close = b"connection: close" in head.lower()
+            self.respond_later(self.h1_respond, close)
+
+    def h1_respond(self, close):
+        if self.transport.is_closing():
+            return
+        self.server.requests += 1
+        body = self.server.body
+        headers = (f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                   f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        self.transport.write(headers.encode() + body)
+        if close:
+            self.transport.close()
+
+    # HTTP/2: responses go out as flow control allows.
+    def h2_received(self, data):
+        for event in self.h2.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                self.respond_later(self.h2_respond, event.stream_id)
+            elif isinstance(event, h2.events.WindowUpdated):
+                self.h2_flush()
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                self.transport.close()
+        self.transport.write(self.h2.data_to_send())
+
+    def h2_respond(self, stream_id):
+        if self.transport.is_closing():
+            return
+        self.server.requests += 1
+        body = self.server.body
+        self.h2.send_headers(stream_id, [(":status", "200"), ("content-type", "application/json"),
+                                         ("content-length", str(len(body)))])
+        self.pending[stream_id] = body
+        self.h2_flush()
+
+    def h2_flush(self):
+        for stream_id in list(self.pending):
+            body = self.pending[stream_id]
+            while body:
+                size = min(self.h2.local_flow_control_window(stream_id), self.h2.max_outbound_frame_size, len(body))
+                if size <= 0:
+                    break
+                self.h2.send_data(stream_id, body[:size], end_stream=size == len(body))
+                body = body[size:]
+            if body:
+                self.pending[stream_id] = body
+            else:
+                del self.pending[stream_id]
+        self.transport.write(self.h2.data_to_send())
+
+class StubServer:
+    """The stub in a background event loop thread; use as a context manager."""
+
+    def __init__(self, latency, body):
+        self.latency = latency
+        self.body = body
+        self.connections = 0
+        self.requests = 0
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        server = asyncio.run_coroutine_threadsafe(
+            self.loop.create_server(lambda: StubProtocol(self), "127.0.0.1", 0, backlog=1024), self.loop).result()
+        self.server = server
+        self.url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/v1/cost-reports/clusters/stub/efficiency"
+        return self
+
+    def __exit__(self, *exc):
+        self.server.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def reset(self):
+        self.connections = 0
+        self.requests = 0
+
+# -------------------------
+# Runs
+# -------------------------
+def run_transport(server, transport, concurrency, count):
+    """Send count GETs through castaiApi.request with at most concurrency in flight."""
+    castaiApi.disable_http2()
+    # A fresh session per run, so each run opens its own connections.
+    castaiApi.http1_session.close()
+    castaiApi.http1_session = castaiApi.new_http1_session()
+    if transport == "http2":
+        castaiApi.enable_http2(prior_knowledge=True)
+    # The scheduler is the concurrency limit here; no rate limit.
+    scheduler = castaiApi.scheduler_for(STUB_API_KEY)
+    scheduler.max_concurrency = concurrency
+    scheduler.rate_per_second = None
+    server.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        statuses = list(executor.map(lambda _: castaiApi.request("GET", STUB_API_KEY, server.url).status_code, range(count)))
+    seconds = time.perf_counter() - started
+    castaiApi.disable_http2()
+    return {
+        "transport": transport,
+        "concurrency": concurrency,
+        "requests": count,
+        "errors": sum(1 for status in statuses if status != 200),
+        "seconds": round(seconds, 3),
+        "requests_per_s": round(count / seconds, 1),
+        "connections": server.connections,
+    }
+
+def main():
+    args = sys.argv[1:]
+    concurrency_levels = DEFAULT_CONCURRENCY
+    count = DEFAULT_REQUESTS
+    latency_ms = DEFAULT_LATENCY_MS
+    try:
+        if "--concurrency" in args:
+            i = args.index("--concurrency")
+            concurrency_levels = [int(c) for c in args[i + 1].split(",")]
+            del args[i:i + 2]
+        if "--requests" in args:
+            i = args.index("--requests")
+            count = int(args[i + 1])
+            del args[i:i + 2]
+        if "--latency-ms" in args:
+            i = args.index("--latency-ms")
+            latency_ms = float(args[i + 1])
+            del args[i:i + 2]
+    except (IndexError, ValueError):
+        print(__doc__.strip().splitlines()[-1], flush=True)
+        sys.exit(1)
+    transports = ["http1"]
+    if castaiApi.HTTP2_AVAILABLE and h2 is not None:
+        transports.append("http2")
+    else:
+        print("httpx and h2 are not installed; only HTTP/1.1 is measured.", flush=True)
+
+    body = json.dumps(payloads.make_efficiency(), separators=(",", ":")).encode()
+    rows = []
+    with StubServer(latency_ms / 1000, body) as server:
+        for concurrency in concurrency_levels:
+            for transport in transports:
+                rows.append(run_transport(server, transport, concurrency, count))
+                row = rows[-1]
+                print(f"{transport:5} x{concurrency:<4} {row['requests_per_s']:>9.1f} req/s  {row['connections']:>5} connections", flush=True)
+    df = pd.DataFrame(rows)
+    if "http2" in transports:
+        http1 = df[df["transport"] == "http1"].set_index("concurrency")["requests_per_s"]
+        df["speedup"] = (df["requests_per_s"] / df["concurrency"].map(http1)).round(2)
+    print(f"\n{len(body)} byte responses, {latency_ms:g} ms stub latency\n", flush=True)
+    print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
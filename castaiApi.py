@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+import os
+import json
+import re
+import hashlib
+import time
+import heapq
+import contextlib
+import collections
+import itertools
+import threading
+import contextvars
+import importlib.util
+import http.cookiejar
+import requests
+import requests.adapters
+import runProfiler
+from concurrent.futures import Future, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+
+# orjson decodes the large nodes / resource-usage payloads several times faster
+# than the stdlib; it is optional and the stdlib decoder is used without it.
+try:
+    import orjson
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+# httpx with the h2 package can multiplex the calls over a few HTTP/2
+# connections; both are optional and requests (HTTP/1.1) is used without them.
+try:
+    import httpx
+except ImportError:
+    httpx = None
+HTTP2_AVAILABLE = httpx is not None and importlib.util.find_spec("h2") is not None
+HTTP2_MAX_CONNECTIONS = 4
+
+# "gzip, deflate" is what requests sends by default; the only addition is br,
+# offered when one of the brotli packages is installed so it can be decoded.
+if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+    ACCEPT_ENCODING = "gzip, deflate, br"
+else:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# Lower values are dispatched first within a key's queue. Discovery calls
+# unblock everything else for an org, so they go ahead of per-cluster work.
+PRIORITY_DISCOVERY = 0
+PRIORITY_DETAILS = 1
+PRIORITY_ENRICHMENT = 2
+PRIORITY_HISTORY = 3
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_RATE_PER_SECOND = 10.0
+MAX_RETRIES = 3
+
+# Where the current org's raw responses are saved. Context variables follow
+# the work into thread pools when tasks are submitted with submit_in_context.
+output_dir = contextvars.ContextVar("output_dir", default=None)
+save_responses = contextvars.ContextVar("save_responses", default=False)
+
+# -------------------------
+# Org Context
+# -------------------------
+def set_org_context(org_dir, save_json):
+    output_dir.set(org_dir)
+    save_responses.set(save_json == "on")
+    os.makedirs(os.path.join(org_dir, "json"), exist_ok=True)
+
+def save_response(file_name, data):
+    org_dir = output_dir.get()
+    if not save_responses.get() or org_dir is None:
+        return
+    with open(os.path.join(org_dir, "json", file_name), "w") as f:
+        json.dump(data, f, indent=4)
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """executor.submit that carries the caller's org context into the worker thread."""
+    ctx = contextvars.copy_context()
+    return executor.submit(ctx.run, fn, *args, **kwargs)
+
+# -------------------------
+# Per-Key Scheduler
+# -------------------------
+class KeyScheduler:
+    """
+    Dispatches the calls of one API key: at most max_concurrency in flight,
+    at most rate_per_second started per second, lowest priority value first
+    and FIFO within a priority. Each key has its own workers, so a busy key
+    never delays the calls of another one.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, rate_per_second=DEFAULT_RATE_PER_SECOND):
+        self.max_concurrency = max_concurrency
+        self.rate_per_second = rate_per_second
+        self._queue = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._tokens = float(max_concurrency)
+        self._last_refill = time.monotonic()
+        self._token_lock = threading.Lock()
+        self._workers = []
+        self.dispatched = 0
+
+    def submit(self, priority, fn, *args):
+        future = Future()
+        with self._cond:
+            heapq.heappush(self._queue, (priority, next(self._sequence), future, fn, args))
+            if len(self._workers) < self.max_concurrency:
+                worker = threading.Thread(target=self._run, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._cond.notify()
+        return future
+
+    def _take_token(self):
+        if not self.rate_per_second:
+            return
+        while True:
+            with self._token_lock:
+                now = time.monotonic()
+                self._tokens = min(float(self.max_concurrency), self._tokens + (now - self._last_refill) * self.rate_per_second)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate_per_second
+            time.sleep(wait)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                priority, seq, future, fn, args = heapq.heappop(self._queue)
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._take_token()
+            self.dispatched += 1
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def configure_key(api_key, max_concurrency=None, rate_per_second=None):
+    """Override the limits of one key, e.g. from the optional orgs.csv columns."""
+    scheduler = scheduler_for(api_key)
+    if max_concurrency:
+        scheduler.max_concurrency = int(max_concurrency)
+    if rate_per_second:
+        scheduler.rate_per_second = float(rate_per_second)
+
+def configure_org_limits(api_key, org_row):
+    """Apply the optional max_concurrency and rate_limit columns of an orgs.csv row."""
+    limits = {}
+    for col in ("max_concurrency", "rate_limit"):
+        value = org_row.get(col)
+        # Empty cells come back from pandas as NaN, which is not equal to itself.
+        if value is not None and value == value and str(value).strip():
+            limits[col] = value
+    configure_key(api_key, limits.get("max_concurrency"), limits.get("rate_limit"))
+
+def scheduler_for(api_key):
+    with _schedulers_lock:
+        if api_key not in _schedulers:
+            _schedulers[api_key] = KeyScheduler()
+        return _schedulers[api_key]
+
+# -------------------------
+# Timeouts, Deadlines and Hedging
+# -------------------------
+class DeadlineExceeded(Exception):
+    pass
+
+class BudgetExhausted(DeadlineExceeded):
+    """The run's --time-budget ran out; the caller marks what it did not get as pending."""
+
+# (path fragment, (connect timeout, read timeout)) in seconds; first match wins.
+ENDPOINT_TIMEOUTS = [
+    ("/workload-costs", (5, 120)),
+    ("/resource-usage", (5, 90)),
+    ("/efficiency", (5, 60)),
+    ("/nodes", (5, 60)),
+    ("/clusters/summary", (5, 60)),
+    ("/evictor-config", (5, 15)),
+]
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_CLUSTER_DEADLINE = 900
+
+HEDGE_MIN_SAMPLES = 20
+HEDGE_PERCENTILE = 95
+LATENCY_WINDOW = 200
+
+# Absolute time.monotonic() by which the current cluster's calls must finish.
+deadline = contextvars.ContextVar("deadline", default=None)
+# Absolute time.monotonic() at which the whole run's --time-budget ends.
+budget_until = None
+hedging_enabled = False
+
+_latencies = {}
+_latencies_lock = threading.Lock()
+ID_SEGMENT = re.compile(r"/[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}(?=/|$)")
+
+def endpoint_of(url):
+    """Endpoint key of a URL: path without the query string and with IDs replaced."""
+    path = url.split("?", 1)[0].replace("https://api.cast.ai", "")
+    return ID_SEGMENT.sub("/{id}", path)
+
+def timeout_for(url):
+    for fragment, timeout in ENDPOINT_TIMEOUTS:
+        if fragment in url:
+            return timeout
+    return DEFAULT_TIMEOUT
+
+@contextlib.contextmanager
+def cluster_deadline(seconds=DEFAULT_CLUSTER_DEADLINE):
+    """Bound every API call made for one cluster, including from threads started with submit_in_context."""
+    token = deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        deadline.reset(token)
+
+class QueuedDeadline:
+    """
+    cluster_deadline for a cluster whose calls wait in a shared pool: the
+    clock starts when the first of them starts running, not when it is queued.
+    """
+
+    def __init__(self, seconds=DEFAULT_CLUSTER_DEADLINE):
+        self.seconds = seconds
+        self.until = None
+        self._lock = threading.Lock()
+
+    def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.until is None:
+                self.until = time.monotonic() + self.seconds
+        token = deadline.set(self.until)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            deadline.reset(token)
+
+def set_time_budget(seconds):
+    """Stop starting API calls seconds from now; calls in flight are cut off then too."""
+    global budget_until
+    budget_until = time.monotonic() + seconds
+
+def parse_time_budget(argv):
+    """Remove --time-budget SECONDS from argv and return the seconds (None without it)."""
+    if "--time-budget" not in argv:
+        return None
+    i = argv.index("--time-budget")
+    try:
+        seconds = float(argv[i + 1])
+    except (IndexError, ValueError):
+        raise ValueError("--time-budget expects a number of seconds")
+    if seconds < 0:
+        raise ValueError("--time-budget must not be negative")
+    del argv[i:i + 2]
+    return seconds
+
+def budget_active():
+    return budget_until is not None
+
+def budget_exhausted():
+    return budget_until is not None and time.monotonic() >= budget_until
+
+def budget_argv():
+    """Flags that pass what is left of the budget on to the scripts started as a subprocess."""
+    if budget_until is None:
+        return []
+    return ["--time-budget", str(max(int(budget_until - time.monotonic()), 0))]
+
+def effective_deadline():
+    """The current cluster deadline or the end of the time budget, whichever is first."""
+    until = deadline.get()
+    if budget_until is not None and (until is None or budget_until < until):
+        return budget_until
+    return until
+
+def enable_hedging(enabled=True):
+    global hedging_enabled
+    hedging_enabled = enabled
+
+def record_latency(endpoint, seconds):
+    with _latencies_lock:
+        samples = _latencies.setdefault(endpoint, collections.deque(maxlen=LATENCY_WINDOW))
+        samples.append(seconds)
+
+def latency_percentile(endpoint, percentile=HEDGE_PERCENTILE):
+    with _latencies_lock:
+        samples = sorted(_latencies.get(endpoint, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+def remaining_time(until):
+    if until is None:
+        return None
+    remaining = until - time.monotonic()
+    if remaining <= 0:
+        if until == budget_until:
+            raise BudgetExhausted("time budget exhausted")
+        raise DeadlineExceeded("cluster deadline exceeded")
+    return remaining
+
+# -------------------------
+# Metadata Response Cache
+# -------------------------
+CACHE_DIR = os.path.join("outputs", "_cache", "http")
+
+# (endpoint pattern, seconds a cached response is served without asking the API).
+# Only slow-changing metadata is listed; time series cost endpoints never are.
+CACHE_TTLS = [
+    (re.compile(r"^/v1/kubernetes/external-clusters/\{id\}$"), 3600),
+    (re.compile(r"^/v1/kubernetes/clusters/\{id\}/settings$"), 3600),
+    (re.compile(r"^/v1/kubernetes/clusters/\{id\}/evictor-advanced-config$"), 3600),
+    (re.compile(r"^/v1/rebalancing-schedules$"), 3600),
+]
+
+http_cache_enabled = True
+
+def disable_http_cache():
+    global http_cache_enabled
+    http_cache_enabled = False
+
+def cache_ttl_for(url):
+    if not http_cache_enabled:
+        return None
+    endpoint = endpoint_of(url)
+    for pattern, ttl in CACHE_TTLS:
+        if pattern.match(endpoint):
+            return ttl
+    return None
+
+def cache_paths(api_key, url):
+    # Keyed by API key too: the same URL answers differently for each org.
+    digest = hashlib.sha256(f"{api_key}\n{url}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, digest + ".meta.json"), os.path.join(CACHE_DIR, digest + ".body")
+
+def load_cache_entry(api_key, url):
+    meta_path, body_path = cache_paths(api_key, url)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    return meta, body
+
+def store_cache_entry(api_key, url, meta, body=None):
+    meta_path, body_path = cache_paths(api_key, url)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    if body is not None:
+        with open(body_path + ".tmp", "wb") as f:
+            f.write(body)
+        os.replace(body_path + ".tmp", body_path)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+def cached_get(api_key, url, ttl, priority):
+    """
+    (HTTP status, body) of a cached metadata GET: served from disk while
+    younger than ttl, otherwise revalidated with If-None-Match /
+    If-Modified-Since when the API gave a validator, and downloaded again only
+    when it changed. A body served from disk counts as a 200.
+    """
+    meta, body = load_cache_entry(api_key, url)
+    if meta is not None and time.time() - meta["fetched_at"] < ttl:
+        return 200, body
+    headers = {}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    resp = request("GET", api_key, url, priority=priority, extra_headers=headers)
+    if resp.status_code == 304 and meta is not None:
+        meta["fetched_at"] = time.time()
+        store_cache_entry(api_key, url, meta)
+        return 200, body
+    if resp.status_code == 200:
+        store_cache_entry(api_key, url, {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+        }, resp.content)
+    return resp.status_code, resp.content
+
+# -------------------------
+# Transport
+# -------------------------
+# Idle HTTP/1.1 connections kept per host; every org's calls go to the same
+# host, so this covers ORG_WORKERS keys at their default concurrency.
+HTTP1_POOL_SIZE = 64
+
+def new_http1_session():
+    """
+    Thread-shared requests session that keeps connections alive between
+    calls. Cookies are refused so nothing set for one API key is sent with
+    another's calls.
+    """
+    session = requests.Session()
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=HTTP1_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+http1_session = new_http1_session()
+http2_client = None
+
+def enable_http2(prior_knowledge=False):
+    """
+    Send every call through one shared HTTP/2 client, which multiplexes the
+    concurrent calls over at most HTTP2_MAX_CONNECTIONS connections per host
+    and speaks HTTP/1.1 to servers that do not offer HTTP/2. prior_knowledge
+    speaks HTTP/2 without TLS negotiation, for plain http:// test servers.
+    Returns False, keeping requests, when httpx or h2 is not installed.
+    """
+    global http2_client
+    if not HTTP2_AVAILABLE:
+        print("HTTP/2 needs the httpx and h2 packages (pip install 'httpx[http2]'); using HTTP/1.1.", flush=True)
+        return False
+    limits = httpx.Limits(max_connections=HTTP2_MAX_CONNECTIONS, max_keepalive_connections=HTTP2_MAX_CONNECTIONS)
+    http2_client = httpx.Client(http1=not prior_knowledge, http2=True, limits=limits)
+    return True
+
+def disable_http2():
+    global http2_client
+    if http2_client is not None:
+        http2_client.close()
+        http2_client = None
+
+def _http2_send(method, url, headers, body, connect_timeout, read_timeout):
+    # httpx errors are raised as their requests counterparts, which the report
+    # scripts already handle.
+    timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=None)
+    try:
+        return http2_client.request(method, url, headers=headers, json=body, timeout=timeout)
+    except httpx.TimeoutException as e:
+        raise requests.Timeout(str(e))
+    except httpx.TransportError as e:
+        raise requests.ConnectionError(str(e))
+
+# -------------------------
+# Requests
+# -------------------------
+def _send(method, url, headers, body, until):
+    # The caller times the call while it waits; this adds the transport's profile.
+    with runProfiler.stage("fetch", timed=False):
+        connect_timeout, read_timeout = timeout_for(url)
+        for attempt in range(MAX_RETRIES + 1):
+            remaining = remaining_time(until)
+            if remaining is not None:
+                read_timeout = min(read_timeout, remaining)
+            started = time.monotonic()
+            if http2_client is not None:
+                resp = _http2_send(method, url, headers, body, connect_timeout, read_timeout)
+            else:
+                resp = http1_session.request(method, url, headers=headers, json=body, timeout=(connect_timeout, read_timeout))
+            if resp.status_code != 429:
+                record_latency(endpoint_of(url), time.monotonic() - started)
+                return resp
+            if attempt == MAX_RETRIES:
+                return resp
+            retry_after = resp.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.replace(".", "", 1).isdigit() else 2 ** attempt
+            # A retry the deadline or budget cannot wait for is given up now, not after the wait.
+            remaining = remaining_time(until)
+            if remaining is not None and delay >= remaining:
+                if until == budget_until:
+                    raise BudgetExhausted(f"time budget exhausted before the {delay:g}s 429 backoff of {endpoint_of(url)}")
+                raise DeadlineExceeded(f"cluster deadline exceeded before the {delay:g}s 429 backoff of {endpoint_of(url)}")
+            time.sleep(delay)
+        return resp
+
+def request(method, api_key, url, body=None, priority=PRIORITY_ENRICHMENT, extra_headers=None):
+    """
+    Send one call through the key's scheduler, bounded by the per-endpoint
+    timeouts, the current cluster deadline and the run's time budget; once
+    the budget is spent no call is started. With hedging enabled, a GET
+    still running after the endpoint's observed p95 latency gets a duplicate
+    and whichever answers first is used.
+    """
+    headers = {"accept": "application/json", "Accept-Encoding": ACCEPT_ENCODING, "X-API-Key": api_key}
+    if method == "POST":
+        headers["Content-Type"] = "application/json"
+    if extra_headers:
+        headers.update(extra_headers)
+    until = effective_deadline()
+    remaining_time(until)
+    scheduler = scheduler_for(api_key)
+    # Each submission runs in a copy of the caller's context, so the profiler
+    # charges the call to the org that made it.
+    first = scheduler.submit(priority, contextvars.copy_context().run, _send, method, url, headers, body, until)
+    futures = [first]
+    hedge_after = latency_percentile(endpoint_of(url)) if hedging_enabled and method == "GET" else None
+    if hedge_after is not None:
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            # The hedge jumps the queue: it only exists because this call is already late.
+            futures.append(scheduler.submit(PRIORITY_DISCOVERY, contextvars.copy_context().run, _send, method, url, headers, body, until))
+    error = None
+    while futures:
+        done, pending = wait(futures, timeout=remaining_time(until), return_when=FIRST_COMPLETED)
+        if not done:
+            for future in futures:
+                future.cancel()
+            if until == budget_until:
+                raise BudgetExhausted(f"time budget exhausted waiting for {endpoint_of(url)}")
+            raise DeadlineExceeded(f"cluster deadline exceeded waiting for {endpoint_of(url)}")
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            error = future.exception()
+        futures = list(pending)
+    raise error
+
+# -------------------------
+# Single-Flight
+# -------------------------
+# (api key, url) -> Future of the GET in flight for it.
+_inflight = {}
+_inflight_lock = threading.Lock()
+coalesced_requests = 0
+
+def single_flight(key, fn):
+    """
+    Run fn() once for every caller that asks for key while it is running:
+    the first caller makes the call and the others wait for its result. A
+    waiter whose own deadline ends first gives up on its own; one whose
+    leader ran out of deadline or budget makes the call itself.
+    """
+    global coalesced_requests
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+        else:
+            coalesced_requests += 1
+    if not leader:
+        timeout = remaining_time(effective_deadline())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise DeadlineExceeded("cluster deadline exceeded waiting for a coalesced request")
+        except DeadlineExceeded:
+            # The leader's deadline or budget, not necessarily this caller's.
+            return fn()
+    try:
+        result = fn()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+def report_coalesced():
+    """Print how many duplicate requests the run did not send, if any."""
+    if coalesced_requests:
+        print(f"{coalesced_requests} duplicate API requests coalesced with identical ones in flight", flush=True)
+
+def _status_and_content(resp):
+    return resp.status_code, resp.content
+
+def decode_json(resp):
+    with runProfiler.stage("parse"):
+        return _loads(resp.content)
+
+def get_json(api_key, url, error_label, save_as=None, priority=PRIORITY_ENRICHMENT, require_ok=False):
+    """
+    GET a CastAI endpoint through the key's scheduler and decode the body.
+    Metadata endpoints listed in CACHE_TTLS go through the on-disk cache.
+    Concurrent GETs of the same URL with the same key share one call; each
+    caller decodes its own copy of the body.
+    Decoding errors are reported as "Error decoding <error_label>" and give {};
+    with require_ok, so does a reply that is not a 2xx.
+    """
+    ttl = cache_ttl_for(url)
+    with runProfiler.stage("fetch"):
+        if ttl:
+            status, content = single_flight((api_key, url), lambda: cached_get(api_key, url, ttl, priority))
+        else:
+            status, content = single_flight((api_key, url), lambda: _status_and_content(request("GET", api_key, url, priority=priority)))
+    if require_ok and not 200 <= status < 300:
+        print(f"Error fetching {error_label}: HTTP {status}", flush=True)
+        content = b"{}"
+    try:
+        with runProfiler.stage("parse"):
+            data = _loads(content)
+    except Exception as e:
+        print(f"Error decoding {error_label}: {e}", flush=True)
+        data = {}
+    if save_as:
+        save_response(save_as, data)
+    return data
+
+def post_json(api_key, url, body, error_label, save_as=None, priority=PRIORITY_ENRICHMENT):
+    with runProfiler.stage("fetch"):
+        resp = request("POST", api_key, url, body=body, priority=priority)
+    try:
+        data = decode_json(resp)
+    except Exception as e:
+        print(f"Error decoding {error_label}: {e}", flush=True)
+        data = {}
+    if save_as:
+        save_response(save_as, data)
+    return data
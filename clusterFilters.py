@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import os
+import fnmatch
+import datetime
+import pandas as pd
+
+# flag -> ClusterFilter attribute; every flag takes one value.
+FILTER_FLAGS = {
+    "--cluster-ids": "cluster_ids",
+    "--name-pattern": "name_pattern",
+    "--provider": "providers",
+    "--environment": "environments",
+    "--connected-since": "connected_since",
+}
+FILTER_USAGE = "[--cluster-ids ID,...] [--name-pattern GLOB] [--provider EKS,...] [--environment Production,...] [--connected-since YYYY-MM-DD]"
+
+class ClusterFilter:
+    """
+    Cluster selection shared by the report scripts. Every criterion is optional;
+    a cluster is kept when it passes all the criteria that are set. Values that
+    are not known yet (None) are not checked, so the same filter can run on the
+    org summary and again once the cluster details are in.
+    """
+
+    def __init__(self, cluster_ids=None, name_pattern=None, providers=None, environments=None, connected_since=None):
+        self.cluster_ids = set(cluster_ids) if cluster_ids else None
+        self.name_pattern = name_pattern.lower() if name_pattern else None
+        self.providers = {p.upper() for p in providers} if providers else None
+        self.environments = {e.lower() for e in environments} if environments else None
+        self.connected_since = connected_since
+
+    @property
+    def active(self):
+        return any(v is not None for v in [self.cluster_ids, self.name_pattern, self.providers, self.environments, self.connected_since])
+
+    def describe(self):
+        parts = []
+        if self.cluster_ids is not None:
+            parts.append(f"cluster IDs {', '.join(sorted(self.cluster_ids))}")
+        if self.name_pattern is not None:
+            parts.append(f"name matching '{self.name_pattern}'")
+        if self.providers is not None:
+            parts.append(f"provider {', '.join(sorted(self.providers))}")
+        if self.environments is not None:
+            parts.append(f"environment {', '.join(sorted(self.environments))}")
+        if self.connected_since is not None:
+            parts.append(f"connected since {self.connected_since.isoformat()}")
+        return "; ".join(parts)
+
+    def check(self, cluster_id=None, name=None, provider=None, environment=None, connected_date=None):
+        """False as soon as a known value fails a criterion, True otherwise."""
+        if self.cluster_ids is not None and cluster_id is not None and cluster_id not in self.cluster_ids:
+            return False
+        if self.name_pattern is not None and name is not None and not fnmatch.fnmatchcase(name.lower(), self.name_pattern):
+            return False
+        if self.providers is not None and provider is not None and provider.upper() not in self.providers:
+            return False
+        if self.environments is not None and environment is not None and environment.lower() not in self.environments:
+            return False
+        if self.connected_since is not None and connected_date is not None:
+            # A cluster without a Connected Date cannot be shown to be recent enough.
+            if connected_date == "" or connected_date < self.connected_since:
+                return False
+        return True
+
+    def filter_frame(self, df):
+        """Apply the filter to a cluster_details.csv frame; no API calls needed."""
+        if not self.active or df.empty:
+            return df
+        connected = pd.to_datetime(df.get("Connected Date"), errors="coerce")
+        keep = []
+        for (_, row), connected_at in zip(df.iterrows(), connected):
+            connected_date = connected_at.date() if not pd.isna(connected_at) else ""
+            keep.append(self.check(
+                cluster_id=str(row.get("ClusterID", "")),
+                name=str(row.get("Cluster Name", "")),
+                provider=str(row.get("Provider", "")),
+                environment=str(row.get("Environment", "")),
+                connected_date=connected_date,
+            ))
+        return df[keep]
+
+    def output_name(self, file_name):
+        """Filtered runs write next to the full reports instead of over them."""
+        if not self.active:
+            return file_name
+        stem, ext = os.path.splitext(file_name)
+        return f"{stem}_filtered{ext}"
+
+    def to_argv(self):
+        """Flags that reproduce this filter, for the scripts started as a subprocess."""
+        argv = []
+        if self.cluster_ids is not None:
+            argv += ["--cluster-ids", ",".join(sorted(self.cluster_ids))]
+        if self.name_pattern is not None:
+            argv += ["--name-pattern", self.name_pattern]
+        if self.providers is not None:
+            argv += ["--provider", ",".join(sorted(self.providers))]
+        if self.environments is not None:
+            argv += ["--environment", ",".join(sorted(self.environments))]
+        if self.connected_since is not None:
+            argv += ["--connected-since", self.connected_since.isoformat()]
+        return argv
+
+def split_values(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+def parse_filter_args(argv):
+    """
+    Remove the filter flags from argv. Returns (ClusterFilter, remaining argv);
+    raises ValueError for a flag without a value or a bad date.
+    """
+    remaining = []
+    values = {}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in FILTER_FLAGS:
+            if i + 1 >= len(argv):
+                raise ValueError(f"{arg} needs a value")
+            values[FILTER_FLAGS[arg]] = argv[i + 1]
+            i += 2
+            continue
+        remaining.append(arg)
+        i += 1
+    connected_since = values.get("connected_since")
+    if connected_since:
+        try:
+            connected_since = datetime.date.fromisoformat(connected_since)
+        except ValueError:
+            raise ValueError(f"--connected-since expects YYYY-MM-DD, got '{connected_since}'")
+    cluster_filter = ClusterFilter(
+        cluster_ids=split_values(values["cluster_ids"]) if "cluster_ids" in values else None,
+        name_pattern=values.get("name_pattern"),
+        providers=split_values(values["providers"]) if "providers" in values else None,
+        environments=split_values(values["environments"]) if "environments" in values else None,
+        connected_since=connected_since,
+    )
+    return cluster_filter, remaining
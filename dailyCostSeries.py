@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+import os
+import sys
+import datetime
+import numpy as np
+import pandas as pd
+import runProfiler
+
+OUTPUTS_DIR = "outputs"
+RESOURCES = ["CPU", "RAM", "Storage"]
+EFFICIENCY_FIELDS = ["costPerCpuProvisioned", "costPerRamGibProvisioned", "costPerStorageGibProvisioned"]
+
+ROLLING_WINDOWS = [7, 30]
+# A change point is a day where the trailing 7-day price moves this far (as a
+# fraction) from the 30 days before it.
+CHANGE_THRESHOLD = 0.15
+
+EPOCH = datetime.date(1970, 1, 1)
+
+# -------------------------
+# Collection
+# -------------------------
+def daily_points(items):
+    """
+    Reduce the items of an efficiency response to one [date, cpu, ram, storage]
+    hourly price per day (mean of the day's points). Plain lists, so they can go
+    into the checkpoint journal as they are.
+    """
+    by_day = {}
+    for item in items:
+        day = str(item.get("timestamp", ""))[:10]
+        if len(day) != 10:
+            continue
+        values = []
+        for field in EFFICIENCY_FIELDS:
+            try:
+                values.append(float(item.get(field)))
+            except (TypeError, ValueError):
+                values.append(float("nan"))
+        by_day.setdefault(day, []).append(values)
+    points = []
+    for day in sorted(by_day):
+        values = np.array(by_day[day])
+        valid = ~np.isnan(values)
+        # sum / count instead of nanmean, which warns on a day with no value for a resource.
+        counts = valid.sum(axis=0)
+        sums = np.where(valid, values, 0).sum(axis=0)
+        means = np.divide(sums, counts, out=np.full(len(EFFICIENCY_FIELDS), np.nan), where=counts > 0)
+        points.append([day] + [None if np.isnan(v) else float(v) for v in means])
+    return points
+
+def series_arrays(points):
+    """(days since epoch int32, prices float32 [n, 3]) from daily_points output."""
+    if not points:
+        return np.zeros(0, dtype=np.int32), np.zeros((0, len(RESOURCES)), dtype=np.float32)
+    days = np.array([(datetime.date.fromisoformat(p[0]) - EPOCH).days for p in points], dtype=np.int32)
+    prices = np.array([[np.nan if v is None else v for v in p[1:]] for p in points], dtype=np.float32)
+    order = np.argsort(days, kind="stable")
+    days, prices = days[order], prices[order]
+    # A day journaled twice (e.g. a resumed month) keeps its last value.
+    keep = np.append(days[1:] != days[:-1], True)
+    return days[keep], prices[keep]
+
+# -------------------------
+# Storage
+# -------------------------
+def save_series(path, series):
+    """
+    Store {cluster_id: (days, prices)} as one compressed npz: the clusters'
+    arrays are concatenated and located by offsets, CSR style.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cluster_ids = sorted(series)
+    lengths = [len(series[cid][0]) for cid in cluster_ids]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    days = np.concatenate([series[cid][0] for cid in cluster_ids]) if cluster_ids else np.zeros(0, dtype=np.int32)
+    prices = np.concatenate([series[cid][1] for cid in cluster_ids]) if cluster_ids else np.zeros((0, len(RESOURCES)), dtype=np.float32)
+    np.savez_compressed(path, cluster_ids=np.array(cluster_ids, dtype=str), offsets=offsets,
+                        days=days.astype(np.int32), prices=prices.astype(np.float32))
+
+def merge_series(stored, series):
+    """stored with the days of series added; a day in both keeps the value from series."""
+    merged = dict(stored)
+    for cid, (days, prices) in series.items():
+        if cid in merged:
+            days = np.concatenate([merged[cid][0], days])
+            prices = np.concatenate([merged[cid][1], prices])
+            order = np.argsort(days, kind="stable")
+            days, prices = days[order], prices[order]
+            keep = np.append(days[1:] != days[:-1], True)
+            days, prices = days[keep], prices[keep]
+        merged[cid] = (days, prices)
+    return merged
+
+def load_series(path):
+    with np.load(path) as data:
+        cluster_ids, offsets = data["cluster_ids"], data["offsets"]
+        days, prices = data["days"], data["prices"]
+    return {str(cid): (days[offsets[i]:offsets[i + 1]], prices[offsets[i]:offsets[i + 1]])
+            for i, cid in enumerate(cluster_ids)}
+
+# -------------------------
+# Fleet Metrics
+# -------------------------
+def fleet_cube(series):
+    """Align every cluster on one day axis: prices[cluster, day, resource], NaN where missing."""
+    cluster_ids = sorted(series)
+    non_empty = [series[cid][0] for cid in cluster_ids if len(series[cid][0])]
+    if not non_empty:
+        return cluster_ids, 0, np.full((len(cluster_ids), 0, len(RESOURCES)), np.nan, dtype=np.float32)
+    first_day = int(min(d[0] for d in non_empty))
+    last_day = int(max(d[-1] for d in non_empty))
+    cube = np.full((len(cluster_ids), last_day - first_day + 1, len(RESOURCES)), np.nan, dtype=np.float32)
+    for i, cid in enumerate(cluster_ids):
+        days, prices = series[cid]
+        cube[i, days - first_day] = prices
+    return cluster_ids, first_day, cube
+
+def rolling_mean(cube, window):
+    """Trailing mean over the day axis ignoring gaps; needs half the window to be present."""
+    valid = ~np.isnan(cube)
+    values = np.where(valid, cube, 0).astype(np.float64)
+    pad = np.zeros((cube.shape[0], 1, cube.shape[2]))
+    sums = np.concatenate([pad, np.cumsum(values, axis=1)], axis=1)
+    counts = np.concatenate([pad, np.cumsum(valid, axis=1)], axis=1)
+    window_sums = sums[:, window:] - sums[:, :-window] if cube.shape[1] >= window else np.zeros((cube.shape[0], 0, cube.shape[2]))
+    window_counts = counts[:, window:] - counts[:, :-window] if cube.shape[1] >= window else np.zeros_like(window_sums)
+    # The first window-1 days only have a partial window behind them.
+    head = min(window - 1, cube.shape[1])
+    window_sums = np.concatenate([sums[:, 1:head + 1], window_sums], axis=1)
+    window_counts = np.concatenate([counts[:, 1:head + 1], window_counts], axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = window_sums / window_counts
+    means[window_counts < (window + 1) // 2] = np.nan
+    return means
+
+def change_points(short_mean, long_mean, short_window=7, threshold=CHANGE_THRESHOLD):
+    """
+    Flag the first day on which the trailing short-window price differs by more
+    than threshold from the long-window price that ended just before it.
+    """
+    previous_long = np.full_like(long_mean, np.nan)
+    previous_long[:, short_window:] = long_mean[:, :-short_window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        change = np.abs(short_mean - previous_long) / previous_long
+    shifted = change > threshold
+    onset = shifted.copy()
+    onset[:, 1:] &= ~shifted[:, :-1]
+    return onset
+
+def rolling_frame(series):
+    """One row per cluster, day and resource with the rolling prices and change point flags."""
+    cluster_ids, first_day, cube = fleet_cube(series)
+    if cube.shape[1] == 0:
+        return pd.DataFrame(columns=["cluster_id", "date", "resource", "cost_per_unit_hour",
+                                     "rolling_7d", "rolling_30d", "change_point"])
+    rolling = {window: rolling_mean(cube, window) for window in ROLLING_WINDOWS}
+    flags = change_points(rolling[7], rolling[30])
+    cluster_idx, day_idx, resource_idx = np.nonzero(~np.isnan(cube))
+    dates = pd.to_datetime(first_day + day_idx, unit="D").strftime("%Y-%m-%d")
+    return pd.DataFrame({
+        "cluster_id": np.array(cluster_ids)[cluster_idx],
+        "date": dates,
+        "resource": np.array(RESOURCES)[resource_idx],
+        "cost_per_unit_hour": cube[cluster_idx, day_idx, resource_idx].round(6),
+        "rolling_7d": rolling[7][cluster_idx, day_idx, resource_idx].round(6),
+        "rolling_30d": rolling[30][cluster_idx, day_idx, resource_idx].round(6),
+        "change_point": flags[cluster_idx, day_idx, resource_idx],
+    })
+
+def write_rolling_report(series, csv_path):
+    with runProfiler.stage("aggregate"):
+        df = rolling_frame(series)
+    with runProfiler.stage("write"):
+        df.to_csv(csv_path, index=False)
+    print(f"Daily rolling costs saved to {csv_path} ({int(df['change_point'].sum())} change points)", flush=True)
+    return df
+
+def write_daily_report(series, series_path, csv_path):
+    with runProfiler.stage("write"):
+        save_series(series_path, series)
+    print(f"Daily cost series saved to {series_path}", flush=True)
+    return write_rolling_report(series, csv_path)
+
+def list_org_dirs():
+    if not os.path.isdir(OUTPUTS_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(OUTPUTS_DIR)
+        if not name.startswith("_") and os.path.exists(os.path.join(OUTPUTS_DIR, name, "series", "efficiency_daily.npz"))
+    )
+
+def main():
+    """Recompute the rolling metrics from the stored series, without calling the API."""
+    selected_arg = sys.argv[1].strip() if len(sys.argv) > 1 else "all"
+    org_names = list_org_dirs() if selected_arg.lower() == "all" else [selected_arg.replace(" ", "_")]
+    if not org_names:
+        print(f"No daily cost series found under {OUTPUTS_DIR}. Run monthlySavingsReport.py first.", flush=True)
+        sys.exit(1)
+    for org_name in org_names:
+        org_dir = os.path.join(OUTPUTS_DIR, org_name)
+        series_path = os.path.join(org_dir, "series", "efficiency_daily.npz")
+        if not os.path.exists(series_path):
+            print(f"{series_path} not found.", flush=True)
+            continue
+        write_rolling_report(load_series(series_path), os.path.join(org_dir, "csv", "daily_cost_rolling.csv"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import threading
+import importlib.util
+import pandas as pd
+
+OUTPUTS_DIR = "outputs"
+FLEET_DIR = os.path.join(OUTPUTS_DIR, "_fleet")
+DATASET_DIR = os.path.join(FLEET_DIR, "dataset")
+AGGREGATES_DIR = os.path.join(FLEET_DIR, "aggregates")
+MANIFEST_PATH = os.path.join(FLEET_DIR, "manifest.json")
+
+# Orgs can finish concurrently; the manifest and aggregates are updated one at a time.
+_rollup_lock = threading.Lock()
+
+# Parquet keeps the partitions readable from other tools; without pyarrow the
+# pandas pickle format still keeps the dtypes.
+if importlib.util.find_spec("pyarrow") is not None:
+    PARTITION_FILE = "part.parquet"
+else:
+    PARTITION_FILE = "part.pkl"
+
+# table name -> (source csv, numeric columns)
+TABLES = {
+    "cluster_details": ("cluster_details.csv", ["CPU Count"]),
+    "monthly_savings": ("monthly_savings_report.csv", [
+        "cpu_provisioned", "cpu_requested", "cpu_used", "cpu_price",
+        "ram_provisioned", "ram_requested", "ram_used", "ram_price",
+        "storage_provisioned", "storage_requested",
+        "avg_cpu_provisioned", "avg_cpu_requested", "avg_ram_provisioned", "avg_ram_requested",
+        "avg_storage_provisioned", "avg_storage_requested",
+        "savings_per_month_cpu", "savings_per_month_ram", "savings_per_month_storage", "total_savings_per_month"]),
+    "resource_costs": ("resource_costs_report.csv", ["avg_hourly_cost", "avg_daily_cost", "avg_monthly_cost"]),
+}
+
+# -------------------------
+# Partition Storage
+# -------------------------
+def write_frame(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    if path.endswith(".parquet"):
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+def read_frame(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+def save_manifest(manifest):
+    os.makedirs(FLEET_DIR, exist_ok=True)
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+
+def partition_path(table, org_name):
+    return os.path.join(DATASET_DIR, table, f"org={org_name}", PARTITION_FILE)
+
+def type_table(table, df, org_name):
+    """Convert the string formatted report columns into typed columns."""
+    numeric_cols = TABLES[table][1]
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    if table == "cluster_details":
+        if "WOOP enabled %" in df.columns:
+            df["WOOP enabled %"] = pd.to_numeric(df["WOOP enabled %"].astype(str).str.rstrip("%"), errors="coerce")
+        if "Connected Date" in df.columns:
+            df["Connected Date"] = pd.to_datetime(df["Connected Date"], errors="coerce")
+        for col in ["Provider", "Environment", "Extended Support", "WOOP Enabled"]:
+            if col in df.columns:
+                df[col] = df[col].fillna("").astype(str)
+    if "month" in df.columns:
+        df["month"] = df["month"].astype(str)
+    df.insert(0, "org", org_name)
+    return df
+
+# -------------------------
+# Incremental Update
+# -------------------------
+def update_org(org_name, manifest=None):
+    """
+    Refresh the dataset partitions of one org whose report CSVs changed since the
+    last rollup. Returns the list of tables that were rewritten.
+    """
+    own_manifest = manifest is None
+    if own_manifest:
+        manifest = load_manifest()
+    csv_dir = os.path.join(OUTPUTS_DIR, org_name, "csv")
+    org_entry = manifest.setdefault(org_name, {})
+    changed = []
+    for table, (source_csv, numeric_cols) in TABLES.items():
+        source_path = os.path.join(csv_dir, source_csv)
+        if not os.path.exists(source_path):
+            continue
+        mtime = os.path.getmtime(source_path)
+        target = partition_path(table, org_name)
+        if org_entry.get(table, {}).get("source_mtime") == mtime and os.path.exists(target):
+            continue
+        try:
+            df = pd.read_csv(source_path)
+        except pd.errors.EmptyDataError:
+            df = pd.DataFrame()
+        df = type_table(table, df, org_name)
+        write_frame(df, target)
+        org_entry[table] = {"source_mtime": mtime, "rows": len(df)}
+        changed.append(table)
+    if own_manifest:
+        save_manifest(manifest)
+    return changed
+
+def load_table(table):
+    """Load every org partition of a table in a single pass."""
+    table_dir = os.path.join(DATASET_DIR, table)
+    frames = []
+    if os.path.isdir(table_dir):
+        for partition in sorted(os.listdir(table_dir)):
+            path = os.path.join(table_dir, partition, PARTITION_FILE)
+            if os.path.exists(path):
+                frames.append(read_frame(path))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+# -------------------------
+# Fleet Aggregates
+# -------------------------
+def build_aggregates():
+    os.makedirs(AGGREGATES_DIR, exist_ok=True)
+    details = load_table("cluster_details")
+    savings = load_table("monthly_savings")
+    aggregates = {}
+
+    if not savings.empty:
+        aggregates["savings_by_month"] = savings.groupby("month", as_index=False).agg(
+            orgs=("org", "nunique"),
+            clusters=("clusterid", "nunique"),
+            savings_cpu=("savings_per_month_cpu", "sum"),
+            savings_ram=("savings_per_month_ram", "sum"),
+            savings_storage=("savings_per_month_storage", "sum"),
+            total_savings=("total_savings_per_month", "sum"),
+        ).sort_values("month")
+
+    if not details.empty:
+        aggregates["cpu_by_provider"] = details.groupby("Provider", as_index=False).agg(
+            orgs=("org", "nunique"),
+            clusters=("ClusterID", "nunique"),
+            cpu_count=("CPU Count", "sum"),
+        )
+
+        woop = details.assign(woop_enabled=(details["WOOP Enabled"] == "Yes").astype(int))
+        woop_by_org = woop.groupby("org", as_index=False).agg(
+            clusters=("ClusterID", "nunique"),
+            woop_enabled_clusters=("woop_enabled", "sum"),
+            mean_woop_enabled_pct=("WOOP enabled %", "mean"),
+        )
+        fleet_row = pd.DataFrame([{
+            "org": "ALL",
+            "clusters": woop["ClusterID"].nunique(),
+            "woop_enabled_clusters": woop["woop_enabled"].sum(),
+            "mean_woop_enabled_pct": woop["WOOP enabled %"].mean(),
+        }])
+        woop_by_org = pd.concat([woop_by_org, fleet_row], ignore_index=True)
+        woop_by_org["adoption_pct"] = (woop_by_org["woop_enabled_clusters"] / woop_by_org["clusters"] * 100).round(2)
+        aggregates["woop_adoption"] = woop_by_org
+
+        aggregates["extended_support_exposure"] = details.groupby(["Provider", "Extended Support"], as_index=False).agg(
+            orgs=("org", "nunique"),
+            clusters=("ClusterID", "nunique"),
+            cpu_count=("CPU Count", "sum"),
+        )
+
+    for name, df in aggregates.items():
+        path = os.path.join(AGGREGATES_DIR, f"{name}.csv")
+        df.to_csv(path, index=False)
+        print(f"Fleet aggregate saved to {path}", flush=True)
+    return aggregates
+
+def update_fleet_rollup(org_name):
+    """Hook for the report scripts: refresh one org's partitions and the fleet totals."""
+    with _rollup_lock:
+        changed = update_org(org_name)
+        if changed:
+            print(f"Fleet rollup updated for {org_name}: {', '.join(changed)}", flush=True)
+            build_aggregates()
+
+def list_org_dirs():
+    if not os.path.isdir(OUTPUTS_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(OUTPUTS_DIR)
+        if not name.startswith("_") and os.path.isdir(os.path.join(OUTPUTS_DIR, name, "csv"))
+    )
+
+def main():
+    selected_arg = sys.argv[1].strip() if len(sys.argv) > 1 else "all"
+    if selected_arg.lower() == "all":
+        org_names = list_org_dirs()
+    else:
+        org_names = [selected_arg.replace(" ", "_")]
+    if not org_names:
+        print(f"No organization reports found under {OUTPUTS_DIR}.", flush=True)
+        sys.exit(1)
+    manifest = load_manifest()
+    for org_name in org_names:
+        changed = update_org(org_name, manifest)
+        if changed:
+            print(f"Updated {org_name}: {', '.join(changed)}", flush=True)
+        else:
+            print(f"{org_name} is up to date.", flush=True)
+    save_manifest(manifest)
+    build_aggregates()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+import sqlite3
+import datetime
+import pandas as pd
+import reportPartitions
+
+OUTPUTS_DIR = "outputs"
+CUBE_PATH = os.path.join(OUTPUTS_DIR, "_fleet", "metrics.db")
+DIMENSIONS = ["org", "cluster_id", "cluster_name", "provider", "environment", "month", "resource", "metric"]
+
+# (resource, metric) -> column of monthly_savings_report.csv
+SAVINGS_METRICS = {
+    ("CPU", "provisioned"): "cpu_provisioned",
+    ("CPU", "requested"): "cpu_requested",
+    ("CPU", "used"): "cpu_used",
+    ("CPU", "avg_provisioned"): "avg_cpu_provisioned",
+    ("CPU", "avg_requested"): "avg_cpu_requested",
+    ("CPU", "savings"): "savings_per_month_cpu",
+    ("RAM", "provisioned"): "ram_provisioned",
+    ("RAM", "requested"): "ram_requested",
+    ("RAM", "used"): "ram_used",
+    ("RAM", "avg_provisioned"): "avg_ram_provisioned",
+    ("RAM", "avg_requested"): "avg_ram_requested",
+    ("RAM", "savings"): "savings_per_month_ram",
+    ("Storage", "provisioned"): "storage_provisioned",
+    ("Storage", "requested"): "storage_requested",
+    ("Storage", "avg_provisioned"): "avg_storage_provisioned",
+    ("Storage", "avg_requested"): "avg_storage_requested",
+    ("Storage", "savings"): "savings_per_month_storage",
+    ("Total", "savings"): "total_savings_per_month",
+}
+
+# Dimensions stored in one case; filter values are put in the same case, so
+# --provider eks matches the stored EKS.
+RESOURCE_NAMES = {"cpu": "CPU", "ram": "RAM", "storage": "Storage", "total": "Total"}
+CASE_NORMALIZERS = {
+    "cluster_id": str.lower,
+    "provider": str.upper,
+    "environment": str.title,
+    "resource": lambda value: RESOURCE_NAMES.get(value.lower(), value),
+    "metric": str.lower,
+}
+
+# metric -> column of resource_costs_report.csv (cost per CPU / GiB)
+COST_METRICS = {
+    "cost_per_unit_hour": "avg_hourly_cost",
+    "cost_per_unit_day": "avg_daily_cost",
+    "cost_per_unit_month": "avg_monthly_cost",
+}
+
+# -------------------------
+# Store
+# -------------------------
+def connect(path=CUBE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS metrics (
+            org TEXT NOT NULL,
+            cluster_id TEXT NOT NULL,
+            cluster_name TEXT,
+            provider TEXT,
+            environment TEXT,
+            month TEXT NOT NULL,
+            resource TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            value REAL,
+            PRIMARY KEY (org, cluster_id, month, resource, metric)
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metrics_slice ON metrics (resource, metric, month)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_metrics_cluster ON metrics (provider, environment, month)")
+    return conn
+
+def metric_rows(org_name, details, savings, costs):
+    """Turn the report CSVs of one org into long (dimensions..., value) rows."""
+    frames = []
+    if not savings.empty:
+        savings = savings.rename(columns={"clusterid": "cluster_id", "clustername": "cluster_name"})
+        for (resource, metric), col in SAVINGS_METRICS.items():
+            if col not in savings.columns:
+                continue
+            part = savings[["cluster_id", "cluster_name", "month"]].copy()
+            part["resource"] = resource
+            part["metric"] = metric
+            part["value"] = pd.to_numeric(savings[col], errors="coerce")
+            frames.append(part)
+    if not costs.empty:
+        for metric, col in COST_METRICS.items():
+            part = costs[["cluster_id", "cluster_name", "month", "resource"]].copy()
+            part["metric"] = metric
+            part["value"] = pd.to_numeric(costs[col], errors="coerce")
+            frames.append(part)
+    if not frames:
+        return pd.DataFrame(columns=DIMENSIONS + ["value"])
+    rows = pd.concat(frames, ignore_index=True)
+    meta = details.rename(columns={"ClusterID": "cluster_id", "Provider": "provider", "Environment": "environment"})
+    meta = meta.reindex(columns=["cluster_id", "provider", "environment"]).drop_duplicates("cluster_id")
+    rows = rows.merge(meta, on="cluster_id", how="left")
+    rows["org"] = org_name
+    rows["month"] = rows["month"].astype(str)
+    for column, normalize in CASE_NORMALIZERS.items():
+        rows[column] = rows[column].where(rows[column].isna(), rows[column].astype(str).map(normalize))
+    return rows[DIMENSIONS + ["value"]]
+
+def read_report(path):
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    try:
+        return pd.read_csv(path)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+
+def ingest_org(org_name, conn=None):
+    """Replace the cube rows of one org with the contents of its current report CSVs."""
+    own_conn = conn is None
+    if own_conn:
+        conn = connect()
+    csv_dir = os.path.join(OUTPUTS_DIR, org_name, "csv")
+    rows = metric_rows(
+        org_name,
+        read_report(os.path.join(csv_dir, "cluster_details.csv")),
+        read_report(os.path.join(csv_dir, "monthly_savings_report.csv")),
+        read_report(os.path.join(csv_dir, "resource_costs_report.csv")),
+    )
+    with conn:
+        conn.execute("DELETE FROM metrics WHERE org = ?", (org_name,))
+        conn.executemany(
+            f"INSERT OR REPLACE INTO metrics ({', '.join(DIMENSIONS)}, value) VALUES ({', '.join('?' * (len(DIMENSIONS) + 1))})",
+            rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None),
+        )
+    if own_conn:
+        conn.close()
+    return len(rows)
+
+def ingest_partitions(org_name, months, conn=None):
+    """
+    Replace only the cube rows of the given months of one org, read from its
+    incremental month partitions (see reportPartitions.py).
+    """
+    if not months:
+        return 0
+    own_conn = conn is None
+    if own_conn:
+        conn = connect()
+    org_dir = os.path.join(OUTPUTS_DIR, org_name)
+    rows = metric_rows(
+        org_name,
+        read_report(os.path.join(org_dir, "csv", "cluster_details.csv")),
+        reportPartitions.load_partitions(org_dir, "monthly_savings", months),
+        reportPartitions.load_partitions(org_dir, "resource_costs", months),
+    )
+    with conn:
+        conn.execute(f"DELETE FROM metrics WHERE org = ? AND month IN ({', '.join('?' * len(months))})", [org_name] + list(months))
+        conn.executemany(
+            f"INSERT OR REPLACE INTO metrics ({', '.join(DIMENSIONS)}, value) VALUES ({', '.join('?' * (len(DIMENSIONS) + 1))})",
+            rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None),
+        )
+    if own_conn:
+        conn.close()
+    return len(rows)
+
+# -------------------------
+# Queries
+# -------------------------
+def build_filters(args):
+    clauses, params = [], []
+    for column in ["org", "provider", "environment", "resource", "metric", "cluster_id"]:
+        values = getattr(args, column, None)
+        if values:
+            normalize = CASE_NORMALIZERS.get(column)
+            values = [normalize(v.strip()) if normalize else v.strip() for v in values.split(",")]
+            # Org names are directory names and keep their case; match them in any.
+            collate = " COLLATE NOCASE" if normalize is None else ""
+            clauses.append(f"{column}{collate} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    since = args.since
+    if args.last_months:
+        today = datetime.date.today()
+        index = today.year * 12 + today.month - 1 - args.last_months
+        since = f"{index // 12}-{index % 12 + 1:02d}"
+    if since:
+        clauses.append("month >= ?")
+        params.append(since)
+    if args.until:
+        clauses.append("month <= ?")
+        params.append(args.until)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+def query(conn, args):
+    where, params = build_filters(args)
+    group_by = [g.strip() for g in args.group_by.split(",")] if args.group_by else []
+    for column in group_by:
+        if column not in DIMENSIONS:
+            raise ValueError(f"Cannot group by '{column}', choose from {', '.join(DIMENSIONS)}")
+    agg = args.agg.upper()
+    if agg not in ("SUM", "AVG", "MIN", "MAX", "COUNT"):
+        raise ValueError(f"Unsupported aggregate '{args.agg}'")
+    if group_by:
+        select = ", ".join(group_by)
+        sql = (f"SELECT {select}, {agg}(value) AS value FROM metrics {where} "
+               f"GROUP BY {select} ORDER BY {select}")
+    else:
+        sql = f"SELECT {', '.join(DIMENSIONS)}, value FROM metrics {where} ORDER BY org, cluster_name, month, resource, metric"
+    return pd.read_sql_query(sql, conn, params=params)
+
+def month_over_month(conn, args):
+    """Clusters whose metric went up compared with the previous month."""
+    where, params = build_filters(args)
+    sql = f"""
+        SELECT * FROM (
+            SELECT org, cluster_id, cluster_name, provider, environment, resource, metric, month, value,
+                   LAG(value) OVER (PARTITION BY org, cluster_id, resource, metric ORDER BY month) AS previous_value
+            FROM metrics {where}
+        )
+        WHERE previous_value IS NOT NULL AND value > previous_value
+        ORDER BY org, cluster_name, resource, month"""
+    df = pd.read_sql_query(sql, conn, params=params)
+    df["change_pct"] = ((df["value"] - df["previous_value"]) / df["previous_value"].where(df["previous_value"] != 0) * 100).round(2)
+    return df
+
+def list_org_dirs():
+    if not os.path.isdir(OUTPUTS_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(OUTPUTS_DIR)
+        if not name.startswith("_") and os.path.isdir(os.path.join(OUTPUTS_DIR, name, "csv"))
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Local metrics cube over the savings and resource cost reports.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="Load report CSVs into the cube")
+    ingest.add_argument("org", nargs="?", default="all", help="Organization name or 'all'")
+    for name, help_text in [("query", "Filter and aggregate metrics"), ("increases", "Month over month increases")]:
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--org")
+        p.add_argument("--cluster-id", dest="cluster_id")
+        p.add_argument("--provider", help="e.g. EKS,GKE")
+        p.add_argument("--environment", help="e.g. Production")
+        p.add_argument("--resource", help="CPU, RAM, Storage or Total")
+        p.add_argument("--metric", help="e.g. cost_per_unit_hour, requested, savings")
+        p.add_argument("--since", help="First month, YYYY-MM")
+        p.add_argument("--until", help="Last month, YYYY-MM")
+        p.add_argument("--last-months", dest="last_months", type=int, help="Only the last N completed months")
+        p.add_argument("--csv", help="Write the result to this CSV instead of printing it")
+        if name == "query":
+            p.add_argument("--group-by", dest="group_by", help=f"Comma separated: {', '.join(DIMENSIONS)}")
+            p.add_argument("--agg", default="avg", help="sum, avg, min, max or count")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        org_names = list_org_dirs() if args.org.lower() == "all" else [args.org.replace(" ", "_")]
+        conn = connect()
+        for org_name in org_names:
+            count = ingest_org(org_name, conn)
+            print(f"Loaded {count} metric rows for {org_name}", flush=True)
+        conn.close()
+        return
+
+    if not os.path.exists(CUBE_PATH):
+        print(f"{CUBE_PATH} not found. Run 'python metricsCube.py ingest all' first.", flush=True)
+        sys.exit(1)
+    conn = connect()
+    try:
+        df = query(conn, args) if args.command == "query" else month_over_month(conn, args)
+    except ValueError as e:
+        print(e, flush=True)
+        sys.exit(1)
+    finally:
+        conn.close()
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        print(f"{len(df)} rows saved to {args.csv}")
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,10 @@ import subprocess
 import pandas as pd
 import datetime
 import calendar
+import runProfiler
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ORG_WORKERS = 4
 
 # -------------------------
 # Helper Functions
@@ -21,10 +25,12 @@ def get_month_range(year, month):
 # Dummy function to represent fetching monthly CPU info.
 def fetch_cluster_info(api_key, org_id, csv_path):
     # Read the cluster_details.csv and sort by Connected Date
-    df = pd.read_csv(csv_path)
+    with runProfiler.stage("parse"):
+        df = pd.read_csv(csv_path)
     if "Connected Date" in df.columns:
-        df["Connected Date"] = pd.to_datetime(df["Connected Date"], errors='coerce')
-        df.sort_values(by="Connected Date", inplace=True)
+        with runProfiler.stage("aggregate"):
+            df["Connected Date"] = pd.to_datetime(df["Connected Date"], errors='coerce')
+            df.sort_values(by="Connected Date", inplace=True)
     else:
         print("Connected Date column not found in CSV.", flush=True)
         sys.exit(1)
@@ -34,14 +40,14 @@ def fetch_cluster_info(api_key, org_id, csv_path):
     
     # For demonstration, we simply output the sorted DataFrame.
     output_csv = os.path.join(os.path.dirname(csv_path), "monthly_cpu_report.csv")
-    df.to_csv(output_csv, index=False)
+    with runProfiler.stage("write"):
+        df.to_csv(output_csv, index=False)
     print(f"Monthly CPU report saved to {output_csv}", flush=True)
 
 def process_org(selected_org, org_row):
     api_key = org_row["key"]
-    org_dir_local = os.path.join("outputs", selected_org.replace(" ", "_"))
-    global org_dir
-    org_dir = org_dir_local
+    # A local, not a global: orgs run side by side.
+    org_dir = os.path.join("outputs", selected_org.replace(" ", "_"))
     os.makedirs(org_dir, exist_ok=True)
     csv_dir = os.path.join(org_dir, "csv")
     details_csv = os.path.join(csv_dir, "cluster_details.csv")
@@ -49,9 +55,9 @@ def process_org(selected_org, org_row):
         print(f"cluster_details.csv not found for {selected_org}. Running orgClusterDetails.py...", flush=True)
         try:
             if save_json == "on":
-                subprocess.run(["python", "orgClusterDetails.py", selected_org, "on"], check=True)
+                subprocess.run(["python", "orgClusterDetails.py", selected_org, "on"] + runProfiler.to_argv(), check=True)
             else:
-                subprocess.run(["python", "orgClusterDetails.py", selected_org], check=True)
+                subprocess.run(["python", "orgClusterDetails.py", selected_org] + runProfiler.to_argv(), check=True)
         except subprocess.CalledProcessError as e:
             print(f"Error running orgClusterDetails.py for {selected_org}: {e}", flush=True)
             sys.exit(1)
@@ -61,12 +67,16 @@ def process_org(selected_org, org_row):
     else:
         print(f"Found cluster_details.csv for {selected_org}.", flush=True)
     os.makedirs(os.path.join(org_dir, "json"), exist_ok=True)
-    fetch_cluster_info(api_key, org_row["org_id"], details_csv)
+    with runProfiler.org_profile(org_dir, "monthlyClusterCPUReport"):
+        fetch_cluster_info(api_key, org_row["org_id"], details_csv)
 
 def main():
     global save_json
+    if "--profile" in sys.argv:
+        runProfiler.enable()
+        sys.argv = [arg for arg in sys.argv if arg != "--profile"]
     if len(sys.argv) < 2:
-        print("Usage: python orgClusterDetails.py <Organization | all> <on> (If you want to save resulting jsons)", flush=True)
+        print("Usage: python orgClusterDetails.py <Organization | all> <on> (If you want to save resulting jsons) [--profile]", flush=True)
         sys.exit(1)
     elif len(sys.argv) == 2:
         save_json="off"
@@ -79,10 +89,23 @@ def main():
         print(f"Error loading orgs.csv: {e}", flush=True)
         sys.exit(1)
     if selected_arg.lower() == "all":
-        for idx, org_row in orgs_df.iterrows():
-            selected_org = org_row["org"]
-            print(f"Processing organization: {selected_org}", flush=True)
-            process_org(selected_org, org_row)
+        # Orgs run side by side; one failing must not abort the rest of the run.
+        failed_orgs = []
+        with ThreadPoolExecutor(max_workers=ORG_WORKERS) as executor:
+            futures = {}
+            for idx, org_row in orgs_df.iterrows():
+                selected_org = org_row["org"]
+                print(f"Processing organization: {selected_org}", flush=True)
+                futures[executor.submit(process_org, selected_org, org_row)] = selected_org
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except (Exception, SystemExit) as e:
+                    print(f"Error processing organization {futures[future]}: {e!r}", flush=True)
+                    failed_orgs.append(futures[future])
+        if failed_orgs:
+            print(f"Failed organizations: {', '.join(failed_orgs)}", flush=True)
+            sys.exit(1)
     else:
         try:
             org_row = orgs_df[orgs_df["org"] == selected_arg].iloc[0]
@@ -7,6 +7,29 @@ import pandas as pd
 import datetime
 import calendar
 import json
+import castaiApi
+import clusterFilters
+import dailyCostSeries
+import fleetRollup
+import metricsCube
+import reportPartitions
+import runProfiler
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+MONTH_FETCH_WORKERS = 8
+ORG_WORKERS = 4
+CLUSTER_DEADLINE_SECONDS = castaiApi.DEFAULT_CLUSTER_DEADLINE
+
+# monthly_savings_report.csv columns, in file order.
+SAVINGS_COLUMNS = ["clusterid", "clustername", "connected_date", "month", "cpu_provisioned", "cpu_requested", "cpu_used",
+                   "cpu_price", "ram_provisioned", "ram_requested", "ram_used", "ram_price", "storage_provisioned",
+                   "storage_requested", "avg_cpu_provisioned", "avg_cpu_requested", "avg_ram_provisioned",
+                   "avg_ram_requested", "avg_storage_provisioned", "avg_storage_requested", "savings_per_month_cpu",
+                   "savings_per_month_ram", "savings_per_month_storage", "total_savings_per_month"]
+# Cells of the cluster months a --time-budget run did not get to.
+PENDING = "PENDING"
+# Journals of unfinished runs kept per org; a run that finishes removes its own.
+CHECKPOINT_JOURNALS_KEPT = 5
 
 # -------------------------
 # Helper Functions for Time Ranges
@@ -20,22 +43,50 @@ def get_month_range(year, month):
     end_str = end.strftime("%Y-%m-%dT%H:%M:%S.000000000Z")
     return start_str, end_str
 
+def parse_month(value, flag):
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise ValueError(f"{flag} expects YYYY-MM, got '{value}'")
+
+def parse_window_args(argv):
+    """
+    Remove --since / --until YYYY-MM from argv. Returns (since, until, remaining
+    argv) with the months as dates on the 1st, or None when not given.
+    """
+    window = {"--since": None, "--until": None}
+    remaining = []
+    i = 0
+    while i < len(argv):
+        if argv[i] in window:
+            if i + 1 >= len(argv):
+                raise ValueError(f"{argv[i]} needs a value")
+            window[argv[i]] = parse_month(argv[i + 1], argv[i])
+            i += 2
+            continue
+        remaining.append(argv[i])
+        i += 1
+    since, until = window["--since"], window["--until"]
+    if since and until and since > until:
+        raise ValueError(f"--since {since:%Y-%m} is after --until {until:%Y-%m}")
+    return since, until, remaining
+
+def window_output_name(file_name, since, until):
+    """Windowed runs write next to the full history, e.g. monthly_savings_report_2025-01_to_2025-03.csv."""
+    if not since and not until:
+        return file_name
+    stem, ext = os.path.splitext(file_name)
+    first = since.strftime("%Y-%m") if since else "start"
+    last = until.strftime("%Y-%m") if until else "latest"
+    return f"{stem}_{first}_to_{last}{ext}"
+
 # -------------------------
 # Efficiency Endpoint Functions
 # -------------------------
 def get_efficiency_summary(api_key, cluster_id, start_time, end_time):
     url = f"https://api.cast.ai/v1/cost-reports/clusters/{cluster_id}/efficiency?startTime={start_time}&endTime={end_time}"
-    headers = {"accept": "application/json", "X-API-Key": api_key}
-    resp = requests.get(url, headers=headers)
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"Error decoding efficiency data for {cluster_id}: {e}", flush=True)
-        data = {}
-    if save_json == "on":
-        file_path = os.path.join(org_dir, "json", f"efficiency_{cluster_id}_{start_time[:7]}.json")
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=4)
+    data = castaiApi.get_json(api_key, url, f"efficiency data for {cluster_id}",
+                              save_as=f"efficiency_{cluster_id}_{start_time[:7]}.json", priority=castaiApi.PRIORITY_HISTORY)
     summary = data.get("summary", {})
     try:
         costPerCpu = float(summary.get("costPerCpuProvisioned", 0))
@@ -49,8 +100,11 @@ def get_efficiency_summary(api_key, cluster_id, start_time, end_time):
         costPerStorage = float(summary.get("costPerStorageGibProvisioned", 0))
     except:
         costPerStorage = 0.0
-    return {"costPerCpu": costPerCpu, "costPerRam": costPerRam, "costPerStorage": costPerStorage}
+    # The per-day prices behind the summary, kept for the daily cost series.
+    daily = dailyCostSeries.daily_points(data.get("items", []))
+    return {"costPerCpu": costPerCpu, "costPerRam": costPerRam, "costPerStorage": costPerStorage, "daily": daily}
 
+@runProfiler.staged("parse")
 def get_preonboard_efficiency(api_key, cluster_id, connected_date):
     year = connected_date.year
     month = connected_date.month
@@ -70,24 +124,17 @@ def get_current_efficiency(api_key, cluster_id, start_str, end_str):
     current_cpu = eff["costPerCpu"] * 24 * days
     current_ram = eff["costPerRam"] * 24 * days
     current_storage = eff["costPerStorage"] * 24 * days
-    return {"current_cpu": current_cpu, "current_ram": current_ram, "current_storage": current_storage}
+    return {"current_cpu": current_cpu, "current_ram": current_ram, "current_storage": current_storage,
+            "costPerCpu": eff["costPerCpu"], "costPerRam": eff["costPerRam"], "costPerStorage": eff["costPerStorage"],
+            "daily": eff["daily"]}
 
 # -------------------------
 # Resource Usage Aggregation
 # -------------------------
 def get_monthly_resource_usage(api_key, cluster_id, start_time, end_time):
     url = f"https://api.cast.ai/v1/cost-reports/clusters/{cluster_id}/resource-usage?startTime={start_time}&endTime={end_time}"
-    headers = {"accept": "application/json", "X-API-Key": api_key}
-    resp = requests.get(url, headers=headers)
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"Error decoding resource usage for {cluster_id}: {e}", flush=True)
-        data = {}
-    if save_json == "on":
-        file_path = os.path.join(org_dir, "json", f"resource_usage_{cluster_id}_{start_time[:7]}.json")
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=4)
+    data = castaiApi.get_json(api_key, url, f"resource usage for {cluster_id}",
+                              save_as=f"resource_usage_{cluster_id}_{start_time[:7]}.json", priority=castaiApi.PRIORITY_HISTORY)
     sums = {
         "cpu_provisioned": 0.0,
         "cpu_requested": 0.0,
@@ -133,18 +180,259 @@ def get_monthly_resource_usage(api_key, cluster_id, start_time, end_time):
             pass
     return sums
 
+# -------------------------
+# Checkpoint Journal
+# -------------------------
+def open_checkpoint_journal(checkpoint_dir, resume):
+    """
+    Returns (journal_path, completed) for the org owning checkpoint_dir.
+    Each run appends to its own journal in that directory. With resume
+    enabled the most recent journal is reopened and its records are loaded, so
+    finished (cluster, month) units and baselines are not fetched again.
+    A new run keeps the CHECKPOINT_JOURNALS_KEPT latest older journals.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    completed = {"baseline": {}, "month": {}}
+    journals = sorted(f for f in os.listdir(checkpoint_dir) if f.startswith("savings_") and f.endswith(".jsonl"))
+    if resume:
+        if journals:
+            journal_path = os.path.join(checkpoint_dir, journals[-1])
+            truncate_torn_line(journal_path)
+            completed = load_checkpoint_journal(journal_path)
+            print(f"Resuming from {journal_path}: {len(completed['month'])} months already computed.", flush=True)
+            return journal_path, completed
+        print("No checkpoint journal found, starting a new run.", flush=True)
+    for name in journals[:-CHECKPOINT_JOURNALS_KEPT]:
+        os.remove(os.path.join(checkpoint_dir, name))
+    run_id = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    journal_path = os.path.join(checkpoint_dir, f"savings_{run_id}.jsonl")
+    return journal_path, completed
+
+def truncate_torn_line(journal_path):
+    """Cut a half written last line, so records appended on resume start on a line of their own."""
+    with open(journal_path, "r+b") as f:
+        content = f.read()
+        if content and not content.endswith(b"\n"):
+            f.truncate(content.rfind(b"\n") + 1)
+
+def load_checkpoint_journal(journal_path):
+    completed = {"baseline": {}, "month": {}}
+    with open(journal_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash can leave the last line half written; that unit is simply redone.
+                continue
+            if record.get("kind") == "baseline":
+                completed["baseline"][record["cluster_id"]] = record["baseline"]
+            elif record.get("kind") == "month":
+                completed["month"][(record["cluster_id"], record["month"])] = record
+    return completed
+
+def append_checkpoint(journal, record):
+    journal.write(json.dumps(record) + "\n")
+    journal.flush()
+    os.fsync(journal.fileno())
+
 # -------------------------
 # Main Report Generation Function
 # -------------------------
-def generate_monthly_savings_report(api_key, input_csv, savings_output_csv, resource_cost_output_csv):
+@runProfiler.staged("parse")
+def compute_month_unit(api_key, cluster_id, cluster_name, connected_date_str, year, month, baseline):
+    """
+    Fetch one (cluster, month) unit and return its savings row, resource cost
+    rows and daily prices. baseline may be a Future still being fetched; it
+    is only waited for once the month's own calls are done.
+    """
+    month_str = f"{year}-{month:02d}"
+    start_str, end_str = get_month_range(year, month)
+    days_in_month = calendar.monthrange(year, month)[1]
+
+    current_eff = get_current_efficiency(api_key, cluster_id, start_str, end_str)
+    current_cpu = current_eff["current_cpu"]
+    current_ram = current_eff["current_ram"]
+    current_storage = current_eff["current_storage"]
+
+    usage = get_monthly_resource_usage(api_key, cluster_id, start_str, end_str)
+    try:
+        cpu_prov = float(usage.get("cpu_provisioned", 0))
+    except:
+        cpu_prov = 0.0
+    try:
+        cpu_req = float(usage.get("cpu_requested", 0))
+    except:
+        cpu_req = 0.0
+    try:
+        cpu_used = float(usage.get("cpu_used", 0))
+    except:
+        cpu_used = 0.0
+    try:
+        ram_prov = float(usage.get("ram_provisioned", 0))
+    except:
+        ram_prov = 0.0
+    try:
+        ram_req = float(usage.get("ram_requested", 0))
+    except:
+        ram_req = 0.0
+    try:
+        ram_used = float(usage.get("ram_used", 0))
+    except:
+        ram_used = 0.0
+    try:
+        storage_prov = float(usage.get("storage_provisioned", 0))
+    except:
+        storage_prov = 0.0
+    try:
+        storage_req = float(usage.get("storage_requested", 0))
+    except:
+        storage_req = 0.0
+
+    avg_cpu_req = cpu_req / days_in_month if days_in_month > 0 else 0.0
+    avg_ram_req = ram_req / days_in_month if days_in_month > 0 else 0.0
+    avg_storage_req = storage_req / days_in_month if days_in_month > 0 else 0.0
+
+    if isinstance(baseline, Future):
+        baseline = baseline.result()
+    savings_cpu = avg_cpu_req * (baseline["baseline_cpu"] - current_cpu)
+    savings_ram = avg_ram_req * (baseline["baseline_ram"] - current_ram)
+    savings_storage = avg_storage_req * (baseline["baseline_storage"] - current_storage)
+    total_savings = savings_cpu + savings_ram + savings_storage
+
+    savings_row = {
+        "clusterid": cluster_id,
+        "clustername": cluster_name,
+        "connected_date": connected_date_str,
+        "month": month_str,
+        "cpu_provisioned": f"{cpu_prov:.2f}",
+        "cpu_requested": f"{cpu_req:.2f}",
+        "cpu_used": f"{cpu_used:.2f}",
+        "cpu_price": f"{current_cpu:.2f}",
+        "ram_provisioned": f"{ram_prov:.2f}",
+        "ram_requested": f"{ram_req:.2f}",
+        "ram_used": f"{ram_used:.2f}",
+        "ram_price": f"{current_ram:.2f}",
+        "storage_provisioned": f"{storage_prov:.2f}",
+        "storage_requested": f"{storage_req:.2f}",
+        "avg_cpu_provisioned": f"{(cpu_prov/days_in_month):.2f}",
+        "avg_cpu_requested": f"{(cpu_req/days_in_month):.2f}",
+        "avg_ram_provisioned": f"{(ram_prov/days_in_month):.2f}",
+        "avg_ram_requested": f"{(ram_req/days_in_month):.2f}",
+        "avg_storage_provisioned": f"{(storage_prov/days_in_month):.2f}",
+        "avg_storage_requested": f"{(storage_req/days_in_month):.2f}",
+        "savings_per_month_cpu": f"{savings_cpu:.2f}",
+        "savings_per_month_ram": f"{savings_ram:.2f}",
+        "savings_per_month_storage": f"{savings_storage:.2f}",
+        "total_savings_per_month": f"{total_savings:.2f}"
+    }
+
+    # The efficiency summary above already carries the hourly prices, so the
+    # resource cost rows reuse it instead of fetching the same month again.
+    resource_cost_rows = []
+    for resource, eff_key in [
+        ("CPU", "costPerCpu"),
+        ("RAM", "costPerRam"),
+        ("Storage", "costPerStorage")
+    ]:
+        try:
+            cost_val = float(current_eff.get(eff_key, 0))
+        except:
+            cost_val = 0.0
+        avg_hourly = cost_val
+        avg_daily = avg_hourly * 24
+        avg_monthly = avg_daily * days_in_month
+        resource_cost_rows.append({
+            "cluster_id": cluster_id,
+            "cluster_name": cluster_name,
+            "connected_date": connected_date_str,
+            "month": month_str,
+            "resource": resource,
+            "avg_hourly_cost": f"{avg_hourly:.4f}",
+            "avg_daily_cost": f"{avg_daily:.4f}",
+            "avg_monthly_cost": f"{avg_monthly:.2f}"
+        })
+    return savings_row, resource_cost_rows, current_eff["daily"]
+
+def submit_cluster_months(api_key, executor, completed, cluster_id, cluster_name, connected_date_str, connected_date, months, units):
+    """Queue the (cluster, month) units not in the journal yet; units maps each future to (cluster_id, month, None for the baseline)."""
+    months = [(year, month) for year, month in months if (cluster_id, f"{year}-{month:02d}") not in completed["month"]]
+    if not months:
+        return
+    # A slow or unreachable cluster is cut off at its deadline; the months it
+    # did finish are journaled and --resume fetches the rest later.
+    clock = castaiApi.QueuedDeadline(CLUSTER_DEADLINE_SECONDS)
+    baseline = completed["baseline"].get(cluster_id)
+    if baseline is None:
+        # Fetched alongside the months: the Connected Date month's own
+        # efficiency call is the same request, so the two share one call.
+        baseline = castaiApi.submit_in_context(executor, clock.run, get_preonboard_efficiency, api_key, cluster_id, connected_date)
+        units[baseline] = (cluster_id, None)
+    for year, month in months:
+        future = castaiApi.submit_in_context(executor, clock.run, compute_month_unit, api_key, cluster_id, cluster_name, connected_date_str, year, month, baseline)
+        units[future] = (cluster_id, f"{year}-{month:02d}")
+
+def collect_units(journal, completed, units):
+    """Journal each unit as soon as it lands so a crash keeps every finished one; returns {cluster_id: [months not fetched]}."""
+    missing_months = {}
+    for future in as_completed(units):
+        cluster_id, month_str = units[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            # A timeout or a malformed payload leaves only this unit PENDING;
+            # the months of a failed baseline fail with its error.
+            if month_str is not None:
+                missing_months.setdefault(cluster_id, []).append(month_str)
+            elif not castaiApi.budget_exhausted():
+                print(f"Error fetching baseline for {cluster_id}: {e!r}", flush=True)
+            continue
+        if month_str is None:
+            append_checkpoint(journal, {"kind": "baseline", "cluster_id": cluster_id, "baseline": result})
+            completed["baseline"][cluster_id] = result
+            continue
+        savings_row, cost_rows, daily = result
+        record = {"kind": "month", "cluster_id": cluster_id, "month": month_str,
+                  "savings": savings_row, "resource_costs": cost_rows, "daily": daily}
+        append_checkpoint(journal, record)
+        completed["month"][(cluster_id, month_str)] = record
+    return missing_months
+
+def pending_savings_row(cluster_id, cluster_name, connected_date_str, month_str):
+    row = {column: PENDING for column in SAVINGS_COLUMNS}
+    row.update({"clusterid": cluster_id, "clustername": cluster_name, "connected_date": connected_date_str, "month": month_str})
+    return row
+
+def pending_resource_cost_rows(cluster_id, cluster_name, connected_date_str, month_str):
+    return [{"cluster_id": cluster_id, "cluster_name": cluster_name, "connected_date": connected_date_str, "month": month_str,
+             "resource": resource, "avg_hourly_cost": PENDING, "avg_daily_cost": PENDING, "avg_monthly_cost": PENDING}
+            for resource in ["CPU", "RAM", "Storage"]]
+
+def generate_monthly_savings_report(api_key, input_csv, savings_output_csv, resource_cost_output_csv, checkpoint_dir, resume=False, cluster_filter=None,
+                                    since=None, until=None, daily_series_path=None, daily_rolling_csv=None, incremental_org_dir=None):
+    """
+    Savings and resource cost rows per cluster and month, from each cluster's
+    Connected Date to the last completed month. since / until (dates on the 1st
+    of a month) narrow the months that are fetched and written; the pre-onboard
+    baseline is still resolved once per cluster from its Connected Date.
+    With daily_series_path, the daily prices of the reported months are stored
+    as per-cluster arrays and their rolling metrics written to daily_rolling_csv.
+    With incremental_org_dir, the rows are upserted into that org's month
+    partitions instead of rewriting the two CSVs. Returns (changed months or
+    None, number of cluster months not fetched). Months not fetched are
+    PENDING rows. Under a time budget the latest month of every cluster is
+    fetched before the older ones, newest first.
+    """
     df = pd.read_csv(input_csv)
     if "Connected Date" not in df.columns:
         print("Connected Date column not found in CSV.", flush=True)
         sys.exit(1)
+    if cluster_filter is not None:
+        df = cluster_filter.filter_frame(df)
     df.sort_values(by="Connected Date", inplace=True)
     
     savings_rows = []
     resource_cost_rows = []
+    daily_points = {}
     
     today = datetime.date.today()
     last_month = today.month - 1
@@ -153,7 +441,12 @@ def generate_monthly_savings_report(api_key, input_csv, savings_output_csv, reso
         last_month_year -= 1
         last_month = 12
     last_completed = datetime.date(last_month_year, last_month, 1)
+    if until and until < last_completed:
+        last_completed = until
     
+    # Plan every cluster's months first, so a time budget can fetch the latest
+    # month of all clusters before any cluster's history.
+    plan = []
     for idx, row in df.iterrows():
         cluster_id = row["ClusterID"]
         cluster_name = row["Cluster Name"]
@@ -168,178 +461,226 @@ def generate_monthly_savings_report(api_key, input_csv, savings_output_csv, reso
             print(f"Error parsing Connected Date '{connected_date_str}' for {cluster_id}: {e}", flush=True)
             continue
         
-        baseline = get_preonboard_efficiency(api_key, cluster_id, connected_date)
-        baseline_cpu = baseline["baseline_cpu"]
-        baseline_ram = baseline["baseline_ram"]
-        baseline_storage = baseline["baseline_storage"]
-        
+        months = []
         current_date = datetime.date(connected_date.year, connected_date.month, 1)
+        if since and since > current_date:
+            current_date = since
         while current_date <= last_completed:
-            year = current_date.year
-            month = current_date.month
-            month_str = f"{year}-{month:02d}"
-            start_str, end_str = get_month_range(year, month)
-            days_in_month = calendar.monthrange(year, month)[1]
-            
-            current_eff = get_current_efficiency(api_key, cluster_id, start_str, end_str)
-            current_cpu = current_eff["current_cpu"]
-            current_ram = current_eff["current_ram"]
-            current_storage = current_eff["current_storage"]
-            
-            usage = get_monthly_resource_usage(api_key, cluster_id, start_str, end_str)
-            try:
-                cpu_prov = float(usage.get("cpu_provisioned", 0))
-            except:
-                cpu_prov = 0.0
-            try:
-                cpu_req = float(usage.get("cpu_requested", 0))
-            except:
-                cpu_req = 0.0
-            try:
-                cpu_used = float(usage.get("cpu_used", 0))
-            except:
-                cpu_used = 0.0
-            try:
-                ram_prov = float(usage.get("ram_provisioned", 0))
-            except:
-                ram_prov = 0.0
-            try:
-                ram_req = float(usage.get("ram_requested", 0))
-            except:
-                ram_req = 0.0
-            try:
-                ram_used = float(usage.get("ram_used", 0))
-            except:
-                ram_used = 0.0
-            try:
-                storage_prov = float(usage.get("storage_provisioned", 0))
-            except:
-                storage_prov = 0.0
-            try:
-                storage_req = float(usage.get("storage_requested", 0))
-            except:
-                storage_req = 0.0
-            
-            avg_cpu_req = cpu_req / days_in_month if days_in_month > 0 else 0.0
-            avg_ram_req = ram_req / days_in_month if days_in_month > 0 else 0.0
-            avg_storage_req = storage_req / days_in_month if days_in_month > 0 else 0.0
-            
-            savings_cpu = avg_cpu_req * (baseline_cpu - current_cpu)
-            savings_ram = avg_ram_req * (baseline_ram - current_ram)
-            savings_storage = avg_storage_req * (baseline_storage - current_storage)
-            total_savings = savings_cpu + savings_ram + savings_storage
-            
-            savings_rows.append({
-                "clusterid": cluster_id,
-                "clustername": cluster_name,
-                "connected_date": connected_date_str,
-                "month": month_str,
-                "cpu_provisioned": f"{cpu_prov:.2f}",
-                "cpu_requested": f"{cpu_req:.2f}",
-                "cpu_used": f"{cpu_used:.2f}",
-                "cpu_price": f"{current_cpu:.2f}",
-                "ram_provisioned": f"{ram_prov:.2f}",
-                "ram_requested": f"{ram_req:.2f}",
-                "ram_used": f"{ram_used:.2f}",
-                "ram_price": f"{current_ram:.2f}",
-                "storage_provisioned": f"{storage_prov:.2f}",
-                "storage_requested": f"{storage_req:.2f}",
-                "avg_cpu_provisioned": f"{(cpu_prov/days_in_month):.2f}",
-                "avg_cpu_requested": f"{(cpu_req/days_in_month):.2f}",
-                "avg_ram_provisioned": f"{(ram_prov/days_in_month):.2f}",
-                "avg_ram_requested": f"{(ram_req/days_in_month):.2f}",
-                "avg_storage_provisioned": f"{(storage_prov/days_in_month):.2f}",
-                "avg_storage_requested": f"{(storage_req/days_in_month):.2f}",
-                "savings_per_month_cpu": f"{savings_cpu:.2f}",
-                "savings_per_month_ram": f"{savings_ram:.2f}",
-                "savings_per_month_storage": f"{savings_storage:.2f}",
-                "total_savings_per_month": f"{total_savings:.2f}"
-            })
-            
-            for resource, eff_key in [
-                ("CPU", "costPerCpu"),
-                ("RAM", "costPerRam"),
-                ("Storage", "costPerStorage")
-            ]:
-                try:
-                    cost_val = float(get_efficiency_summary(api_key, cluster_id, start_str, end_str).get(eff_key, 0))
-                except:
-                    cost_val = 0.0
-                avg_hourly = cost_val
-                avg_daily = avg_hourly * 24
-                avg_monthly = avg_daily * days_in_month
-                resource_cost_rows.append({
-                    "cluster_id": cluster_id,
-                    "cluster_name": cluster_name,
-                    "connected_date": connected_date_str,
-                    "month": month_str,
-                    "resource": resource,
-                    "avg_hourly_cost": f"{avg_hourly:.4f}",
-                    "avg_daily_cost": f"{avg_daily:.4f}",
-                    "avg_monthly_cost": f"{avg_monthly:.2f}"
-                })
-            
-            if month == 12:
-                current_date = datetime.date(year + 1, 1, 1)
+            months.append((current_date.year, current_date.month))
+            if current_date.month == 12:
+                current_date = datetime.date(current_date.year + 1, 1, 1)
             else:
-                current_date = datetime.date(year, month + 1, 1)
+                current_date = datetime.date(current_date.year, current_date.month + 1, 1)
+        if not months:
+            print(f"No months to report for {cluster_id} in the requested window.", flush=True)
+            continue
+        plan.append((cluster_id, cluster_name, connected_date_str, connected_date, months))
+    
+    # An incremental run without --since or --resume only fetches the months
+    # its partitions lack, plus the latest month, whose costs can still be
+    # revised; the partitions it does not fetch are not read either.
+    skip_stored = bool(incremental_org_dir) and not since and not resume
+    if skip_stored:
+        stored = reportPartitions.stored_months(incremental_org_dir)
+        latest = f"{last_completed.year}-{last_completed.month:02d}"
+        trimmed = []
+        for cluster_id, cluster_name, connected_date_str, connected_date, months in plan:
+            stored_cluster = stored.get(str(cluster_id), set())
+            months = [(year, month) for year, month in months
+                      if f"{year}-{month:02d}" == latest or f"{year}-{month:02d}" not in stored_cluster]
+            if months:
+                trimmed.append((cluster_id, cluster_name, connected_date_str, connected_date, months))
+        print(f"Incremental: fetching {sum(len(p[4]) for p in trimmed)} of {sum(len(p[4]) for p in plan)} cluster months.", flush=True)
+        plan = trimmed
     
-    savings_df = pd.DataFrame(savings_rows)
-    savings_df.to_csv(savings_output_csv, index=False)
-    print(f"Monthly savings report saved to {savings_output_csv}")
+    if castaiApi.budget_active():
+        waves = [slice(-1, None), slice(-2, None, -1)]
+    else:
+        waves = [slice(None)]
+    
+    journal_path, completed = open_checkpoint_journal(checkpoint_dir, resume)
+    journal = open(journal_path, "a")
+    # One pool for the whole org: every cluster's months share the same
+    # concurrency budget instead of each cluster opening its own.
+    executor = ThreadPoolExecutor(max_workers=MONTH_FETCH_WORKERS)
+    try:
+        for wave in waves:
+            units = {}
+            for cluster_id, cluster_name, connected_date_str, connected_date, months in plan:
+                submit_cluster_months(api_key, executor, completed, cluster_id, cluster_name,
+                                      connected_date_str, connected_date, months[wave], units)
+            missing_months = collect_units(journal, completed, units)
+            # The budget summary covers the months it cut off.
+            if not castaiApi.budget_exhausted():
+                for cluster_id, month_strs in missing_months.items():
+                    print(f"Cluster {cluster_id} is missing {len(month_strs)} months (rerun with --resume): {', '.join(sorted(month_strs))}", flush=True)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        journal.close()
+    
+    pending = 0
+    for cluster_id, cluster_name, connected_date_str, connected_date, months in plan:
+        for year, month in months:
+            record = completed["month"].get((cluster_id, f"{year}-{month:02d}"))
+            if record is None:
+                # Months a time budget or a failed fetch left out are written as
+                # PENDING rows; incremental partitions only take finished months.
+                if not incremental_org_dir:
+                    savings_rows.append(pending_savings_row(cluster_id, cluster_name, connected_date_str, f"{year}-{month:02d}"))
+                    resource_cost_rows.extend(pending_resource_cost_rows(cluster_id, cluster_name, connected_date_str, f"{year}-{month:02d}"))
+                pending += 1
+                continue
+            savings_rows.append(record["savings"])
+            resource_cost_rows.extend(record["resource_costs"])
+            daily_points.setdefault(cluster_id, []).extend(record.get("daily", []))
+    if pending and castaiApi.budget_exhausted():
+        print(f"Time budget exhausted: {pending} cluster months are {PENDING}, rerun with --resume to fill them.", flush=True)
+    
+    changed = None
+    if incremental_org_dir:
+        with runProfiler.stage("write"):
+            changed = reportPartitions.write_incremental(incremental_org_dir, {
+                "monthly_savings": savings_rows,
+                "resource_costs": resource_cost_rows,
+            })
+    else:
+        with runProfiler.stage("aggregate"):
+            savings_df = pd.DataFrame(savings_rows)
+            resource_df = pd.DataFrame(resource_cost_rows)
+        with runProfiler.stage("write"):
+            savings_df.to_csv(savings_output_csv, index=False)
+            print(f"Monthly savings report saved to {savings_output_csv}")
+            
+            resource_df.to_csv(resource_cost_output_csv, index=False)
+            print(f"Resource costs report saved to {resource_cost_output_csv}")
     
-    resource_df = pd.DataFrame(resource_cost_rows)
-    resource_df.to_csv(resource_cost_output_csv, index=False)
-    print(f"Resource costs report saved to {resource_cost_output_csv}")
+    if daily_series_path:
+        with runProfiler.stage("aggregate"):
+            series = {cid: dailyCostSeries.series_arrays(points) for cid, points in daily_points.items()}
+            # Months left unfetched keep their stored days.
+            if skip_stored and os.path.exists(daily_series_path):
+                series = dailyCostSeries.merge_series(dailyCostSeries.load_series(daily_series_path), series)
+        dailyCostSeries.write_daily_report(series, daily_series_path, daily_rolling_csv)
+    # Every month is in the outputs now, so --resume has nothing left to pick up.
+    if not pending:
+        os.remove(journal_path)
+    return changed, pending
 
 def process_org(selected_org, org_row):
     api_key = org_row["key"]
-    org_dir_local = os.path.join("outputs", selected_org.replace(" ", "_"))
-    global org_dir
-    org_dir = org_dir_local
+    org_dir = os.path.join("outputs", selected_org.replace(" ", "_"))
     csv_dir = os.path.join(org_dir, "csv")
     details_csv = os.path.join(csv_dir, "cluster_details.csv")
     if not os.path.exists(org_dir) or not os.path.exists(details_csv):
         print(f"Organization directory or cluster_details.csv not found for {selected_org}. Running orgClusterDetails.py...", flush=True)
         try:
             if save_json == "on":
-                subprocess.run(["python", "orgClusterDetails.py", selected_org, "on"], check=True)
+                subprocess.run(["python", "orgClusterDetails.py", selected_org, "on"] + cluster_filter.to_argv() + runProfiler.to_argv() + castaiApi.budget_argv(), check=True)
             else:
-                subprocess.run(["python", "orgClusterDetails.py", selected_org], check=True)
+                subprocess.run(["python", "orgClusterDetails.py", selected_org] + cluster_filter.to_argv() + runProfiler.to_argv() + castaiApi.budget_argv(), check=True)
         except subprocess.CalledProcessError as e:
             print(f"Error running orgClusterDetails.py for {selected_org}: {e}", flush=True)
             sys.exit(1)
+        # A filtered orgClusterDetails run writes its own, already filtered, file.
+        details_csv = os.path.join(csv_dir, cluster_filter.output_name("cluster_details.csv"))
         if not os.path.exists(details_csv):
             print("Failed to generate cluster_details.csv.", flush=True)
             sys.exit(1)
     else:
         print(f"Found cluster_details.csv for {selected_org}.", flush=True)
-    os.makedirs(os.path.join(org_dir, "json"), exist_ok=True)
-    savings_output_csv = os.path.join(csv_dir, "monthly_savings_report.csv")
-    resource_cost_output_csv = os.path.join(csv_dir, "resource_costs_report.csv")
-    generate_monthly_savings_report(api_key, details_csv, savings_output_csv, resource_cost_output_csv)
+    castaiApi.set_org_context(org_dir, save_json)
+    castaiApi.configure_org_limits(api_key, org_row)
+    savings_output_csv = os.path.join(csv_dir, window_output_name(cluster_filter.output_name("monthly_savings_report.csv"), since, until))
+    resource_cost_output_csv = os.path.join(csv_dir, window_output_name(cluster_filter.output_name("resource_costs_report.csv"), since, until))
+    daily_series_path = os.path.join(org_dir, "series", window_output_name(cluster_filter.output_name("efficiency_daily.npz"), since, until))
+    daily_rolling_csv = os.path.join(csv_dir, window_output_name(cluster_filter.output_name("daily_cost_rolling.csv"), since, until))
+    checkpoint_dir = os.path.join(org_dir, "checkpoints")
+    with runProfiler.org_profile(org_dir, "monthlySavingsReport"):
+        changed, pending = generate_monthly_savings_report(api_key, details_csv, savings_output_csv, resource_cost_output_csv, checkpoint_dir,
+                                                  resume=resume, cluster_filter=cluster_filter, since=since, until=until,
+                                                  daily_series_path=daily_series_path, daily_rolling_csv=daily_rolling_csv,
+                                                  incremental_org_dir=org_dir if incremental else None)
+        # Incremental runs upsert into the shared partitions whatever the filter or
+        # window, so the cube only reloads the months they changed.
+        if incremental:
+            months = sorted(set(changed["monthly_savings"]) | set(changed["resource_costs"]))
+            try:
+                with runProfiler.stage("write"):
+                    metricsCube.ingest_partitions(os.path.basename(org_dir), months)
+            except Exception as e:
+                print(f"Error loading metrics cube for {selected_org}: {e}", flush=True)
+            return
+        # The fleet rollup and metrics cube only read full, complete reports.
+        if cluster_filter.active or since or until or pending:
+            return
+        try:
+            with runProfiler.stage("aggregate"):
+                fleetRollup.update_fleet_rollup(os.path.basename(org_dir))
+        except Exception as e:
+            print(f"Error updating fleet rollup for {selected_org}: {e}", flush=True)
+        try:
+            with runProfiler.stage("write"):
+                metricsCube.ingest_org(os.path.basename(org_dir))
+        except Exception as e:
+            print(f"Error loading metrics cube for {selected_org}: {e}", flush=True)
 
 def main():
-    global save_json
-    if len(sys.argv) < 2:
-        print("Usage: python orgClusterDetails.py <Organization | all> <on> (If you want to save resulting jsons)", flush=True)
+    global save_json, resume, cluster_filter, since, until, incremental
+    resume = "--resume" in sys.argv
+    incremental = "--incremental" in sys.argv
+    if "--hedge" in sys.argv:
+        castaiApi.enable_hedging()
+    if "--http2" in sys.argv:
+        castaiApi.enable_http2()
+    if "--profile" in sys.argv:
+        runProfiler.enable()
+    try:
+        cluster_filter, argv = clusterFilters.parse_filter_args([arg for arg in sys.argv if arg not in ("--resume", "--hedge", "--http2", "--incremental", "--profile")])
+        since, until, argv = parse_window_args(argv)
+        time_budget = castaiApi.parse_time_budget(argv)
+    except ValueError as e:
+        print(e, flush=True)
+        sys.exit(1)
+    if len(argv) < 2:
+        print(f"Usage: python monthlySavingsReport.py <Organization | all> <on> (If you want to save resulting jsons) [--resume] [--hedge] [--http2] [--incremental] [--profile] [--time-budget SECONDS] [--since YYYY-MM] [--until YYYY-MM] {clusterFilters.FILTER_USAGE}", flush=True)
         sys.exit(1)
-    elif len(sys.argv) == 2:
+    elif len(argv) == 2:
         save_json="off"
-    elif len(sys.argv) == 3:
-        save_json = sys.argv[2].strip()
+    elif len(argv) == 3:
+        save_json = argv[2].strip()
 
-    selected_arg = sys.argv[1].strip()
+    selected_arg = argv[1].strip()
+    if cluster_filter.active:
+        print(f"Only clusters with {cluster_filter.describe()}", flush=True)
+    if time_budget is not None:
+        castaiApi.set_time_budget(time_budget)
+        print(f"Time budget: {time_budget:g} seconds", flush=True)
     try:
         orgs_df = pd.read_csv("orgs.csv")
     except Exception as e:
         print(f"Error loading orgs.csv: {e}", flush=True)
         sys.exit(1)
     if selected_arg.lower() == "all":
-        for idx, org_row in orgs_df.iterrows():
-            selected_org = org_row["org"]
-            print(f"Processing organization: {selected_org}", flush=True)
-            process_org(selected_org, org_row)
+        failed_orgs = []
+        # Orgs run side by side; each API key's scheduler keeps its own limits.
+        with ThreadPoolExecutor(max_workers=ORG_WORKERS) as executor:
+            futures = {}
+            for idx, org_row in orgs_df.iterrows():
+                selected_org = org_row["org"]
+                print(f"Processing organization: {selected_org}", flush=True)
+                futures[castaiApi.submit_in_context(executor, process_org, selected_org, org_row)] = selected_org
+            # One org failing must not abort the rest of the run; its checkpoint
+            # journal lets a later --resume pick it up where it stopped.
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except (Exception, SystemExit) as e:
+                    print(f"Error processing organization {futures[future]}: {e!r}", flush=True)
+                    failed_orgs.append(futures[future])
+        castaiApi.report_coalesced()
+        if failed_orgs:
+            print(f"Failed organizations (rerun with --resume): {', '.join(failed_orgs)}", flush=True)
+            sys.exit(1)
     else:
         try:
             org_row = orgs_df[orgs_df["org"] == selected_arg].iloc[0]
@@ -347,6 +688,7 @@ def main():
             print(f"Organization '{selected_arg}' not found: {e}", flush=True)
             sys.exit(1)
         process_org(selected_arg, org_row)
+        castaiApi.report_coalesced()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
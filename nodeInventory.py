@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import datetime
+import numpy as np
+import pandas as pd
+
+OUTPUTS_DIR = "outputs"
+MANAGERS = ["CastAI", "Karpenter", "Provider"]
+# Labels kept per node, interned in dictionaries.json.
+INSTANCE_TYPE_LABEL = "node.kubernetes.io/instance-type"
+ZONE_LABEL = "topology.kubernetes.io/zone"
+# Labels that mark a spot node, whoever provisioned it (values compared in lower case).
+SPOT_LABELS = {
+    "scheduling.cast.ai/spot": "true",
+    "karpenter.sh/capacity-type": "spot",
+    "eks.amazonaws.com/capacityType": "spot",
+    "cloud.google.com/gke-spot": "true",
+    "cloud.google.com/gke-preemptible": "true",
+    "kubernetes.azure.com/scalesetpriority": "spot",
+}
+
+# A cluster's snapshot is stored in full every KEYFRAME_INTERVAL snapshots, or
+# when the changes would be more than half of it; otherwise only the nodes that
+# were added, changed or removed since its previous snapshot are stored.
+KEYFRAME_INTERVAL = 24
+OP_UPSERT = 0
+OP_REMOVE = 1
+
+# One stored node row; fixed width so nodes.bin can be memory mapped.
+NODE_RECORD = np.dtype([
+    ("node", "<i4"),
+    ("op", "i1"),
+    ("manager", "i1"),
+    ("spot", "i1"),
+    ("instance_type", "<i4"),
+    ("zone", "<i4"),
+    ("cpu_capacity_milli", "<i4"),
+    ("cpu_requests_milli", "<i4"),
+    ("mem_capacity_mib", "<i4"),
+    ("mem_requests_mib", "<i4"),
+])
+VALUE_FIELDS = [name for name in NODE_RECORD.names if name not in ("node", "op")]
+
+# One stored snapshot: its rows are nodes.bin[offset:offset + rows].
+SNAPSHOT_RECORD = np.dtype([
+    ("taken_at", "<i8"),
+    ("cluster", "<i4"),
+    ("offset", "<i8"),
+    ("rows", "<i4"),
+    ("keyframe", "i1"),
+])
+
+# -------------------------
+# Store Files
+# -------------------------
+def store_dir(org_dir):
+    return os.path.join(org_dir, "inventory")
+
+def load_dictionaries(directory):
+    path = os.path.join(directory, "dictionaries.json")
+    if not os.path.exists(path):
+        return {"clusters": [], "nodes": [], "instance_types": [], "zones": []}
+    with open(path) as f:
+        return json.load(f)
+
+def save_dictionaries(directory, dictionaries):
+    path = os.path.join(directory, "dictionaries.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(dictionaries, f)
+    os.replace(path + ".tmp", path)
+
+def open_records(path, dtype):
+    """Memory map a record file read-only; an empty array when it does not exist yet."""
+    if not os.path.exists(path) or os.path.getsize(path) < dtype.itemsize:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(os.path.getsize(path) // dtype.itemsize,))
+
+class Interner:
+    """String -> code for one dictionary; new strings get the next code."""
+
+    def __init__(self, values):
+        self.values = values
+        self.codes = {value: code for code, value in enumerate(values)}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+# -------------------------
+# Snapshots
+# -------------------------
+def node_columns(items):
+    """
+    Flatten a nodes payload into plain columns (strings not interned yet);
+    cheap to keep per cluster until the run writes its snapshots.
+    """
+    count = len(items)
+    columns = {
+        "node": [],
+        "instance_type": [],
+        "zone": [],
+        "manager": np.full(count, 2, dtype=np.int8),
+        "spot": np.zeros(count, dtype=np.int8),
+    }
+    numbers = np.zeros((4, count), dtype=np.int64)
+    for i, item in enumerate(items):
+        labels = item.get("labels", {}) or {}
+        resources = item.get("resources", {}) or {}
+        columns["node"].append(str(item.get("id") or item.get("name", "")))
+        columns["instance_type"].append(labels.get(INSTANCE_TYPE_LABEL, ""))
+        columns["zone"].append(labels.get(ZONE_LABEL, ""))
+        if labels.get("provisioner.cast.ai/managed-by") == "cast.ai":
+            columns["manager"][i] = 0
+        elif labels.get("karpenter.sh/registered") == "true":
+            columns["manager"][i] = 1
+        # The node's own spot flag first, then the provisioners' labels.
+        if (item.get("spotConfig") or {}).get("isSpot") or any(
+                str(labels.get(key, "")).lower() == value for key, value in SPOT_LABELS.items()):
+            columns["spot"][i] = 1
+        numbers[0, i] = resources.get("cpuCapacityMilli", 0) or 0
+        numbers[1, i] = resources.get("cpuRequestsMilli", 0) or 0
+        numbers[2, i] = resources.get("memCapacityMib", 0) or 0
+        numbers[3, i] = resources.get("memRequestsMib", 0) or 0
+    columns["numbers"] = numbers
+    return columns
+
+def snapshot_records(columns, interners):
+    """Intern a node_columns result into NODE_RECORD rows sorted by node code."""
+    count = len(columns["node"])
+    records = np.zeros(count, dtype=NODE_RECORD)
+    records["node"] = [interners["nodes"].code(v) for v in columns["node"]]
+    records["op"] = OP_UPSERT
+    records["manager"] = columns["manager"]
+    records["spot"] = columns["spot"]
+    records["instance_type"] = [interners["instance_types"].code(v) for v in columns["instance_type"]]
+    records["zone"] = [interners["zones"].code(v) for v in columns["zone"]]
+    limits = np.iinfo(np.int32)
+    for row, field in enumerate(["cpu_capacity_milli", "cpu_requests_milli", "mem_capacity_mib", "mem_requests_mib"]):
+        records[field] = np.clip(columns["numbers"][row], limits.min, limits.max)
+    # A node listed twice keeps its last row.
+    records = records[::-1]
+    _, first = np.unique(records["node"], return_index=True)
+    return np.sort(records[first], order="node")
+
+def apply_delta(state, rows):
+    """Nodes present after applying stored rows (a keyframe or a delta) to state, sorted by node."""
+    touched = np.isin(state["node"], rows["node"])
+    upserts = rows[rows["op"] == OP_UPSERT]
+    merged = np.concatenate([state[~touched], upserts])
+    return np.sort(merged, order="node")
+
+def diff_snapshot(previous, current):
+    """Delta rows turning previous into current: changed or new nodes, plus removals."""
+    index = np.searchsorted(previous["node"], current["node"])
+    index = np.minimum(index, max(len(previous) - 1, 0))
+    if len(previous):
+        known = previous["node"][index] == current["node"]
+        same = known.copy()
+        for field in VALUE_FIELDS:
+            same &= previous[field][index] == current[field]
+    else:
+        same = np.zeros(len(current), dtype=bool)
+    removed = previous[~np.isin(previous["node"], current["node"])].copy()
+    removed["op"] = OP_REMOVE
+    for field in VALUE_FIELDS:
+        removed[field] = 0
+    return np.concatenate([current[~same], removed])
+
+def cluster_states(nodes, snapshots, cluster_code, latest_only=False):
+    """
+    Yield (taken_at, present nodes) for every stored snapshot of a cluster,
+    oldest first; with latest_only, replay from its last keyframe instead.
+    """
+    history = snapshots[snapshots["cluster"] == cluster_code]
+    if latest_only and len(history):
+        keyframes = np.flatnonzero(history["keyframe"])
+        history = history[keyframes[-1]:] if len(keyframes) else history
+    state = np.zeros(0, dtype=NODE_RECORD)
+    for snapshot in history:
+        rows = np.asarray(nodes[snapshot["offset"]:snapshot["offset"] + snapshot["rows"]])
+        if snapshot["keyframe"]:
+            state = np.zeros(0, dtype=NODE_RECORD)
+        state = apply_delta(state, rows)
+        yield int(snapshot["taken_at"]), state
+
+def record_snapshots(org_dir, cluster_columns, taken_at=None):
+    """
+    Append one snapshot per cluster ({cluster_id: node_columns(...)}) to the
+    org's store: keyframes or deltas against each cluster's last snapshot.
+    Returns the number of node rows written.
+    """
+    directory = store_dir(org_dir)
+    os.makedirs(directory, exist_ok=True)
+    taken_at = int(taken_at if taken_at is not None else time.time())
+    nodes_path = os.path.join(directory, "nodes.bin")
+    snapshots_path = os.path.join(directory, "snapshots.bin")
+    dictionaries = load_dictionaries(directory)
+    interners = {name: Interner(values) for name, values in dictionaries.items()}
+    snapshots = open_records(snapshots_path, SNAPSHOT_RECORD)
+    nodes = open_records(nodes_path, NODE_RECORD)
+    # Rows past the last indexed snapshot come from an interrupted run.
+    offset = int(snapshots["offset"][-1] + snapshots["rows"][-1]) if len(snapshots) else 0
+    if len(nodes) > offset:
+        del nodes
+        with open(nodes_path, "r+b") as f:
+            f.truncate(offset * NODE_RECORD.itemsize)
+        nodes = open_records(nodes_path, NODE_RECORD)
+
+    new_rows = []
+    new_snapshots = []
+    for cluster_id in sorted(cluster_columns):
+        current = snapshot_records(cluster_columns[cluster_id], interners)
+        cluster_code = interners["clusters"].code(cluster_id)
+        history = snapshots[snapshots["cluster"] == cluster_code]
+        since_keyframe = None
+        if len(history):
+            keyframes = np.flatnonzero(history["keyframe"])
+            since_keyframe = len(history) - 1 - keyframes[-1] if len(keyframes) else None
+        rows = current
+        keyframe = True
+        if since_keyframe is not None and since_keyframe + 1 < KEYFRAME_INTERVAL:
+            previous = np.zeros(0, dtype=NODE_RECORD)
+            for _, previous in cluster_states(nodes, snapshots, cluster_code, latest_only=True):
+                pass
+            delta = diff_snapshot(previous, current)
+            if len(delta) * 2 <= len(current):
+                rows, keyframe = delta, False
+        new_snapshots.append((taken_at, cluster_code, offset, len(rows), int(keyframe)))
+        new_rows.append(rows)
+        offset += len(rows)
+
+    # The dictionaries only grow, so they go first: a crash before the records
+    # are appended leaves unused entries, never codes the dictionaries lack.
+    save_dictionaries(directory, {name: interner.values for name, interner in interners.items()})
+    with open(nodes_path, "ab") as f:
+        for rows in new_rows:
+            f.write(rows.tobytes())
+    with open(snapshots_path, "ab") as f:
+        f.write(np.array(new_snapshots, dtype=SNAPSHOT_RECORD).tobytes())
+    written = sum(len(rows) for rows in new_rows)
+    print(f"Node inventory: {len(new_snapshots)} cluster snapshots, {written} node rows saved to {directory}", flush=True)
+    return written
+
+# -------------------------
+# Trend Queries
+# -------------------------
+def trend_frame(org_dir, cluster_ids=None, since=None):
+    """
+    Per snapshot and cluster: node counts by manager, spot nodes, and CPU /
+    memory capacity, requests and request ratio. Reads the memory-mapped store
+    one cluster at a time, with numpy only.
+    """
+    directory = store_dir(org_dir)
+    dictionaries = load_dictionaries(directory)
+    snapshots = open_records(os.path.join(directory, "snapshots.bin"), SNAPSHOT_RECORD)
+    nodes = open_records(os.path.join(directory, "nodes.bin"), NODE_RECORD)
+    since_ts = int(datetime.datetime.combine(since, datetime.time()).timestamp()) if since else None
+    rows = []
+    for cluster_code, cluster_id in enumerate(dictionaries["clusters"]):
+        if cluster_ids is not None and cluster_id not in cluster_ids:
+            continue
+        for taken_at, state in cluster_states(nodes, snapshots, cluster_code):
+            if since_ts is not None and taken_at < since_ts:
+                continue
+            managers = np.bincount(state["manager"].astype(np.int64), minlength=len(MANAGERS))
+            cpu_capacity = int(state["cpu_capacity_milli"].sum(dtype=np.int64))
+            mem_capacity = int(state["mem_capacity_mib"].sum(dtype=np.int64))
+            cpu_requests = int(state["cpu_requests_milli"].sum(dtype=np.int64))
+            mem_requests = int(state["mem_requests_mib"].sum(dtype=np.int64))
+            row = {
+                "taken_at": datetime.datetime.fromtimestamp(taken_at).isoformat(timespec="seconds"),
+                "cluster_id": cluster_id,
+                "nodes": len(state),
+            }
+            for name, count in zip(MANAGERS, managers):
+                row[f"nodes_{name.lower()}"] = int(count)
+            row["nodes_spot"] = int(state["spot"].sum(dtype=np.int64))
+            row["instance_types"] = int(len(np.unique(state["instance_type"])))
+            row["cpu_capacity"] = round(cpu_capacity / 1000, 1)
+            row["cpu_requests"] = round(cpu_requests / 1000, 1)
+            row["cpu_request_pct"] = round(cpu_requests / cpu_capacity * 100, 2) if cpu_capacity else np.nan
+            row["mem_capacity_gib"] = round(mem_capacity / 1024, 1)
+            row["mem_requests_gib"] = round(mem_requests / 1024, 1)
+            row["mem_request_pct"] = round(mem_requests / mem_capacity * 100, 2) if mem_capacity else np.nan
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+def latest_states(org_dir):
+    """{cluster_id: (taken_at, nodes)} of every cluster's last snapshot, replayed from its last keyframe."""
+    directory = store_dir(org_dir)
+    if not os.path.exists(os.path.join(directory, "snapshots.bin")):
+        return {}
+    dictionaries = load_dictionaries(directory)
+    snapshots = open_records(os.path.join(directory, "snapshots.bin"), SNAPSHOT_RECORD)
+    nodes = open_records(os.path.join(directory, "nodes.bin"), NODE_RECORD)
+    states = {}
+    for cluster_code, cluster_id in enumerate(dictionaries["clusters"]):
+        for taken_at, state in cluster_states(nodes, snapshots, cluster_code, latest_only=True):
+            states[cluster_id] = (taken_at, state)
+    return states
+
+def list_org_dirs():
+    if not os.path.isdir(OUTPUTS_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(OUTPUTS_DIR)
+        if not name.startswith("_") and os.path.exists(os.path.join(OUTPUTS_DIR, name, "inventory", "snapshots.bin"))
+    )
+
+def main():
+    """Write the node mix and request ratio trend of the stored snapshots, without calling the API."""
+    args = sys.argv[1:]
+    since = None
+    cluster_ids = None
+    try:
+        if "--since" in args:
+            i = args.index("--since")
+            since = datetime.date.fromisoformat(args[i + 1])
+            del args[i:i + 2]
+        if "--cluster-ids" in args:
+            i = args.index("--cluster-ids")
+            cluster_ids = {c.strip() for c in args[i + 1].split(",") if c.strip()}
+            del args[i:i + 2]
+    except (IndexError, ValueError):
+        print("Usage: python nodeInventory.py [org|all] [--since YYYY-MM-DD] [--cluster-ids ID,...]", flush=True)
+        sys.exit(1)
+    selected_arg = args[0].strip() if args else "all"
+    org_names = list_org_dirs() if selected_arg.lower() == "all" else [selected_arg.replace(" ", "_")]
+    if not org_names:
+        print(f"No node inventory found under {OUTPUTS_DIR}. Run orgClusterDetails.py first.", flush=True)
+        sys.exit(1)
+    for org_name in org_names:
+        org_dir = os.path.join(OUTPUTS_DIR, org_name)
+        df = trend_frame(org_dir, cluster_ids, since)
+        if df.empty:
+            print(f"No node snapshots for {org_name}.", flush=True)
+            continue
+        csv_path = os.path.join(org_dir, "csv", "node_inventory_trend.csv")
+        os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+        df.to_csv(csv_path, index=False)
+        print(f"Node inventory trend ({df['taken_at'].nunique()} snapshots) saved to {csv_path}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -6,21 +6,75 @@ import re
 import requests
 import pandas as pd
 import datetime
-import json
-import statistics
+import threading
+import numpy as np
+import castaiApi
+import clusterFilters
+import approxStats
+import nodeInventory
+import runProfiler
+import fleetRollup
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+CLUSTER_WORKERS = 8
+ORG_WORKERS = 4
+CLUSTER_DEADLINE_SECONDS = castaiApi.DEFAULT_CLUSTER_DEADLINE
+
+# cluster_details.csv columns, in file order.
+DETAIL_COLUMNS = ["ClusterID", "Cluster Name", "Provider", "Region", "Phase 1", "Phase 2", "WOOP Enabled",
+                  "Resource Offering", "First Rebalance", "Special Considerations", "Connected Date",
+                  "Environment", "Evictor", "Scheduled Rebalance", "Node Templates Review",
+                  "WOOP enabled %", "Kubernetes version", "Extended Support", "KarpenterInstalled", "CPU Count", "accountID", "Nodes Managed"]
+
+# Inputs each column is computed from. "summary" (org clusters summary) and
+# "details" (external-clusters/{id}) are always fetched; "nodes" is fetched once
+# per cluster and shared by every column that needs it; "nodes (Anywhere)" is
+# only needed for Anywhere clusters.
+COLUMN_INPUTS = {
+    "ClusterID": ["summary"],
+    "Cluster Name": ["details"],
+    "Provider": ["details"],
+    "Region": ["details", "nodes (Anywhere)"],
+    "Phase 1": ["details"],
+    "Phase 2": ["details"],
+    "WOOP Enabled": ["workload-autoscaling/workloads-summary"],
+    "Resource Offering": ["summary"],
+    "First Rebalance": ["rebalancing-plans"],
+    "Special Considerations": ["details"],
+    "Connected Date": ["details"],
+    "Environment": ["details"],
+    "Evictor": ["evictor-config", "evictor-advanced-config"],
+    "Scheduled Rebalance": ["rebalancing-schedules"],
+    "Node Templates Review": ["details"],
+    "WOOP enabled %": ["workload-autoscaling/workloads-summary"],
+    "Kubernetes version": ["details", "nodes (Anywhere)"],
+    "Extended Support": ["details", "endoflife.date", "nodes (Anywhere)"],
+    "KarpenterInstalled": ["settings"],
+    "CPU Count": ["nodes"],
+    "accountID": ["details"],
+    "Nodes Managed": ["nodes"],
+}
+
+COLUMN_PRESETS = {
+    "inventory": ["ClusterID", "Cluster Name", "Provider", "Region", "Connected Date", "CPU Count"],
+}
+
+# With --time-budget every cluster gets these columns before any cluster gets
+# the enrichments; cells the budget left unfilled hold PENDING.
+CORE_COLUMNS = COLUMN_PRESETS["inventory"]
+PENDING = "PENDING"
+# Columns that need no call beyond the ones every cluster makes, so they are
+# still filled once the budget is spent.
+FREE_COLUMNS = [col for col in DETAIL_COLUMNS if set(COLUMN_INPUTS[col]) <= {"summary", "details"}]
+
+# Request percentage buckets for the node utilization histograms.
+NODE_UTILIZATION_BUCKETS = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100, np.inf]
 
 # -------------------------
 # Helper Functions
 # -------------------------
-def getKnownAnywhere(cluster_id, api_key):
-    url = f"https://api.cast.ai/v1/kubernetes/external-clusters/{cluster_id}/nodes?nodeStatus=node_status_unspecified&lifecycleType=lifecycle_type_unspecified"
-    headers = {"X-API-Key": api_key, "accept": "application/json"}
-    respuesta = requests.get(url, headers=headers)
-    try:
-        datados = respuesta.json()
-    except Exception as e:
-        print(f"Error decoding data for cluster {cluster_id}: {e}", flush=True)
-        datados = {}
+def getKnownAnywhere(cluster_id, api_key, nodes=None):
+    datados = nodes if nodes is not None else get_nodes(api_key, cluster_id)
     items = datados.get("items", [])
     total_nodes = len(items)
 
@@ -33,15 +87,8 @@ def getKnownAnywhere(cluster_id, api_key):
         else:
             return "Unknown"
     
-def getFargateVersion(cluster_id, api_key):
-    url = f"https://api.cast.ai/v1/kubernetes/external-clusters/{cluster_id}/nodes?nodeStatus=node_status_unspecified&lifecycleType=lifecycle_type_unspecified"
-    headers = {"X-API-Key": api_key, "accept": "application/json"}
-    respuesta = requests.get(url, headers=headers)
-    try:
-        datados = respuesta.json()
-    except Exception as e:
-        print(f"Error decoding data for cluster {cluster_id}: {e}", flush=True)
-        datados = {}
+def getFargateVersion(cluster_id, api_key, nodes=None):
+    datados = nodes if nodes is not None else get_nodes(api_key, cluster_id)
     items = datados.get("items", [])
     total_nodes = len(items)
 
@@ -76,6 +123,9 @@ def simplify_version(provider, version_str):
         parts = version_part.split(".")
         return ".".join(parts[:2])
 
+_support_data = {}
+_support_data_lock = threading.Lock()
+
 def get_extended_support_data(provider):
     """
     Fetch the extended support data from endoflife.date for the given provider.
@@ -96,12 +146,18 @@ def get_extended_support_data(provider):
     if not url:
         print(f"No endpoint defined for provider {provider}")
         return []
-    try:
-        resp = requests.get(url, headers={"Accept": "application/json"})
-        data = resp.json()
-    except Exception as e:
-        print(f"Error fetching extended support data for {provider}: {e}")
-        data = []
+    # Every cluster of a provider shares the same list, so it is fetched once per run.
+    with _support_data_lock:
+        if provider.upper() in _support_data:
+            return _support_data[provider.upper()]
+        try:
+            resp = requests.get(url, headers={"Accept": "application/json"})
+            data = resp.json()
+        except Exception as e:
+            print(f"Error fetching extended support data for {provider}: {e}")
+            data = []
+        if data:
+            _support_data[provider.upper()] = data
     return data
 
 def determine_support_status(provider, version_str, support_data=None):
@@ -173,23 +229,21 @@ def determine_support_status(provider, version_str, support_data=None):
                 return "Unknown"
     return "Version not found"
 
-def get_cluster_ids(api_key, org_id):
+def get_cluster_ids(api_key, org_id, cluster_filter=None):
+    """
+    Returns the resource offering node counts per cluster ID from the org summary.
+    With a cluster_filter, clusters it already rules out from the summary fields
+    are dropped here so none of their per-cluster calls are made.
+    """
     print("Getting Organization Clusters", flush=True)
     url = "https://api.cast.ai/v1/cost-reports/organization/clusters/summary"
-    headers = {"accept": "application/json", "X-API-Key": api_key}
-    resp = requests.get(url, headers=headers)
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"Error decoding cluster IDs: {e}", flush=True)
-        data = {}
-    os.makedirs(os.path.join(org_dir, "json"), exist_ok=True)
-    if save_json == "on":
-        with open(os.path.join(org_dir, "json", "get_cluster_ids.json"), 'w') as file:
-            json.dump(data, file, indent=4)
+    data = castaiApi.get_json(api_key, url, "cluster IDs", save_as="get_cluster_ids.json",
+                              priority=castaiApi.PRIORITY_DISCOVERY)
     offerings = {}
     for item in data.get("items", []):
         cluster_id = item.get("clusterId")
+        if cluster_id and cluster_filter is not None and not summary_matches(cluster_filter, cluster_id, item):
+            continue
         if cluster_id:
             offerings[cluster_id] = {
                 "nodeCountOnDemand": int(item.get("nodeCountOnDemand", "0")),
@@ -200,20 +254,48 @@ def get_cluster_ids(api_key, org_id):
             }
     return offerings
 
+def summary_matches(cluster_filter, cluster_id, item):
+    name = item.get("clusterName")
+    environment = None
+    if name:
+        # Tags only matter when the name says nothing, so a name match is final.
+        environment = detect_environment(name)
+        if environment == "unknown":
+            environment = None
+    return cluster_filter.check(cluster_id=cluster_id, name=name, provider=item.get("providerType") or None,
+                                environment=environment)
+
+def details_match(cluster_filter, cluster_id, details):
+    name = details.get("name", "")
+    tags = details.get("tags", {}) or {}
+    return cluster_filter.check(
+        cluster_id=cluster_id,
+        name=name,
+        provider=details.get("providerType", ""),
+        environment=detect_environment(name, tags.get("Environment", "")),
+        connected_date=get_connected_date(cluster_id, details) or "",
+    )
+
+def get_connected_date(cluster_id, details):
+    """First operation date of the cluster (creation date for Anywhere clusters), or None."""
+    provider = details.get("providerType", "") or ""
+    if provider.lower() == "anywhere":
+        date_str = details.get("createdAt", "")
+    else:
+        date_str = details.get("firstOperationAt", "")
+    if not date_str:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(date_str[:10]).date()
+    except Exception as e:
+        print(f"Error parsing Connected Date for cluster {cluster_id}: {e}", flush=True)
+        return None
+
 def get_cluster_details(api_key, cluster_id):
     print(f"Getting Cluster Details for cluster {cluster_id}", flush=True)
     url = f"https://api.cast.ai/v1/kubernetes/external-clusters/{cluster_id}"
-    headers = {"accept": "application/json", "X-API-Key": api_key}
-    resp = requests.get(url, headers=headers)
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"Error decoding cluster details for {cluster_id}: {e}", flush=True)
-        data = {}
-    os.makedirs(os.path.join(org_dir, "json"), exist_ok=True)
-    if save_json == "on":
-        with open(os.path.join(org_dir, "json", f"get_cluster_details_{cluster_id}.json"), 'w') as file:
-            json.dump(data, file, indent=4)
+    data = castaiApi.get_json(api_key, url, f"cluster details for {cluster_id}",
+                              save_as=f"get_cluster_details_{cluster_id}.json", priority=castaiApi.PRIORITY_DETAILS)
     return data
 
 def compute_resource_offering(offering):
@@ -230,30 +312,13 @@ def compute_resource_offering(offering):
 
 def get_evictor_status(api_key, cluster_id):
     post_url = f"https://api.cast.ai/v1/kubernetes/clusters/{cluster_id}/evictor-config"
-    headers = {"accept": "application/json", "X-API-Key": api_key, "Content-Type": "application/json"}
-    post_resp = requests.post(post_url, headers=headers, json={})
-    try:
-        post_data = post_resp.json()
-    except Exception as e:
-        print(f"Error decoding evictor config POST for {cluster_id}: {e}", flush=True)
-        post_data = {}
-    if save_json == "on":
-        post_file = os.path.join(org_dir, "json", f"post_evictor_config_{cluster_id}.json")
-        with open(post_file, 'w') as f:
-            json.dump(post_data, f, indent=4)
+    post_data = castaiApi.post_json(api_key, post_url, {}, f"evictor config POST for {cluster_id}",
+                                    save_as=f"post_evictor_config_{cluster_id}.json")
     if not post_data.get("isReady", False):
         return "Uninstalled"
     get_url = f"https://api.cast.ai/v1/kubernetes/clusters/{cluster_id}/evictor-advanced-config"
-    get_resp = requests.get(get_url, headers={"accept": "application/json", "X-API-Key": api_key})
-    try:
-        get_data = get_resp.json()
-    except Exception as e:
-        print(f"Error decoding evictor advanced config GET for {cluster_id}: {e}", flush=True)
-        get_data = {}
-    if save_json == "on":
-        get_file = os.path.join(org_dir, "json", f"get_evictor_advanced_config_{cluster_id}.json")
-        with open(get_file, 'w') as f:
-            json.dump(get_data, f, indent=4)
+    get_data = castaiApi.get_json(api_key, get_url, f"evictor advanced config GET for {cluster_id}",
+                                  save_as=f"get_evictor_advanced_config_{cluster_id}.json")
     if "evictionConfig" in get_data:
         if not get_data["evictionConfig"]:
             return "Installed (Basic)"
@@ -263,32 +328,14 @@ def get_evictor_status(api_key, cluster_id):
 
 def get_cluster_settings(api_key, cluster_id):
     url = f"https://api.cast.ai/v1/kubernetes/clusters/{cluster_id}/settings"
-    headers = {"X-API-Key": api_key, "accept": "application/json"}
-    resp = requests.get(url, headers=headers)
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"Error decoding settings for cluster {cluster_id}: {e}", flush=True)
-        data = {}
-    if save_json == "on":
-        file_path = os.path.join(org_dir, "json", f"get_cluster_settings_{cluster_id}.json")
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+    data = castaiApi.get_json(api_key, url, f"settings for cluster {cluster_id}",
+                              save_as=f"get_cluster_settings_{cluster_id}.json")
     return data
 
 def get_rebalancing_plans(api_key, cluster_id):
     url = f"https://api.cast.ai/v1/kubernetes/clusters/{cluster_id}/rebalancing-plans?limit=10"
-    headers = {"X-API-Key": api_key, "accept": "application/json"}
-    resp = requests.get(url, headers=headers)
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"Error decoding rebalancing plans for cluster {cluster_id}: {e}", flush=True)
-        data = {}
-    if save_json == "on":
-        file_path = os.path.join(org_dir, "json", f"get_rebalancing_plans_{cluster_id}.json")
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+    data = castaiApi.get_json(api_key, url, f"rebalancing plans for cluster {cluster_id}",
+                              save_as=f"get_rebalancing_plans_{cluster_id}.json")
     for plan in data.get("items", []):
         if plan.get("status", "").lower() == "finished":
             return "Yes"
@@ -296,24 +343,15 @@ def get_rebalancing_plans(api_key, cluster_id):
 
 def get_woop_enabled_percent(api_key, cluster_id):
     url = f"https://api.cast.ai/v1/workload-autoscaling/clusters/{cluster_id}/workloads-summary?includeCosts=true"
-    headers = {"accept": "application/json", "X-API-Key": api_key}
-    resp = requests.get(url, headers=headers)
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"Error decoding workloads-summary for cluster {cluster_id}: {e}", flush=True)
-        data = {}
-    if save_json == "on":
-        file_path = os.path.join(org_dir, "json", f"get_workloads_summary_{cluster_id}.json")
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+    data = castaiApi.get_json(api_key, url, f"workloads-summary for cluster {cluster_id}",
+                              save_as=f"get_workloads_summary_{cluster_id}.json")
     total = data.get("totalCount", 0)
     optimized = data.get("optimizedCount", 0)
     try:
         ratio = float(optimized) / float(total) if float(total) > 0 else 0
     except:
         ratio = 0
-    return f"{ratio*100:.2f}%"
+    return ratio * 100
 
 def detect_environment(cluster_name, tag_env=""):
     name = cluster_name.lower()
@@ -337,32 +375,38 @@ def detect_environment(cluster_name, tag_env=""):
         return tag_env.upper()
     return "unknown"
 
-def get_nodes_managed(api_key, cluster_id, provider_name):
+def get_nodes(api_key, cluster_id):
+    url = f"https://api.cast.ai/v1/kubernetes/external-clusters/{cluster_id}/nodes?nodeStatus=node_status_unspecified&lifecycleType=lifecycle_type_unspecified"
+    return castaiApi.get_json(api_key, url, f"nodes for cluster {cluster_id}", save_as=f"nodes_{cluster_id}.json", require_ok=True)
+
+def sample_nodes(cluster_id, items, approx_error):
+    """
+    Nodes to aggregate in the approximate mode: a uniform sample sized for
+    approx_error (see approxStats.sample_size), or every node of a cluster
+    small enough. Seeded by the cluster so every column sees the same sample.
+    Returns (nodes, whether they are a sample).
+    """
+    size = approxStats.sample_size(approx_error)
+    if len(items) <= size:
+        return items, False
+    reservoir = approxStats.Reservoir(size, seed=cluster_id)
+    reservoir.extend(items)
+    return reservoir.items, True
+
+def get_nodes_managed(api_key, cluster_id, provider_name, stats_rows=None, nodes=None, approx_error=None):
     """
     Calls the nodes endpoint for a given cluster and calculates the percentage
     of nodes managed by CastAI, by the provider (using provider_name), and, if any,
     by Karpenter.
     Returns a string formatted like:
       "CastAI = 20.00%; EKS = 70.00%; Karpenter = 10.00%"
+    If stats_rows is given, the per-manager utilization distribution
+    (see node_utilization_stats) is appended to it. An already fetched nodes
+    payload can be passed in to avoid fetching it again. With approx_error,
+    clusters larger than the sample size are aggregated from a node sample and
+    their node counts are shown as "~" estimates.
     """
-    url = f"https://api.cast.ai/v1/kubernetes/external-clusters/{cluster_id}/nodes?nodeStatus=node_status_unspecified&lifecycleType=lifecycle_type_unspecified"
-    headers = {"X-API-Key": api_key, "accept": "application/json"}
-    resp = requests.get(url, headers=headers)
-    
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"Error decoding nodes for cluster {cluster_id}: {e}", flush=True)
-        data = {}
-    
-    # Make sure the directory exists
-    #org_dir = os.path.join(os.getcwd(), "json")
-    os.makedirs(org_dir, exist_ok=True)
-    os.makedirs(os.path.join(org_dir, "json"), exist_ok=True)
-    if save_json == "on":    
-        file_path = os.path.join(org_dir, "json", f"nodes_{cluster_id}.json")
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=4)
+    data = nodes if nodes is not None else get_nodes(api_key, cluster_id)
     
     items = data.get("items", [])
     total_nodes = len(items)
@@ -376,247 +420,358 @@ def get_nodes_managed(api_key, cluster_id, provider_name):
         value = "Nodes 100% managed by Kubernetes Controller"
         return value
     
-    manager_counts = {
-        "CastAI": 0,
-        "Karpenter": 0,
-        provider_key: 0
-    }
-    
-    # Lists to store CPU and memory usage percentages for each manager
-    cpu_usage_by_manager = {
-        "CastAI": [],
-        "Karpenter": [],
-        provider_key: []
-    }
-    
-    mem_usage_by_manager = {
-        "CastAI": [],
-        "Karpenter": [],
-        provider_key: []
-    }
-    
-    for item in items:
-        labels = item.get("labels", {})
-        resources = item.get("resources", {})
-        
-        # Determine node manager
-        if "provisioner.cast.ai/managed-by" in labels and labels["provisioner.cast.ai/managed-by"] == "cast.ai":
-            manager = "CastAI"
-            manager_counts["CastAI"] += 1
-        elif "karpenter.sh/registered" in labels and labels["karpenter.sh/registered"] == "true":
-            manager = "Karpenter"
-            manager_counts["Karpenter"] += 1
-        else:
-            manager = provider_key
-            manager_counts[provider_key] += 1
-        if "failure-domain.beta.kubernetes.io/region" in labels:
-            region = labels["failure-domain.beta.kubernetes.io/region"]
-        
-        # Calculate CPU usage percentage
-        cpu_capacity = resources.get("cpuCapacityMilli", 0)
-        cpu_requests = resources.get("cpuRequestsMilli", 0)
-        
-        if cpu_capacity > 0:
-            cpu_usage_pct = (cpu_requests / cpu_capacity) * 100
-            cpu_usage_by_manager[manager].append(cpu_usage_pct)
-        
-        # Calculate memory usage percentage
-        mem_capacity = resources.get("memCapacityMib", 0)
-        mem_requests = resources.get("memRequestsMib", 0)
-        
-        if mem_capacity > 0:
-            mem_usage_pct = (mem_requests / mem_capacity) * 100
-            mem_usage_by_manager[manager].append(mem_usage_pct)
-    
-    # Calculate average usage percentages
-    avg_cpu_usage = {}
-    avg_mem_usage = {}
-    
-    for manager in manager_counts.keys():
-        if cpu_usage_by_manager[manager]:
-            avg_cpu_usage[manager] = statistics.mean(cpu_usage_by_manager[manager])
-        else:
-            avg_cpu_usage[manager] = 0
-            
-        if mem_usage_by_manager[manager]:
-            avg_mem_usage[manager] = statistics.mean(mem_usage_by_manager[manager])
-        else:
-            avg_mem_usage[manager] = 0
+    managers = ["CastAI", "Karpenter", provider_key]
+    sampled = False
+    if approx_error is not None:
+        items, sampled = sample_nodes(cluster_id, items, approx_error)
+    manager_codes, cpu_ratio, mem_ratio = node_utilization_arrays(items)
+    # Each sampled node stands for total_nodes / len(items) nodes.
+    scale = total_nodes / len(items)
+    approx_mark = "~" if sampled else ""
     
     result_parts = []
     
     # Build formatted output for each manager with nodes
-    for manager in manager_counts.keys():
-        if manager_counts[manager] > 0:
-            node_percentage = (manager_counts[manager] / total_nodes) * 100
+    for code, manager in enumerate(managers):
+        mask = manager_codes == code
+        count = int(round(mask.sum() * scale))
+        if count > 0:
+            node_percentage = (count / total_nodes) * 100
+            avg_cpu = nan_mean(cpu_ratio[mask])
+            avg_mem = nan_mean(mem_ratio[mask])
             manager_result = (
-                f"{manager}: {manager_counts[manager]}/{total_nodes} nodes ({node_percentage:.1f}%), "
-                f"{avg_cpu_usage[manager]:.1f}% CPU usage, "
-                f"{avg_mem_usage[manager]:.1f}% memory usage"
+                f"{manager}: {approx_mark}{count}/{total_nodes} nodes ({node_percentage:.1f}%), "
+                f"{avg_cpu:.1f}% CPU usage, "
+                f"{avg_mem:.1f}% memory usage"
             )
             result_parts.append(manager_result)
     
+    if stats_rows is not None:
+        if approx_error is None:
+            stats_rows.extend(node_utilization_stats(cluster_id, managers, manager_codes, cpu_ratio, mem_ratio))
+        else:
+            stats_rows.extend(node_utilization_sketch_stats(cluster_id, managers, manager_codes, cpu_ratio, mem_ratio,
+                                                            scale, approx_error))
+    
     # Join all results with semicolon
     # print(result_parts)
     return "; ".join(result_parts)
 
-def get_cpu_count(api_key, cluster_id):
+def node_utilization_arrays(items):
+    """
+    Flattens the nodes payload into arrays: manager code (0 = CastAI,
+    1 = Karpenter, 2 = provider) and CPU / memory request percentage per node.
+    Nodes without capacity get NaN so they are left out of the statistics.
+    """
+    count = len(items)
+    manager_codes = np.full(count, 2, dtype=np.int8)
+    cpu = np.zeros((2, count), dtype=np.float64)
+    mem = np.zeros((2, count), dtype=np.float64)
+    for i, item in enumerate(items):
+        labels = item.get("labels", {})
+        resources = item.get("resources", {})
+        if labels.get("provisioner.cast.ai/managed-by") == "cast.ai":
+            manager_codes[i] = 0
+        elif labels.get("karpenter.sh/registered") == "true":
+            manager_codes[i] = 1
+        cpu[0, i] = resources.get("cpuRequestsMilli", 0) or 0
+        cpu[1, i] = resources.get("cpuCapacityMilli", 0) or 0
+        mem[0, i] = resources.get("memRequestsMib", 0) or 0
+        mem[1, i] = resources.get("memCapacityMib", 0) or 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cpu_ratio = np.where(cpu[1] > 0, cpu[0] / cpu[1] * 100, np.nan)
+        mem_ratio = np.where(mem[1] > 0, mem[0] / mem[1] * 100, np.nan)
+    return manager_codes, cpu_ratio, mem_ratio
+
+def nan_mean(values):
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if values.size else 0
+
+def node_utilization_stats(cluster_id, managers, manager_codes, cpu_ratio, mem_ratio):
+    """
+    Per-manager distribution of CPU and memory request percentages: node count,
+    mean, min, p50, p90, p99, max and a fixed-bucket histogram (see
+    NODE_UTILIZATION_BUCKETS). Histograms for all managers come from one bincount.
+    """
+    bucket_count = len(NODE_UTILIZATION_BUCKETS) - 1
+    bucket_labels = [
+        f"{int(low)}_{int(high)}" if np.isfinite(high) else f"{int(low)}_plus"
+        for low, high in zip(NODE_UTILIZATION_BUCKETS[:-1], NODE_UTILIZATION_BUCKETS[1:])
+    ]
+    histograms = {}
+    for name, ratio in [("cpu", cpu_ratio), ("mem", mem_ratio)]:
+        valid = ~np.isnan(ratio)
+        buckets = np.digitize(ratio[valid], NODE_UTILIZATION_BUCKETS[1:-1])
+        flat = manager_codes[valid].astype(np.int64) * bucket_count + buckets
+        histograms[name] = np.bincount(flat, minlength=len(managers) * bucket_count).reshape(len(managers), bucket_count)
+    
+    rows = []
+    for code, manager in enumerate(managers):
+        mask = manager_codes == code
+        if not mask.any():
+            continue
+        row = {"ClusterID": cluster_id, "Manager": manager, "Nodes": int(mask.sum())}
+        for name, ratio in [("cpu", cpu_ratio), ("mem", mem_ratio)]:
+            values = ratio[mask]
+            values = values[~np.isnan(values)]
+            if values.size:
+                p50, p90, p99 = np.percentile(values, [50, 90, 99])
+                stats = [values.mean(), values.min(), p50, p90, p99, values.max()]
+            else:
+                stats = [np.nan] * 6
+            for stat_name, value in zip(["mean", "min", "p50", "p90", "p99", "max"], stats):
+                row[f"{name}_request_pct_{stat_name}"] = round(float(value), 2)
+            for label, bucket_value in zip(bucket_labels, histograms[name][code]):
+                row[f"{name}_hist_{label}"] = int(bucket_value)
+        rows.append(row)
+    return rows
+
+def node_utilization_sketch_stats(cluster_id, managers, manager_codes, cpu_ratio, mem_ratio, scale, approx_error):
+    """
+    node_utilization_stats for the approximate mode. The statistics come from
+    the node sample, with node counts and histograms scaled up to the cluster.
+    Each row also carries mergeable quantile sketches under "_sketches" for
+    org_utilization_rows; they are dropped before the CSV is written.
+    """
+    rows = node_utilization_stats(cluster_id, managers, manager_codes, cpu_ratio, mem_ratio)
+    for row in rows:
+        mask = manager_codes == managers.index(row["Manager"])
+        row["approximate"] = scale > 1
+        row["sampled_nodes"] = int(mask.sum())
+        row["Nodes"] = int(round(row["Nodes"] * scale))
+        row["_sketches"] = {}
+        for name, ratio in [("cpu", cpu_ratio), ("mem", mem_ratio)]:
+            for col in row:
+                if col.startswith(f"{name}_hist_"):
+                    row[col] = int(round(row[col] * scale))
+            sketch = approxStats.QuantileSketch(approx_error)
+            sketch.add_array(ratio[mask], weight=scale)
+            row["_sketches"][name] = sketch
+    return rows
+
+def org_utilization_rows(stats_rows, approx_error):
+    """
+    One org-wide row per manager ("ALL" as ClusterID) merged from the clusters'
+    sketches, so the org distribution needs no per-node values. Quantiles are
+    within approx_error relative error of the sampled distribution.
+    """
+    rows = []
+    managers = sorted({row["Manager"] for row in stats_rows})
+    for manager in managers:
+        cluster_rows = [row for row in stats_rows if row["Manager"] == manager]
+        org_row = {"ClusterID": "ALL", "Manager": manager, "Nodes": sum(row["Nodes"] for row in cluster_rows)}
+        for name in ["cpu", "mem"]:
+            sketch = approxStats.QuantileSketch(approx_error)
+            for row in cluster_rows:
+                sketch.merge(row["_sketches"][name])
+            weights = [row["_sketches"][name].count for row in cluster_rows]
+            means = [row[f"{name}_request_pct_mean"] for row in cluster_rows]
+            known = [(w, m) for w, m in zip(weights, means) if w and not np.isnan(m)]
+            total = sum(w for w, _ in known)
+            org_row[f"{name}_request_pct_mean"] = round(sum(w * m for w, m in known) / total, 2) if total else np.nan
+            mins = [row[f"{name}_request_pct_min"] for row in cluster_rows if not np.isnan(row[f"{name}_request_pct_min"])]
+            maxes = [row[f"{name}_request_pct_max"] for row in cluster_rows if not np.isnan(row[f"{name}_request_pct_max"])]
+            org_row[f"{name}_request_pct_min"] = min(mins) if mins else np.nan
+            for stat_name, q in [("p50", 0.5), ("p90", 0.9), ("p99", 0.99)]:
+                org_row[f"{name}_request_pct_{stat_name}"] = round(sketch.quantile(q), 2)
+            org_row[f"{name}_request_pct_max"] = max(maxes) if maxes else np.nan
+            for col in cluster_rows[0]:
+                if col.startswith(f"{name}_hist_"):
+                    org_row[col] = sum(row[col] for row in cluster_rows)
+        org_row["approximate"] = True
+        org_row["sampled_nodes"] = sum(row["sampled_nodes"] for row in cluster_rows)
+        rows.append(org_row)
+    return rows
+
+def get_cpu_count(api_key, cluster_id, nodes=None, approx_error=None):
     """
     Returns the total CPU capacity (in millicores) provided by all nodes in the cluster.
     It uses the external-clusters nodes endpoint and sums up the value of 
-    resource.cpuCapacityMilli for each node.
+    resource.cpuCapacityMilli for each node. With approx_error, large clusters
+    are estimated from the node sample of sample_nodes.
     """
-    url = f"https://api.cast.ai/v1/kubernetes/external-clusters/{cluster_id}/nodes?nodeStatus=node_status_unspecified&lifecycleType=lifecycle_type_unspecified"
-    headers = {"X-API-Key": api_key, "accept": "application/json"}
-    resp = requests.get(url, headers=headers)
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"Error decoding nodes for cluster {cluster_id}: {e}", flush=True)
-        data = {}
-    # Save the JSON response if needed
-    os.makedirs(os.path.join(org_dir, "json"), exist_ok=True)
-    if save_json == "on":
-        file_path = os.path.join(org_dir, "json", f"nodes_{cluster_id}.json")
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=4)
+    data = nodes if nodes is not None else get_nodes(api_key, cluster_id)
+    items = data.get("items", [])
+    scale = 1.0
+    if approx_error is not None and items:
+        sample, sampled = sample_nodes(cluster_id, items, approx_error)
+        if sampled:
+            scale = len(items) / len(sample)
+            items = sample
     total_cpu = 0.0
-    for node in data.get("items", []):
+    for node in items:
         try:
             cpu = float(node.get("resources", {}).get("cpuCapacityMilli", 0))
         except Exception as e:
             print(f"Error processing cpuCapacityMilli for node in cluster {cluster_id}: {e}", flush=True)
             cpu = 0.0
         total_cpu += cpu
-    total_cpu = total_cpu/1000
+    total_cpu = total_cpu * scale / 1000
     total_cpu = round(total_cpu, None)
     return total_cpu
 
-def extract_cluster_info(cluster_id, details, offerings, api_key, schedule_map):
-    info = {}
-    info["ClusterID"] = cluster_id
-    info["Cluster Name"] = details.get("name", "")
+def extract_cluster_info(cluster_id, details, offerings, api_key, schedule_map, stats_rows=None, info=None, columns=None,
+                         approx_error=None, inventory=None, nodes_payload=None):
+    """
+    Fill the cluster_details.csv columns of one cluster. With columns, only
+    those are computed and only the endpoints they need (see COLUMN_INPUTS)
+    are called; the nodes payload is fetched at most once either way. With
+    approx_error, the "Approximate" column lists the estimated columns. When
+    the nodes are fetched and inventory is a dict, the cluster's node columns
+    are added to it for the node inventory store. Calls that share a
+    nodes_payload dict fetch the nodes once between them.
+    """
+    # Filling a caller-owned dict keeps the columns already computed if a later call fails.
+    info = {} if info is None else info
+    wanted = set(DETAIL_COLUMNS if columns is None else columns)
     provider = details.get("providerType", "")
-    info["Provider"] = provider.upper() if provider else ""
+    nodes_payload = {} if nodes_payload is None else nodes_payload
 
-    is_phase2 = details.get("isPhase2")
-    if is_phase2 in [True, "true", "True"]:
-        info["Phase 1"] = "Yes"
-        info["Phase 2"] = "Yes"
-    else:
-        info["Phase 1"] = "Yes"
-        info["Phase 2"] = "No"
-    
-    info["WOOP Enabled"] = "Yes" if get_woop_enabled_percent(api_key, cluster_id) != "0.00%" else "No"
+    def nodes():
+        if "data" not in nodes_payload:
+            nodes_payload["data"] = get_nodes(api_key, cluster_id)
+            # An error reply or undecodable body has no items list; recording
+            # it would store a 0-node snapshot.
+            items = nodes_payload["data"].get("items")
+            if inventory is not None and isinstance(items, list):
+                inventory[cluster_id] = nodeInventory.node_columns(items)
+        return nodes_payload["data"]
 
-    if cluster_id in offerings:
-        info["Resource Offering"] = compute_resource_offering(offerings[cluster_id])
-    else:
-        info["Resource Offering"] = details.get("resourceOffering", "")
+    info["ClusterID"] = cluster_id
+    if "Cluster Name" in wanted:
+        info["Cluster Name"] = details.get("name", "")
+    if "Provider" in wanted:
+        info["Provider"] = provider.upper() if provider else ""
+
+    if "Phase 1" in wanted or "Phase 2" in wanted:
+        is_phase2 = details.get("isPhase2")
+        if is_phase2 in [True, "true", "True"]:
+            info["Phase 1"] = "Yes"
+            info["Phase 2"] = "Yes"
+        else:
+            info["Phase 1"] = "Yes"
+            info["Phase 2"] = "No"
     
-    info["First Rebalance"] = get_rebalancing_plans(api_key, cluster_id)
+    if "WOOP Enabled" in wanted or "WOOP enabled %" in wanted:
+        woop_percent = f"{get_woop_enabled_percent(api_key, cluster_id):.2f}%"
+        info["WOOP Enabled"] = "Yes" if woop_percent != "0.00%" else "No"
+        info["WOOP enabled %"] = woop_percent
+
+    if "Resource Offering" in wanted:
+        if cluster_id in offerings:
+            info["Resource Offering"] = compute_resource_offering(offerings[cluster_id])
+        else:
+            info["Resource Offering"] = details.get("resourceOffering", "")
     
-    info["Special Considerations"] = details.get("specialConsiderations", "")
+    if "First Rebalance" in wanted:
+        info["First Rebalance"] = get_rebalancing_plans(api_key, cluster_id)
     
-    if provider.lower() == "anywhere":
-        date_str = details.get("createdAt", "")
-    else:
-        date_str = details.get("firstOperationAt", "")
-    if date_str:
-        try:
-            info["Connected Date"] = datetime.datetime.fromisoformat(date_str[:10]).date().isoformat()
-        except Exception as e:
-            print(f"Error parsing Connected Date for cluster {cluster_id}: {e}", flush=True)
-            info["Connected Date"] = ""
-    else:
-        info["Connected Date"] = ""
+    if "Special Considerations" in wanted:
+        info["Special Considerations"] = details.get("specialConsiderations", "")
     
-    tags = details.get("tags", {})
-    info["Environment"] = detect_environment(details.get("name", ""), tags.get("Environment", ""))
+    if "Connected Date" in wanted:
+        connected_date = get_connected_date(cluster_id, details)
+        info["Connected Date"] = connected_date.isoformat() if connected_date else ""
     
-    info["Evictor"] = get_evictor_status(api_key, cluster_id)
+    if "Environment" in wanted:
+        tags = details.get("tags", {})
+        info["Environment"] = detect_environment(details.get("name", ""), tags.get("Environment", ""))
     
-    if cluster_id in schedule_map:
-        info["Scheduled Rebalance"] = "Yes: " + "; ".join(schedule_map[cluster_id])
-    else:
-        info["Scheduled Rebalance"] = ""
+    if "Evictor" in wanted:
+        info["Evictor"] = get_evictor_status(api_key, cluster_id)
     
-    info["Node Templates Review"] = details.get("nodeTemplatesReview", "")
-    info["WOOP enabled %"] = get_woop_enabled_percent(api_key, cluster_id)
-    k8sVersion = details.get("kubernetesVersion", "")
-    if provider.lower() == "eks":
-        info["Kubernetes version"] = k8sVersion
-        info["Extended Support"] = determine_support_status(provider, k8sVersion)
-    elif provider.lower() == "gke":
-        gkeVersion = ".".join(k8sVersion.split("-")[0].split(".")[:2])
-        info["Kubernetes version"] = gkeVersion
-        info["Extended Support"] = determine_support_status(provider, gkeVersion)
-    elif provider.lower() == "aks":
-        parts = k8sVersion.split(".")
-        aksVersion = ".".join(parts[:2])
-        info["Kubernetes version"] = aksVersion
-        info["Extended Support"] = determine_support_status(provider, aksVersion)
-    elif provider.lower() == "anywhere":
-        av = getFargateVersion(cluster_id, api_key)
-        info["Kubernetes version"] = av
-        k8sversion=str(av)
-        knownAnywhere = getKnownAnywhere(cluster_id, api_key)
-        if knownAnywhere == "fargate":
-            info["Extended Support"] = determine_support_status("eks", k8sversion)
+    if "Scheduled Rebalance" in wanted:
+        if cluster_id in schedule_map:
+            info["Scheduled Rebalance"] = "Yes: " + "; ".join(schedule_map[cluster_id])
         else:
-            info["Extended Support"] = "Not Apply"
+            info["Scheduled Rebalance"] = ""
     
-    settings = get_cluster_settings(api_key, cluster_id)
-    karp_val = settings.get("karpenterInstalled", False)
-    if isinstance(karp_val, bool):
-        info["KarpenterInstalled"] = "Yes" if karp_val else "No"
-    else:
-        info["KarpenterInstalled"] = str(karp_val)
+    if "Node Templates Review" in wanted:
+        info["Node Templates Review"] = details.get("nodeTemplatesReview", "")
+
+    if "Kubernetes version" in wanted or "Extended Support" in wanted:
+        k8sVersion = details.get("kubernetesVersion", "")
+        check_support = "Extended Support" in wanted
+        if provider.lower() == "eks":
+            info["Kubernetes version"] = k8sVersion
+            if check_support:
+                info["Extended Support"] = determine_support_status(provider, k8sVersion)
+        elif provider.lower() == "gke":
+            gkeVersion = ".".join(k8sVersion.split("-")[0].split(".")[:2])
+            info["Kubernetes version"] = gkeVersion
+            if check_support:
+                info["Extended Support"] = determine_support_status(provider, gkeVersion)
+        elif provider.lower() == "aks":
+            parts = k8sVersion.split(".")
+            aksVersion = ".".join(parts[:2])
+            info["Kubernetes version"] = aksVersion
+            if check_support:
+                info["Extended Support"] = determine_support_status(provider, aksVersion)
+        elif provider.lower() == "anywhere":
+            av = getFargateVersion(cluster_id, api_key, nodes())
+            info["Kubernetes version"] = av
+            k8sversion=str(av)
+            if check_support:
+                knownAnywhere = getKnownAnywhere(cluster_id, api_key, nodes())
+                if knownAnywhere == "fargate":
+                    info["Extended Support"] = determine_support_status("eks", k8sversion)
+                else:
+                    info["Extended Support"] = "Not Apply"
+    
+    if "KarpenterInstalled" in wanted:
+        settings = get_cluster_settings(api_key, cluster_id)
+        karp_val = settings.get("karpenterInstalled", False)
+        if isinstance(karp_val, bool):
+            info["KarpenterInstalled"] = "Yes" if karp_val else "No"
+        else:
+            info["KarpenterInstalled"] = str(karp_val)
     
     # New column "Nodes Managed"
-    info["Nodes Managed"] = get_nodes_managed(api_key, cluster_id, provider)
+    if "Nodes Managed" in wanted:
+        info["Nodes Managed"] = get_nodes_managed(api_key, cluster_id, provider, stats_rows, nodes(), approx_error)
 
     #Get Region
-    if provider.lower() == "anywhere":
-        info["Region"] = get_anywhere_region(api_key, cluster_id)
-    elif provider.lower() == "eks" or "gke" or "aks":
-        regionlabels = details.get("region")
-        info["Region"] = regionlabels.get("name")
-    else:
-        info["Region"] = "Unknown"
-    info["CPU Count"] = get_cpu_count(api_key,cluster_id)
+    if "Region" in wanted:
+        if provider.lower() == "anywhere":
+            info["Region"] = get_anywhere_region(api_key, cluster_id, nodes())
+        elif provider.lower() == "eks" or "gke" or "aks":
+            regionlabels = details.get("region")
+            info["Region"] = regionlabels.get("name")
+        else:
+            info["Region"] = "Unknown"
 
     # Get Account ID or name
-    if provider.lower() == "anywhere":
-        info["accoundID"] = "Unknown"
-    elif provider.lower() == "eks":
-        providerlabels = details.get(provider.lower())
-        info["accountID"] = providerlabels.get("accountId")    
-    elif provider.lower() == "gke":
-        providerlabels = details.get(provider.lower())
-        info["accountID"] = providerlabels.get("projectId")
-    elif provider.lower() == "aks":
-        providerlabels = details.get(provider.lower())
-        info["accountID"] = providerlabels.get("nodeResourceGroup")
-    else:
-        info["accountID"] = "Unknown"
-    info["CPU Count"] = get_cpu_count(api_key,cluster_id) 
+    if "accountID" in wanted:
+        if provider.lower() == "anywhere":
+            info["accoundID"] = "Unknown"
+        elif provider.lower() == "eks":
+            providerlabels = details.get(provider.lower())
+            info["accountID"] = providerlabels.get("accountId")    
+        elif provider.lower() == "gke":
+            providerlabels = details.get(provider.lower())
+            info["accountID"] = providerlabels.get("projectId")
+        elif provider.lower() == "aks":
+            providerlabels = details.get(provider.lower())
+            info["accountID"] = providerlabels.get("nodeResourceGroup")
+        else:
+            info["accountID"] = "Unknown"
+    if "CPU Count" in wanted:
+        info["CPU Count"] = get_cpu_count(api_key, cluster_id, nodes(), approx_error)
+
+    if approx_error is not None:
+        estimated = [col for col in ["CPU Count", "Nodes Managed"] if col in wanted]
+        # A time-budgeted run computes the two columns in separate passes.
+        marked = [col for col in info.get("Approximate", "").split(", ") if col]
+        if estimated and len(nodes().get("items", [])) > approxStats.sample_size(approx_error):
+            marked += estimated
+        info["Approximate"] = ", ".join(col for col in ["CPU Count", "Nodes Managed"] if col in marked)
 
     return info
 
 def get_all_rebalancing_schedules(api_key):
     url = "https://api.cast.ai/v1/rebalancing-schedules"
-    headers = {"accept": "application/json", "X-API-Key": api_key}
-    resp = requests.get(url, headers=headers)
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"Error decoding rebalancing schedules: {e}", flush=True)
-        data = {}
-    if save_json == "on":
-        file_path = os.path.join(org_dir, "json", "get_rebalancing_schedules.json")
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=4)
+    data = castaiApi.get_json(api_key, url, "rebalancing schedules", save_as="get_rebalancing_schedules.json",
+                              priority=castaiApi.PRIORITY_DISCOVERY)
     schedule_map = {}
     for schedule in data.get("schedules", []):
         cron = schedule.get("schedule", {}).get("cron", "")
@@ -628,24 +783,8 @@ def get_all_rebalancing_schedules(api_key):
                 schedule_map.setdefault(cid, []).append(schedule_desc)
     return schedule_map
 
-def get_anywhere_region(api_key, cluster_id):
-    urldos = f"https://api.cast.ai/v1/kubernetes/external-clusters/{cluster_id}/nodes?nodeStatus=node_status_unspecified&lifecycleType=lifecycle_type_unspecified"
-    headersdos = {"X-API-Key": api_key, "accept": "application/json"}
-    respdos = requests.get(urldos, headers=headersdos)
-    try:
-        datados = respdos.json()
-    except Exception as e:
-        print(f"Error decoding nodes for cluster {cluster_id}: {e}", flush=True)
-        datados = {}
-    
-    # Make sure the directory exists
-    #org_dir = os.path.join(os.getcwd(), "json")
-    os.makedirs(org_dir, exist_ok=True)
-    os.makedirs(os.path.join(org_dir, "json"), exist_ok=True)
-    if save_json == "on":    
-        file_path = os.path.join(org_dir, "json", f"nodes_{cluster_id}.json")
-        with open(file_path, "w") as f:
-            json.dump(datados, f, indent=4)
+def get_anywhere_region(api_key, cluster_id, nodes=None):
+    datados = nodes if nodes is not None else get_nodes(api_key, cluster_id)
     
     items = datados.get("items", [])
     total_nodes = len(items)
@@ -660,61 +799,308 @@ def get_anywhere_region(api_key, cluster_id):
             region = "Unknown"
     return region
 
-def fetch_cluster_info(api_key, org_id):
-    offerings = get_cluster_ids(api_key, org_id)
-    schedule_map = get_all_rebalancing_schedules(api_key)
-    cluster_ids = list(offerings.keys())
-    if not cluster_ids:
-        print("No clusters found.", flush=True)
-        return
-    all_cluster_info = []
-    for cluster_id in cluster_ids:
-        details = get_cluster_details(api_key, cluster_id)
-        cluster_info = extract_cluster_info(cluster_id, details, offerings, api_key, schedule_map)
-        all_cluster_info.append(cluster_info)
-    df = pd.DataFrame(all_cluster_info)
-    df["Connected Date"] = pd.to_datetime(df["Connected Date"], errors='coerce')
-    df.sort_values(by="Connected Date", inplace=True)
-    cols = ["ClusterID", "Cluster Name", "Provider", "Region", "Phase 1", "Phase 2", "WOOP Enabled",
-            "Resource Offering", "First Rebalance", "Special Considerations", "Connected Date",
-            "Environment", "Evictor", "Scheduled Rebalance", "Node Templates Review",
-            "WOOP enabled %", "Kubernetes version", "Extended Support", "KarpenterInstalled", "CPU Count",  "accountID", "Nodes Managed"]
-    df = df.reindex(columns=cols)
-    csv_path = os.path.join(org_dir, "csv", "cluster_details.csv")
+def partial_output_name(file_name, columns):
+    """Runs limited with --columns write next to the full cluster_details.csv."""
+    if columns is None:
+        return file_name
+    stem, ext = os.path.splitext(file_name)
+    return f"{stem}_partial{ext}"
+
+def parse_columns(value):
+    """Column list for --columns: names from DETAIL_COLUMNS or a COLUMN_PRESETS name."""
+    if value in COLUMN_PRESETS:
+        return COLUMN_PRESETS[value]
+    columns = [col.strip() for col in value.split(",") if col.strip()]
+    unknown = [col for col in columns if col not in DETAIL_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}. Choose from: {', '.join(DETAIL_COLUMNS)} or {', '.join(COLUMN_PRESETS)}")
+    if "ClusterID" not in columns:
+        columns.insert(0, "ClusterID")
+    return columns
+
+def column_passes(columns):
+    """
+    Column lists computed one after the other over all clusters: everything at
+    once normally, the CORE_COLUMNS first and then the rest under a time budget.
+    """
+    if not castaiApi.budget_active():
+        return [columns]
+    wanted = DETAIL_COLUMNS if columns is None else columns
+    passes = [[col for col in wanted if col in CORE_COLUMNS], [col for col in wanted if col not in CORE_COLUMNS]]
+    return [cols for cols in passes if cols]
+
+def count_pending(rows):
+    return sum(1 for row in rows for value in row.values() if value == PENDING)
+
+def fetch_cluster_info(api_key, org_id, org_dir, cluster_filter=None, columns=None, approx_error=None, keep_inventory=True):
+    """Write cluster_details.csv and nodes_utilization.csv; returns the number of PENDING cells."""
+    wanted = DETAIL_COLUMNS if columns is None else columns
+    with ThreadPoolExecutor(max_workers=CLUSTER_WORKERS) as executor:
+        # Both discovery calls are independent; the scheduler runs them ahead of per-cluster work.
+        schedules_future = None
+        if "Scheduled Rebalance" in wanted:
+            schedules_future = castaiApi.submit_in_context(executor, get_all_rebalancing_schedules, api_key)
+        with runProfiler.stage("parse"):
+            offerings = get_cluster_ids(api_key, org_id, cluster_filter)
+        schedule_map = schedules_future.result() if schedules_future else {}
+        cluster_ids = list(offerings.keys())
+        if not cluster_ids:
+            print("No clusters found.", flush=True)
+            return 0
+        node_stats_rows = []
+        inventory = {} if keep_inventory else None
+        states = {cluster_id: {} for cluster_id in cluster_ids}
+        for pass_columns in column_passes(columns):
+            futures = [
+                castaiApi.submit_in_context(executor, process_cluster, api_key, cluster_id, offerings, schedule_map, node_stats_rows,
+                                            cluster_filter, pass_columns, approx_error, inventory, states[cluster_id])
+                for cluster_id in cluster_ids
+            ]
+            results = [future.result() for future in futures]
+            # Clusters the filter ruled out are not looked at again.
+            cluster_ids = [cluster_id for cluster_id, info in zip(cluster_ids, results) if info is not None]
+        all_cluster_info = [states[cluster_id]["info"] for cluster_id in cluster_ids]
+    if not all_cluster_info:
+        print("No clusters match the filters.", flush=True)
+        return 0
+    pending = count_pending(all_cluster_info)
+    if pending:
+        print(f"Time budget exhausted: {pending} cells are {PENDING}, rerun with --fill-pending to fill them.", flush=True)
+    if inventory:
+        with runProfiler.stage("write"):
+            nodeInventory.record_snapshots(org_dir, inventory)
+    with runProfiler.stage("aggregate"):
+        df = pd.DataFrame(all_cluster_info)
+        if "Connected Date" in df.columns:
+            connected = pd.to_datetime(df["Connected Date"], errors='coerce')
+            if not (df["Connected Date"] == PENDING).any():
+                df["Connected Date"] = connected
+            df = df.loc[connected.sort_values().index]
+        cols = [col for col in DETAIL_COLUMNS if col in wanted]
+        if approx_error is not None:
+            cols.append("Approximate")
+        df = df.reindex(columns=cols)
+    output_name = cluster_filter.output_name if cluster_filter is not None else (lambda name: name)
+    csv_path = os.path.join(org_dir, "csv", partial_output_name(output_name("cluster_details.csv"), columns))
     os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-    df.to_csv(csv_path, index=False)
+    with runProfiler.stage("write"):
+        df.to_csv(csv_path, index=False)
     print(f"Cluster details saved to {csv_path}")
+    if "Nodes Managed" not in wanted:
+        return pending
+    stats_path = os.path.join(org_dir, "csv", output_name("nodes_utilization.csv"))
+    if approx_error is not None and node_stats_rows:
+        with runProfiler.stage("aggregate"):
+            node_stats_rows = node_stats_rows + org_utilization_rows(node_stats_rows, approx_error)
+            node_stats_rows = [{k: v for k, v in row.items() if k != "_sketches"} for row in node_stats_rows]
+    with runProfiler.stage("write"):
+        pd.DataFrame(node_stats_rows).to_csv(stats_path, index=False)
+    print(f"Node utilization distribution saved to {stats_path}")
+    return pending
+
+def fill_pending_cells(api_key, org_id, org_dir, cluster_filter=None, approx_error=None, keep_inventory=True):
+    """
+    Compute only the PENDING cells a time-budgeted run left in
+    cluster_details.csv and write the file back; returns the cells still
+    pending. The clusters' nodes_utilization.csv rows are replaced when their
+    Nodes Managed cell is filled.
+    """
+    output_name = cluster_filter.output_name if cluster_filter is not None else (lambda name: name)
+    csv_path = os.path.join(org_dir, "csv", output_name("cluster_details.csv"))
+    if not os.path.exists(csv_path):
+        print(f"{csv_path} not found, nothing to fill.", flush=True)
+        return 0
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    pending = {row["ClusterID"]: [col for col in df.columns if row[col] == PENDING] for _, row in df.iterrows()}
+    pending = {cluster_id: cols for cluster_id, cols in pending.items() if cols}
+    if not pending:
+        print(f"No {PENDING} cells in {csv_path}.", flush=True)
+        return 0
+    print(f"Filling {sum(len(cols) for cols in pending.values())} {PENDING} cells of {len(pending)} clusters.", flush=True)
+    with ThreadPoolExecutor(max_workers=CLUSTER_WORKERS) as executor:
+        schedules_future = None
+        if any("Scheduled Rebalance" in cols for cols in pending.values()):
+            schedules_future = castaiApi.submit_in_context(executor, get_all_rebalancing_schedules, api_key)
+        with runProfiler.stage("parse"):
+            offerings = get_cluster_ids(api_key, org_id)
+        schedule_map = schedules_future.result() if schedules_future else {}
+        node_stats_rows = []
+        inventory = {} if keep_inventory else None
+        futures = {
+            cluster_id: castaiApi.submit_in_context(executor, process_cluster, api_key, cluster_id, offerings, schedule_map, node_stats_rows,
+                                                    None, [col for col in cols if col in DETAIL_COLUMNS], approx_error, inventory)
+            for cluster_id, cols in pending.items()
+        }
+        filled = {cluster_id: future.result() for cluster_id, future in futures.items()}
+    if inventory:
+        with runProfiler.stage("write"):
+            nodeInventory.record_snapshots(org_dir, inventory)
+    with runProfiler.stage("aggregate"):
+        for i, row in df.iterrows():
+            info = filled.get(row["ClusterID"])
+            for col in pending.get(row["ClusterID"], []):
+                if info is not None and col in info:
+                    df.at[i, col] = "" if info[col] is None else str(info[col])
+    with runProfiler.stage("write"):
+        df.to_csv(csv_path, index=False)
+    remaining = int((df == PENDING).sum().sum())
+    print(f"Cluster details saved to {csv_path} ({remaining} cells still {PENDING})", flush=True)
+    if not node_stats_rows:
+        return remaining
+    stats_path = os.path.join(org_dir, "csv", output_name("nodes_utilization.csv"))
+    with runProfiler.stage("aggregate"):
+        stats = pd.DataFrame(node_stats_rows)
+        try:
+            existing = pd.read_csv(stats_path, dtype={"ClusterID": str})
+            existing = existing[~existing["ClusterID"].isin(stats["ClusterID"])]
+            stats = pd.concat([existing, stats], ignore_index=True)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            pass
+    with runProfiler.stage("write"):
+        stats.to_csv(stats_path, index=False)
+    print(f"Node utilization distribution saved to {stats_path}")
+    return remaining
+
+@runProfiler.staged("parse")
+def process_cluster(api_key, cluster_id, offerings, schedule_map, node_stats_rows, cluster_filter=None, columns=None,
+                    approx_error=None, inventory=None, state=None):
+    """
+    Returns the cluster's row, or None when the filter rules it out once its
+    details are known or cannot be fetched. state keeps the row, details and nodes of a cluster
+    between the column passes of a time-budgeted run. Columns the budget left
+    unfilled are set to PENDING.
+    """
+    state = {} if state is None else state
+    info = state.setdefault("info", {"ClusterID": cluster_id})
+    try:
+        with castaiApi.cluster_deadline(CLUSTER_DEADLINE_SECONDS):
+            if "details" not in state:
+                state["details"] = get_cluster_details(api_key, cluster_id)
+            details = state["details"]
+            if cluster_filter is not None and not details_match(cluster_filter, cluster_id, details):
+                return None
+            extract_cluster_info(cluster_id, details, offerings, api_key, schedule_map, node_stats_rows, info, columns,
+                                 approx_error, inventory, state.setdefault("nodes", {}))
+    except castaiApi.BudgetExhausted:
+        wanted = DETAIL_COLUMNS if columns is None else columns
+        if "details" in state:
+            free = [col for col in wanted if col in FREE_COLUMNS and col not in info]
+            if free:
+                extract_cluster_info(cluster_id, state["details"], offerings, api_key, schedule_map, None, info, free)
+        for col in wanted:
+            info.setdefault(col, PENDING)
+    except (castaiApi.DeadlineExceeded, requests.RequestException) as e:
+        # Without its details the filter cannot be evaluated, so the cluster
+        # is left out rather than reported unfiltered.
+        if cluster_filter is not None and cluster_filter.active and "details" not in state:
+            print(f"Skipping cluster {cluster_id}, its details are needed for the filters: {e}", flush=True)
+            return None
+        print(f"Incomplete details for cluster {cluster_id}: {e}", flush=True)
+    return info
 
 def process_org(selected_org, org_row):
     api_key = org_row["key"]
-    org_dir_local = os.path.join("outputs", selected_org.replace(" ", "_"))
-    global org_dir
-    org_dir = org_dir_local
+    org_dir = os.path.join("outputs", selected_org.replace(" ", "_"))
     os.makedirs(org_dir, exist_ok=True)
-    os.makedirs(os.path.join(org_dir, "json"), exist_ok=True)
-    fetch_cluster_info(api_key, org_row["org_id"])
+    castaiApi.set_org_context(org_dir, save_json)
+    castaiApi.configure_org_limits(api_key, org_row)
+    with runProfiler.org_profile(org_dir, "orgClusterDetails"):
+        if fill_pending:
+            pending = fill_pending_cells(api_key, org_row["org_id"], org_dir, cluster_filter, approx_error, keep_inventory)
+        else:
+            pending = fetch_cluster_info(api_key, org_row["org_id"], org_dir, cluster_filter, columns, approx_error, keep_inventory)
+        # The fleet rollup only reads full, complete reports, so filtered runs and
+        # runs that left PENDING cells leave it alone.
+        if cluster_filter.active or columns is not None or pending:
+            return
+        try:
+            with runProfiler.stage("aggregate"):
+                fleetRollup.update_fleet_rollup(os.path.basename(org_dir))
+        except Exception as e:
+            print(f"Error updating fleet rollup for {selected_org}: {e}", flush=True)
 
 def main():
-    global save_json
-    if len(sys.argv) < 2:
-        print("Usage: python orgClusterDetails.py <Organization | all> <on> (If you want to save resulting jsons)", flush=True)
+    global save_json, cluster_filter, columns, approx_error, keep_inventory, fill_pending
+    if "--hedge" in sys.argv:
+        castaiApi.enable_hedging()
+    if "--http2" in sys.argv:
+        castaiApi.enable_http2()
+    if "--no-cache" in sys.argv:
+        castaiApi.disable_http_cache()
+    if "--profile" in sys.argv:
+        runProfiler.enable()
+    keep_inventory = "--no-inventory" not in sys.argv
+    fill_pending = "--fill-pending" in sys.argv
+    try:
+        cluster_filter, argv = clusterFilters.parse_filter_args([arg for arg in sys.argv if arg not in ("--hedge", "--http2", "--no-cache", "--profile", "--no-inventory", "--fill-pending")])
+        time_budget = castaiApi.parse_time_budget(argv)
+        columns = None
+        if "--columns" in argv:
+            i = argv.index("--columns")
+            if i + 1 >= len(argv):
+                raise ValueError("--columns needs a value")
+            columns = parse_columns(argv[i + 1])
+            del argv[i:i + 2]
+        approx_error = None
+        if "--approximate" in argv:
+            argv.remove("--approximate")
+            approx_error = approxStats.DEFAULT_ERROR
+        if "--approx-error" in argv:
+            i = argv.index("--approx-error")
+            if i + 1 >= len(argv):
+                raise ValueError("--approx-error needs a value")
+            try:
+                approx_error = float(argv[i + 1])
+            except ValueError:
+                raise ValueError(f"--approx-error expects a number, got '{argv[i + 1]}'")
+            if not 0 < approx_error < 1:
+                raise ValueError("--approx-error must be between 0 and 1, e.g. 0.01")
+            del argv[i:i + 2]
+        if fill_pending and columns is not None:
+            raise ValueError("--fill-pending fills the cells of the full report and cannot be combined with --columns")
+    except ValueError as e:
+        print(e, flush=True)
         sys.exit(1)
-    elif len(sys.argv) == 2:
+    if len(argv) < 2:
+        print(f"Usage: python orgClusterDetails.py <Organization | all> <on> (If you want to save resulting jsons) [--hedge] [--http2] [--no-cache] [--profile] [--no-inventory] [--time-budget SECONDS] [--fill-pending] [--columns COL,...|inventory] [--approximate] [--approx-error E] {clusterFilters.FILTER_USAGE}", flush=True)
+        sys.exit(1)
+    elif len(argv) == 2:
         save_json="off"
-    elif len(sys.argv) == 3:
-        save_json = sys.argv[2].strip()
+    elif len(argv) == 3:
+        save_json = argv[2].strip()
 
-    arg = sys.argv[1].strip()        
+    arg = argv[1].strip()        
+    if cluster_filter.active:
+        print(f"Only clusters with {cluster_filter.describe()}", flush=True)
+    if time_budget is not None:
+        castaiApi.set_time_budget(time_budget)
+        print(f"Time budget: {time_budget:g} seconds", flush=True)
+    if approx_error is not None:
+        print(f"Approximate mode: clusters over {approxStats.sample_size(approx_error)} nodes are sampled (error {approx_error:g})", flush=True)
     try:
         orgs_df = pd.read_csv("orgs.csv")
     except Exception as e:
         print(f"Error loading orgs.csv: {e}", flush=True)
         sys.exit(1)
     if arg.lower() == "all":
-        for idx, org_row in orgs_df.iterrows():
-            selected_org = org_row["org"]
-            print(f"Processing organization: {selected_org}", flush=True)
-            process_org(selected_org, org_row)
+        # Orgs run side by side; each API key's scheduler keeps its own limits.
+        failed_orgs = []
+        with ThreadPoolExecutor(max_workers=ORG_WORKERS) as executor:
+            futures = {}
+            for idx, org_row in orgs_df.iterrows():
+                selected_org = org_row["org"]
+                print(f"Processing organization: {selected_org}", flush=True)
+                futures[castaiApi.submit_in_context(executor, process_org, selected_org, org_row)] = selected_org
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except (Exception, SystemExit) as e:
+                    print(f"Error processing organization {futures[future]}: {e!r}", flush=True)
+                    failed_orgs.append(futures[future])
+        castaiApi.report_coalesced()
+        if failed_orgs:
+            print(f"Failed organizations: {', '.join(failed_orgs)}", flush=True)
+            sys.exit(1)
     else:
         try:
             org_row = orgs_df[orgs_df["org"] == arg].iloc[0]
@@ -722,6 +1108,7 @@ def main():
             print(f"Organization '{arg}' not found: {e}", flush=True)
             sys.exit(1)
         process_org(arg, org_row)
+        castaiApi.report_coalesced()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import datetime
+import pandas as pd
+
+# table -> columns that identify a row within a month
+TABLES = {
+    "monthly_savings": ["clusterid"],
+    "resource_costs": ["cluster_id", "resource"],
+}
+MONTH_COLUMN = "month"
+MANIFEST_RUNS = 50
+
+# -------------------------
+# Paths and Manifest
+# -------------------------
+def partitions_dir(org_dir):
+    return os.path.join(org_dir, "partitions")
+
+def partition_path(org_dir, table, month):
+    return os.path.join(partitions_dir(org_dir), table, f"month={month}.csv")
+
+def manifest_path(org_dir):
+    return os.path.join(partitions_dir(org_dir), "manifest.json")
+
+def load_manifest(org_dir):
+    path = manifest_path(org_dir)
+    if not os.path.exists(path):
+        return {"tables": {}, "runs": []}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(org_dir, manifest):
+    path = manifest_path(org_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+# -------------------------
+# Upsert
+# -------------------------
+def read_partition(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+    except pd.errors.EmptyDataError:
+        return None
+
+def upsert_table(org_dir, table, rows):
+    """
+    Merge rows (a list of report row dicts) into the table's month partitions:
+    a row replaces the stored row with the same key, other stored rows stay.
+    Only the partitions of the rows' months are read, and only those whose
+    content changed are rewritten. Returns {month: merged rows} of those.
+    """
+    if not rows:
+        return {}
+    keys = TABLES[table]
+    new = pd.DataFrame(rows).astype(str)
+    changed = {}
+    for month, part in new.groupby(MONTH_COLUMN, sort=True):
+        path = partition_path(org_dir, table, month)
+        existing = read_partition(path)
+        merged = part if existing is None else pd.concat([existing, part], ignore_index=True)
+        merged = merged.drop_duplicates(subset=keys, keep="last").sort_values(keys).reset_index(drop=True)
+        if existing is not None:
+            existing = existing.sort_values(keys).reset_index(drop=True)
+            if list(existing.columns) == list(merged.columns) and existing.equals(merged):
+                continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        merged.to_csv(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        changed[month] = merged
+    return changed
+
+def write_incremental(org_dir, tables_rows):
+    """
+    Upsert every table of tables_rows ({table: rows}) and record the run in the
+    manifest: per partition its row count, clusters and last change, per run
+    the partitions it changed. Returns {table: [changed months]}.
+    """
+    manifest = load_manifest(org_dir)
+    run_id = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    changed = {}
+    for table, rows in tables_rows.items():
+        partitions = upsert_table(org_dir, table, rows)
+        changed[table] = sorted(partitions)
+        entries = manifest["tables"].setdefault(table, {})
+        for month, partition in partitions.items():
+            entries[month] = {"rows": len(partition), "clusters": sorted(partition[TABLES[table][0]].unique()),
+                              "run_id": run_id, "updated_at": time.time()}
+    manifest["runs"] = (manifest["runs"] + [{"run_id": run_id, "changed": changed}])[-MANIFEST_RUNS:]
+    save_manifest(org_dir, manifest)
+    for table, months in changed.items():
+        print(f"{table}: {len(months)} partitions changed{': ' + ', '.join(months) if months else ''}", flush=True)
+    return changed
+
+def stored_months(org_dir):
+    """
+    {cluster_id: {months}} that have rows in every table's partitions, from
+    the manifest. Only partitions whose manifest entry predates the cluster
+    lists are read.
+    """
+    manifest = load_manifest(org_dir)
+    stored = None
+    for table, keys in TABLES.items():
+        pairs = set()
+        for month, entry in manifest["tables"].get(table, {}).items():
+            clusters = entry.get("clusters")
+            if clusters is None:
+                partition = read_partition(partition_path(org_dir, table, month))
+                clusters = [] if partition is None else partition[keys[0]].unique()
+            pairs.update((cluster_id, month) for cluster_id in clusters)
+        stored = pairs if stored is None else stored & pairs
+    months = {}
+    for cluster_id, month in stored or ():
+        months.setdefault(cluster_id, set()).add(month)
+    return months
+
+def load_partitions(org_dir, table, months=None):
+    """Rows of the given months (every stored month when None) as one frame."""
+    table_dir = os.path.join(partitions_dir(org_dir), table)
+    if months is None:
+        if not os.path.isdir(table_dir):
+            return pd.DataFrame()
+        months = sorted(name[len("month="):-len(".csv")] for name in os.listdir(table_dir)
+                        if name.startswith("month=") and name.endswith(".csv"))
+    frames = [read_partition(partition_path(org_dir, table, month)) for month in months]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
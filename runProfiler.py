@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import functools
+import pstats
+import cProfile
+import threading
+import contextlib
+import contextvars
+import tracemalloc
+
+# Stages the report scripts mark; "other" is the rest of an org's run.
+STAGES = ["fetch", "parse", "aggregate", "write", "other"]
+TOP_SITES = 10
+# Allocation sites come from snapshot diffs, which are slow on a big heap, so
+# only the first few invocations of each stage are diffed.
+SNAPSHOTS_PER_STAGE = 5
+
+enabled = False
+# Org directory the current code runs for; follows thread pools started with
+# castaiApi.submit_in_context and the calls dispatched by the key schedulers.
+current_org = contextvars.ContextVar("profile_org", default=None)
+
+_local = threading.local()
+_lock = threading.Lock()
+_active = 0
+_stats = {}       # (org_dir, stage) -> timing and memory totals
+_profilers = {}   # (org_dir, stage) -> cProfile.Profile
+_owner = None     # id of the thread whose stages cProfile follows
+
+def enable():
+    """Turn profiling on for the whole run; call before any org starts."""
+    global enabled
+    enabled = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def to_argv():
+    """Flags that pass profiling on to the scripts started as a subprocess."""
+    return ["--profile"] if enabled else []
+
+def _new_stats():
+    return {"calls": 0, "seconds": 0.0, "peak_kib": 0.0, "net_kib": 0.0, "snapshots": 0, "sites": {}}
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+# -------------------------
+# Stages
+# -------------------------
+def _enable(profiler):
+    """Start profiler; False when another profiling tool holds the interpreter's hooks."""
+    if profiler is None:
+        return False
+    try:
+        profiler.enable()
+        return True
+    except ValueError:
+        return False
+
+@contextlib.contextmanager
+def stage(name, timed=True):
+    """
+    Attribute the enclosed work to a stage of the current org: cProfile stats,
+    wall time and tracemalloc growth. Nested stages are exclusive, the outer
+    stage is paused while an inner one runs. timed=False adds only the profile
+    and memory figures, for work another thread already times while waiting.
+
+    Since Python 3.12 only one cProfile profiler can be active in the process,
+    so one thread at a time owns it: the first to open an outermost stage while
+    no other thread does, until its last stage closes. Stages on the other
+    threads get their wall time and memory figures only.
+    """
+    org = current_org.get()
+    if not enabled or org is None:
+        yield
+        return
+    global _active
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    outer = stack[-1] if stack else None
+    global _owner
+    with _lock:
+        if not stack and _owner is None:
+            _owner = threading.get_ident()
+        profiled = _owner == threading.get_ident()
+        profiler = _profilers.get((org, name)) or cProfile.Profile() if profiled else None
+        stats = _stats.setdefault((org, name), _new_stats())
+        # The process peak is reset when nothing else is being measured, so
+        # overlapping stages share one peak instead of clobbering each other's.
+        if _active == 0:
+            tracemalloc.reset_peak()
+        _active += 1
+        diff_sites = stats["snapshots"] < SNAPSHOTS_PER_STAGE
+        if diff_sites:
+            stats["snapshots"] += 1
+    frame = {"profiler": None, "children": 0.0}
+    stack.append(frame)
+    try:
+        if outer and outer["profiler"]:
+            outer["profiler"].disable()
+        # Snapshot time is left out of this stage and charged to no stage at all.
+        overhead_started = time.perf_counter()
+        before = _snapshot() if diff_sites else None
+        entry_memory = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        if _enable(profiler):
+            frame["profiler"] = profiler
+            with _lock:
+                _profilers.setdefault((org, name), profiler)
+        try:
+            yield
+        finally:
+            if frame["profiler"]:
+                frame["profiler"].disable()
+            elapsed = time.perf_counter() - started
+            current, peak = tracemalloc.get_traced_memory()
+            sites = []
+            if before is not None:
+                sites = [s for s in _snapshot().compare_to(before, "lineno")[:TOP_SITES] if s.size_diff > 0]
+            overhead_elapsed = time.perf_counter() - overhead_started
+            with _lock:
+                if timed:
+                    stats["calls"] += 1
+                    stats["seconds"] += elapsed - frame["children"]
+                stats["peak_kib"] = max(stats["peak_kib"], (peak - entry_memory) / 1024)
+                stats["net_kib"] += (current - entry_memory) / 1024
+                for site in sites:
+                    where = f"{site.traceback[0].filename}:{site.traceback[0].lineno}"
+                    total = stats["sites"].setdefault(where, [0, 0])
+                    total[0] += site.size_diff
+                    total[1] += site.count_diff
+            if outer:
+                outer["children"] += overhead_elapsed
+    finally:
+        stack.pop()
+        with _lock:
+            _active -= 1
+            if not stack and _owner == threading.get_ident():
+                _owner = None
+        if outer and not _enable(outer["profiler"]):
+            outer["profiler"] = None
+
+def staged(name):
+    """Decorator running the whole function in stage name."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# -------------------------
+# Org Profiles
+# -------------------------
+@contextlib.contextmanager
+def org_profile(org_dir, script):
+    """Profile one org's run of a script and write the results when it ends."""
+    if not enabled:
+        yield
+        return
+    token = current_org.set(org_dir)
+    try:
+        with stage("other"):
+            yield
+    finally:
+        current_org.reset(token)
+        write_org_profile(org_dir, script)
+
+def write_org_profile(org_dir, script):
+    """
+    Write <org_dir>/profile/<script>/: one pstats file per stage plus all.prof
+    (open them with snakeviz, tuna or flameprof) and stages.json with the time
+    and memory figures and top allocation sites of each stage.
+    """
+    with _lock:
+        keys = [key for key in _profilers if key[0] == org_dir]
+        profilers = {key: _profilers.pop(key) for key in keys}
+        stats = {key[1]: _stats.pop(key) for key in list(_stats) if key[0] == org_dir}
+    profile_dir = os.path.join(org_dir, "profile", script)
+    os.makedirs(profile_dir, exist_ok=True)
+    combined = None
+    summary = {}
+    for name in [s for s in STAGES if s in stats] + sorted(s for s in stats if s not in STAGES):
+        stage_profilers = [p for key, p in profilers.items() if key[1] == name]
+        stage_stats = pstats.Stats(*stage_profilers)
+        stage_stats.dump_stats(os.path.join(profile_dir, f"{name}.prof"))
+        if combined is None:
+            combined = pstats.Stats(*stage_profilers)
+        else:
+            combined.add(*stage_profilers)
+        totals = stats[name]
+        top = sorted(totals["sites"].items(), key=lambda item: item[1][0], reverse=True)[:TOP_SITES]
+        summary[name] = {
+            "calls": totals["calls"],
+            "seconds": round(totals["seconds"], 3),
+            "peak_kib": round(totals["peak_kib"], 1),
+            "net_kib": round(totals["net_kib"], 1),
+            "top_allocations": [{"site": site, "kib": round(size / 1024, 1), "blocks": count} for site, (size, count) in top],
+        }
+    if combined is not None:
+        combined.dump_stats(os.path.join(profile_dir, "all.prof"))
+    with open(os.path.join(profile_dir, "stages.json"), "w") as f:
+        json.dump({"org_dir": org_dir, "script": script, "stages": summary}, f, indent=4)
+    print(f"Profile saved to {profile_dir}", flush=True)
+    for name, s in summary.items():
+        print(f"  {name:10} {s['calls']:>7} calls {s['seconds']:>9.3f} s  peak {s['peak_kib']:>10.1f} KiB", flush=True)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+import os
+import sys
+import calendar
+import numpy as np
+import pandas as pd
+import reportPartitions
+
+OUTPUTS_DIR = "outputs"
+RESOURCES = ["CPU", "RAM", "Storage"]
+# resource -> average daily requested column of monthly_savings_report.csv
+REQUESTED_COLUMNS = {"CPU": "avg_cpu_requested", "RAM": "avg_ram_requested", "Storage": "avg_storage_requested"}
+DEFAULT_SCENARIOS = ["connected", "first:3", "trailing:1", "trailing:3", "trailing:12"]
+SCENARIO_USAGE = ("connected | first:N | trailing:N | month:YYYY-MM | list:CPU/RAM/STORAGE "
+                  "(hourly prices per CPU, GiB RAM and GiB storage)")
+
+# -------------------------
+# Metric Arrays
+# -------------------------
+def load_reports(org_dir):
+    """(savings rows, resource cost rows) of an org, from its CSVs or, after --incremental runs, its partitions."""
+    csv_dir = os.path.join(org_dir, "csv")
+    savings_csv = os.path.join(csv_dir, "monthly_savings_report.csv")
+    costs_csv = os.path.join(csv_dir, "resource_costs_report.csv")
+    if os.path.exists(savings_csv) and os.path.exists(costs_csv):
+        return pd.read_csv(savings_csv, dtype={"clusterid": str}), pd.read_csv(costs_csv, dtype={"cluster_id": str})
+    savings = reportPartitions.load_partitions(org_dir, "monthly_savings")
+    costs = reportPartitions.load_partitions(org_dir, "resource_costs")
+    return savings, costs
+
+def metric_arrays(savings, costs):
+    """
+    Lay the reported months out as arrays over (cluster, month, resource):
+    average daily requests and monthly cost per unit (CPU, GiB), NaN where a
+    cluster has no row.
+    Also the days of each month and the month index each cluster connected in
+    (-1 when that month was not reported).
+    """
+    cluster_ids = sorted(savings["clusterid"].astype(str).unique())
+    months = sorted(set(savings["month"].astype(str)) | set(costs["month"].astype(str)))
+    cluster_index = {cid: i for i, cid in enumerate(cluster_ids)}
+    month_index = {month: i for i, month in enumerate(months)}
+    days = np.array([calendar.monthrange(int(m[:4]), int(m[5:7]))[1] for m in months], dtype=np.float64)
+
+    requests = np.full((len(cluster_ids), len(months), len(RESOURCES)), np.nan)
+    c = savings["clusterid"].astype(str).map(cluster_index).to_numpy()
+    m = savings["month"].astype(str).map(month_index).to_numpy()
+    for r, resource in enumerate(RESOURCES):
+        requests[c, m, r] = pd.to_numeric(savings[REQUESTED_COLUMNS[resource]], errors="coerce").to_numpy()
+
+    prices = np.full_like(requests, np.nan)
+    costs = costs[costs["cluster_id"].astype(str).isin(cluster_index) & costs["resource"].isin(RESOURCES)]
+    c = costs["cluster_id"].astype(str).map(cluster_index).to_numpy()
+    m = costs["month"].astype(str).map(month_index).to_numpy()
+    r = costs["resource"].map({resource: i for i, resource in enumerate(RESOURCES)}).to_numpy()
+    prices[c, m, r] = pd.to_numeric(costs["avg_monthly_cost"], errors="coerce").to_numpy()
+
+    clusters = savings.drop_duplicates("clusterid")
+    clusters = clusters.set_index(clusters["clusterid"].astype(str)).reindex(cluster_ids)
+    connected_month = clusters["connected_date"].astype(str).str[:7].map(month_index).fillna(-1).astype(int).to_numpy()
+    names = clusters["clustername"].astype(str).tolist()
+    return {"cluster_ids": cluster_ids, "cluster_names": names, "months": months, "days": days,
+            "requests": requests, "prices": prices, "connected_month": connected_month}
+
+# -------------------------
+# Baselines
+# -------------------------
+def parse_scenario(spec):
+    """(kind, argument) of a scenario spec; raises ValueError with the accepted forms."""
+    kind, _, value = spec.strip().partition(":")
+    try:
+        if kind == "connected" and not value:
+            return kind, None
+        if kind in ("first", "trailing") and int(value) > 0:
+            return kind, int(value)
+        if kind == "month" and len(value) == 7 and 1 <= int(value[5:7]) <= 12:
+            return kind, value
+        if kind == "list":
+            prices = [float(p) for p in value.split("/")]
+            if len(prices) == len(RESOURCES):
+                return kind, np.array(prices)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid scenario '{spec}', use {SCENARIO_USAGE}")
+
+def masked_mean(prices, mask):
+    """Mean over the month axis of the prices where mask[cluster, month] is set, ignoring gaps."""
+    valid = ~np.isnan(prices) & mask[:, :, None]
+    counts = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(valid, prices, 0).sum(axis=1) / counts
+    return means[:, None, :]
+
+def trailing_mean(prices, window):
+    """Mean of the window months before each month, ignoring gaps; NaN with none of them reported."""
+    valid = ~np.isnan(prices)
+    pad = np.zeros((prices.shape[0], 1, prices.shape[2]))
+    sums = np.concatenate([pad, np.cumsum(np.where(valid, prices, 0), axis=1)], axis=1)
+    counts = np.concatenate([pad, np.cumsum(valid, axis=1)], axis=1)
+    end = np.arange(prices.shape[1])
+    start = np.maximum(end - window, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums[:, end] - sums[:, start]) / (counts[:, end] - counts[:, start])
+
+def baseline_prices(kind, value, arrays):
+    """
+    Monthly baseline cost per unit of a scenario, broadcastable to (cluster,
+    month, resource). Like the report's pre-onboard baseline it is the cost of
+    a whole month, so a baseline month longer than the reported one counts as
+    savings; list prices are hourly and priced over the reported month.
+    """
+    prices = arrays["prices"]
+    month_axis = np.arange(prices.shape[1])
+    connected = arrays["connected_month"]
+    if kind == "connected":
+        baseline = prices[np.arange(prices.shape[0]), np.maximum(connected, 0)]
+        baseline[connected < 0] = np.nan
+        return baseline[:, None, :]
+    if kind == "first":
+        mask = (month_axis >= connected[:, None]) & (month_axis < connected[:, None] + value) & (connected[:, None] >= 0)
+        return masked_mean(prices, mask)
+    if kind == "trailing":
+        return trailing_mean(prices, value)
+    if kind == "month":
+        if value not in arrays["months"]:
+            return np.full((1, 1, len(RESOURCES)), np.nan)
+        return prices[:, arrays["months"].index(value)][:, None, :]
+    return value[None, None, :] * 24 * arrays["days"][None, :, None]
+
+# -------------------------
+# Scenario Table
+# -------------------------
+def evaluate_scenarios(arrays, specs):
+    """
+    Savings of every scenario at once, as an array over (scenario, cluster,
+    month, resource): average daily requests times the baseline minus the
+    actual monthly cost per unit, the report's formula. NaN where either is
+    missing.
+    """
+    parsed = [parse_scenario(spec) for spec in specs]
+    shape = arrays["prices"].shape
+    baselines = np.stack([np.broadcast_to(baseline_prices(kind, value, arrays), shape) for kind, value in parsed])
+    return arrays["requests"][None] * (baselines - arrays["prices"][None])
+
+def scenario_frame(savings, costs, specs=DEFAULT_SCENARIOS):
+    """
+    One row per cluster plus an "ALL" row with the org total: the savings the
+    report computed and, per scenario, the savings over the same months
+    against that scenario's baseline (empty when it has no baseline at all).
+    """
+    arrays = metric_arrays(savings, costs)
+    result = evaluate_scenarios(arrays, specs)
+    covered = ~np.isnan(result).all(axis=3)
+    totals = np.where(covered, np.nansum(result, axis=3), 0).sum(axis=2)
+    totals[~covered.any(axis=2)] = np.nan
+    reported = savings.assign(clusterid=savings["clusterid"].astype(str))
+    reported = pd.to_numeric(reported["total_savings_per_month"], errors="coerce").groupby(reported["clusterid"]).sum()
+    df = pd.DataFrame({
+        "clusterid": arrays["cluster_ids"],
+        "clustername": arrays["cluster_names"],
+        "months": (~np.isnan(arrays["requests"]).all(axis=2)).sum(axis=1),
+        "report": reported.reindex(arrays["cluster_ids"]).to_numpy(),
+    })
+    for i, spec in enumerate(specs):
+        df[spec] = totals[i]
+    total = {"clusterid": "ALL", "clustername": "", "months": int(df["months"].sum())}
+    total.update({column: df[column].sum(min_count=1) for column in ["report"] + list(specs)})
+    df = pd.concat([df, pd.DataFrame([total])], ignore_index=True)
+    return df.round(2)
+
+def list_org_dirs():
+    if not os.path.isdir(OUTPUTS_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(OUTPUTS_DIR)
+        if not name.startswith("_") and (os.path.exists(os.path.join(OUTPUTS_DIR, name, "csv", "monthly_savings_report.csv"))
+                                         or os.path.isdir(os.path.join(reportPartitions.partitions_dir(os.path.join(OUTPUTS_DIR, name)), "monthly_savings")))
+    )
+
+def main():
+    """Compare the savings against several baselines from the stored reports, without calling the API."""
+    args = sys.argv[1:]
+    specs = []
+    try:
+        while "--scenario" in args:
+            i = args.index("--scenario")
+            parse_scenario(args[i + 1])
+            specs.append(args[i + 1].strip())
+            del args[i:i + 2]
+    except IndexError:
+        print(f"Usage: python savingsScenarios.py [org|all] [--scenario SPEC ...], SPEC: {SCENARIO_USAGE}", flush=True)
+        sys.exit(1)
+    except ValueError as e:
+        print(e, flush=True)
+        sys.exit(1)
+    specs = list(dict.fromkeys(specs)) or DEFAULT_SCENARIOS
+    selected_arg = args[0].strip() if args else "all"
+    org_names = list_org_dirs() if selected_arg.lower() == "all" else [selected_arg.replace(" ", "_")]
+    if not org_names:
+        print(f"No savings reports found under {OUTPUTS_DIR}. Run monthlySavingsReport.py first.", flush=True)
+        sys.exit(1)
+    for org_name in org_names:
+        org_dir = os.path.join(OUTPUTS_DIR, org_name)
+        savings, costs = load_reports(org_dir)
+        if savings.empty or costs.empty:
+            print(f"No savings rows for {org_name}.", flush=True)
+            continue
+        df = scenario_frame(savings, costs, specs)
+        csv_path = os.path.join(org_dir, "csv", "savings_scenarios.csv")
+        df.to_csv(csv_path, index=False)
+        print(f"Savings scenarios ({len(specs)}) for {len(df) - 1} clusters saved to {csv_path}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+import os
+import sys
+import numpy as np
+import pandas as pd
+import nodeInventory
+
+OUTPUTS_DIR = "outputs"
+# Spot ratios (percent of CPU and memory capacity on spot nodes) simulated by default.
+DEFAULT_RATIOS = [0, 30, 50, 70, 100]
+# Spot price as a discount on the on-demand price of the same capacity.
+DEFAULT_SPOT_DISCOUNT = 0.6
+# Resources whose price depends on the node lifecycle; storage does not.
+RESOURCES = ["CPU", "RAM"]
+
+# -------------------------
+# Inputs
+# -------------------------
+def capacity_arrays(states, cluster_ids):
+    """
+    Per cluster, from the nodes of its latest inventory snapshot: CPU and
+    memory capacity (cores, GiB) as a [cluster, resource] array and the share
+    of each on spot nodes. One bincount over all the clusters' nodes.
+    """
+    present = [cid for cid in cluster_ids if cid in states]
+    index = {cid: i for i, cid in enumerate(cluster_ids)}
+    nodes = [states[cid][1] for cid in present]
+    owner = np.concatenate([np.full(len(n), index[cid]) for cid, n in zip(present, nodes)]) if nodes else np.zeros(0, dtype=np.int64)
+    records = np.concatenate(nodes) if nodes else np.zeros(0, dtype=nodeInventory.NODE_RECORD)
+    capacity = np.stack([records["cpu_capacity_milli"] / 1000, records["mem_capacity_mib"] / 1024], axis=1)
+    spot = records["spot"].astype(bool)
+    total = np.stack([np.bincount(owner, capacity[:, r], minlength=len(cluster_ids)) for r in range(len(RESOURCES))], axis=1)
+    on_spot = np.stack([np.bincount(owner[spot], capacity[spot, r], minlength=len(cluster_ids)) for r in range(len(RESOURCES))], axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        spot_share = on_spot / total
+    missing = np.array([cid not in states for cid in cluster_ids])
+    total[missing] = np.nan
+    return total, spot_share
+
+def latest_prices(costs, cluster_ids):
+    """
+    Monthly cost per CPU and GiB RAM of each cluster's latest reported month
+    (hourly price x 24 x the month's days, as in the other reports), as a
+    [cluster, resource] array (NaN without one), and that month.
+    """
+    costs = costs[costs["resource"].isin(RESOURCES)].copy()
+    costs["cluster_id"] = costs["cluster_id"].astype(str)
+    costs["monthly"] = pd.to_numeric(costs["avg_monthly_cost"], errors="coerce")
+    costs = costs.dropna(subset=["monthly"])
+    latest = costs.groupby("cluster_id")["month"].transform("max")
+    costs = costs[costs["month"] == latest]
+    table = costs.pivot_table(index="cluster_id", columns="resource", values="monthly").reindex(index=cluster_ids, columns=RESOURCES)
+    months = costs.groupby("cluster_id")["month"].first().reindex(cluster_ids)
+    names = costs.groupby("cluster_id")["cluster_name"].first().reindex(cluster_ids)
+    return table.to_numpy(dtype=np.float64), months, names
+
+# -------------------------
+# Simulation
+# -------------------------
+def simulate(capacity, spot_share, prices, ratios, spot_discount=DEFAULT_SPOT_DISCOUNT):
+    """
+    Monthly cost of every cluster at every spot ratio, as a [cluster, ratio]
+    array. The reported price is a blend of on-demand and spot capacity at
+    the current spot share, so the on-demand price is recovered as
+    price / (1 - share * discount) and each ratio costs
+    capacity * on-demand price * (1 - ratio * discount).
+    """
+    on_demand = prices / (1 - np.nan_to_num(spot_share) * spot_discount)
+    full_price = (capacity * on_demand).sum(axis=1)
+    return full_price[:, None] * (1 - np.asarray(ratios)[None, :] / 100 * spot_discount)
+
+def sensitivity_frame(states, costs, ratios=DEFAULT_RATIOS, spot_discount=DEFAULT_SPOT_DISCOUNT):
+    """
+    One row per cluster with both a node snapshot and a reported month, plus
+    an "ALL" row: capacity, current spot share and monthly cost, then the
+    cost and the saving against today at each ratio.
+    """
+    cluster_ids = sorted(set(states) & set(costs["cluster_id"].astype(str)))
+    capacity, spot_share = capacity_arrays(states, cluster_ids)
+    prices, months, names = latest_prices(costs, cluster_ids)
+    simulated = simulate(capacity, spot_share, prices, ratios, spot_discount)
+    current = (capacity * prices).sum(axis=1)
+    df = pd.DataFrame({
+        "cluster_id": cluster_ids,
+        "cluster_name": names.to_numpy(),
+        "price_month": months.to_numpy(),
+        "cpu_capacity": capacity[:, 0],
+        "mem_capacity_gib": capacity[:, 1],
+        "spot_cpu_pct": spot_share[:, 0] * 100,
+        "spot_mem_pct": spot_share[:, 1] * 100,
+        "monthly_cost": current,
+    })
+    for i, ratio in enumerate(ratios):
+        df[f"cost_spot_{ratio}"] = simulated[:, i]
+        df[f"saving_spot_{ratio}"] = current - simulated[:, i]
+    df = df[~np.isnan(current)]
+    total = df.drop(columns=["cluster_id", "cluster_name", "price_month", "spot_cpu_pct", "spot_mem_pct"]).sum()
+    weights = df[["cpu_capacity", "mem_capacity_gib"]].to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total["spot_cpu_pct"] = (df["spot_cpu_pct"] * weights[:, 0]).sum() / weights[:, 0].sum()
+        total["spot_mem_pct"] = (df["spot_mem_pct"] * weights[:, 1]).sum() / weights[:, 1].sum()
+    total["cluster_id"] = "ALL"
+    df = pd.concat([df, pd.DataFrame([total])], ignore_index=True)
+    return df.round(2)
+
+def list_org_dirs():
+    if not os.path.isdir(OUTPUTS_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(OUTPUTS_DIR)
+        if not name.startswith("_") and os.path.exists(os.path.join(OUTPUTS_DIR, name, "inventory", "snapshots.bin"))
+        and os.path.exists(os.path.join(OUTPUTS_DIR, name, "csv", "resource_costs_report.csv"))
+    )
+
+def main():
+    """Simulate the monthly cost at several spot ratios from the stored node snapshots and costs, without calling the API."""
+    args = sys.argv[1:]
+    ratios = DEFAULT_RATIOS
+    spot_discount = DEFAULT_SPOT_DISCOUNT
+    try:
+        if "--ratios" in args:
+            i = args.index("--ratios")
+            ratios = sorted({int(r) for r in args[i + 1].split(",")})
+            del args[i:i + 2]
+            if any(r < 0 or r > 100 for r in ratios):
+                raise ValueError
+        if "--spot-discount" in args:
+            i = args.index("--spot-discount")
+            spot_discount = float(args[i + 1])
+            del args[i:i + 2]
+            if not 0 <= spot_discount < 1:
+                raise ValueError
+    except (IndexError, ValueError):
+        print("Usage: python spotMixSimulation.py [org|all] [--ratios 0,30,50,70,100] [--spot-discount 0.6]", flush=True)
+        sys.exit(1)
+    selected_arg = args[0].strip() if args else "all"
+    org_names = list_org_dirs() if selected_arg.lower() == "all" else [selected_arg.replace(" ", "_")]
+    if not org_names:
+        print(f"No node inventory and resource costs found under {OUTPUTS_DIR}. Run orgClusterDetails.py and monthlySavingsReport.py first.", flush=True)
+        sys.exit(1)
+    for org_name in org_names:
+        org_dir = os.path.join(OUTPUTS_DIR, org_name)
+        costs_csv = os.path.join(org_dir, "csv", "resource_costs_report.csv")
+        states = nodeInventory.latest_states(org_dir)
+        if not states or not os.path.exists(costs_csv):
+            print(f"{org_name} needs a node inventory snapshot and {costs_csv}.", flush=True)
+            continue
+        df = sensitivity_frame(states, pd.read_csv(costs_csv, dtype={"cluster_id": str}), ratios, spot_discount)
+        csv_path = os.path.join(org_dir, "csv", "spot_mix_sensitivity.csv")
+        df.to_csv(csv_path, index=False)
+        print(f"Spot mix sensitivity ({len(ratios)} ratios) for {len(df) - 1} clusters saved to {csv_path}", flush=True)
+
+if __name__ == "__main__":
+    main()
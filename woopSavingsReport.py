@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+import os
+import sys
+import subprocess
+import itertools
+import requests
+import numpy as np
+import pandas as pd
+import datetime
+import castaiApi
+import clusterFilters
+import runProfiler
+from orgClusterDetails import get_woop_enabled_percent
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+WINDOW_DAYS = 30
+WINDOW_COUNT = 3
+MAX_WORKERS = 8
+ORG_WORKERS = 4
+COST_FIELDS = ["costOnDemand", "costSpot", "costSpotFallback"]
+WORKLOAD_KEYS = ["namespace", "workloadType", "workloadName"]
+
+# -------------------------
+# Helper Functions for Time Windows
+# -------------------------
+def get_windows(window_days, window_count):
+    """
+    Returns consecutive windows ending today, newest first, as
+    (label, start_time, end_time). The newest window is the "after" period and
+    every older one is a "before" period it is compared against.
+    """
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    windows = []
+    for i in range(window_count):
+        end = today - datetime.timedelta(days=i * window_days)
+        start = end - datetime.timedelta(days=window_days)
+        label = f"{start.date().isoformat()}_{end.date().isoformat()}"
+        windows.append((
+            label,
+            start.strftime("%Y-%m-%dT%H:%M:%S.000000000Z"),
+            end.strftime("%Y-%m-%dT%H:%M:%S.000000000Z"),
+        ))
+    return windows
+
+# -------------------------
+# Workload Costs Endpoint
+# -------------------------
+def get_workload_costs(api_key, cluster_id, window):
+    label, start_time, end_time = window
+    url = (f"https://api.cast.ai/v1/cost-reports/clusters/{cluster_id}/workload-costs"
+           f"?startTime={start_time}&endTime={end_time}&filter.labelsOperator=OR")
+    data = castaiApi.get_json(api_key, url, f"workload costs for {cluster_id} ({label})",
+                              save_as=f"workload_costs_{cluster_id}_{label}.json", priority=castaiApi.PRIORITY_HISTORY)
+    return workload_costs_frame(data.get("items", []), cluster_id, label)
+
+@runProfiler.staged("parse")
+def workload_costs_frame(items, cluster_id, label):
+    """
+    Flattens the workload cost items into a compact columnar frame: one row per
+    workload with categorical keys and a float32 total cost for the window.
+    """
+    empty = pd.DataFrame(columns=["cluster_id", "window"] + WORKLOAD_KEYS + ["cost"])
+    if not items:
+        return empty
+    records = pd.DataFrame.from_records(items, columns=WORKLOAD_KEYS + ["costMetrics"])
+    counts = records["costMetrics"].str.len().fillna(0).astype(np.int64).to_numpy()
+    records = records[counts > 0]
+    counts = counts[counts > 0]
+    if not len(records):
+        return empty
+    # One row per cost metric, each carrying its workload's keys.
+    metrics = pd.DataFrame.from_records(list(itertools.chain.from_iterable(records["costMetrics"])), columns=COST_FIELDS + ["totalCost"])
+    cost_cols = [col for col in COST_FIELDS if metrics[col].notna().any()] or ["totalCost"]
+    frame = records[WORKLOAD_KEYS].fillna("").loc[records.index.repeat(counts)].reset_index(drop=True)
+    frame["cost"] = metrics[cost_cols].apply(pd.to_numeric, errors="coerce").fillna(0).sum(axis=1).to_numpy()
+    frame = frame.groupby(WORKLOAD_KEYS, sort=False, dropna=False)["cost"].sum().reset_index()
+    frame.insert(0, "window", label)
+    frame.insert(0, "cluster_id", cluster_id)
+    return frame
+
+# -------------------------
+# Main Report Generation Function
+# -------------------------
+def generate_woop_savings_report(api_key, input_csv, workloads_output_csv, summary_output_csv, cluster_filter=None):
+    df = pd.read_csv(input_csv)
+    if cluster_filter is not None:
+        df = cluster_filter.filter_frame(df)
+    if df.empty:
+        print("No clusters to report on.", flush=True)
+        return
+    cluster_names = dict(zip(df["ClusterID"], df["Cluster Name"]))
+    windows = get_windows(WINDOW_DAYS, WINDOW_COUNT)
+    after_label = windows[0][0]
+    before_labels = [w[0] for w in windows[1:]]
+
+    # Every (cluster, window) fetch is independent, so they all share one pool.
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        cost_futures = {(cluster_id, window[0]): castaiApi.submit_in_context(executor, get_workload_costs, api_key, cluster_id, window)
+                        for cluster_id in cluster_names for window in windows}
+        woop_futures = {cluster_id: castaiApi.submit_in_context(executor, get_woop_enabled_percent, api_key, cluster_id)
+                        for cluster_id in cluster_names}
+        # A window that times out is left empty (NaN) instead of failing the org.
+        frames = []
+        failed_windows = []
+        for (cluster_id, label), future in cost_futures.items():
+            try:
+                frames.append(future.result())
+            except (castaiApi.DeadlineExceeded, requests.RequestException) as e:
+                print(f"Error fetching workload costs for {cluster_id} ({label}): {e}", flush=True)
+                failed_windows.append((cluster_id, label))
+        woop_pct = {}
+        for cluster_id, future in woop_futures.items():
+            try:
+                woop_pct[cluster_id] = future.result()
+            except (castaiApi.DeadlineExceeded, requests.RequestException) as e:
+                print(f"Error fetching workloads summary for {cluster_id}: {e}", flush=True)
+    if not frames:
+        print("No workload costs fetched.", flush=True)
+        return
+
+    with runProfiler.stage("aggregate"):
+        costs = pd.concat(frames, ignore_index=True)
+        for col in ["cluster_id", "window"] + WORKLOAD_KEYS:
+            costs[col] = costs[col].fillna("").astype("category")
+        costs["cost"] = (costs["cost"].astype("float64") / WINDOW_DAYS).astype("float32")
+        print(f"Collected {len(costs)} workload cost rows for {len(cluster_names)} clusters.", flush=True)
+
+        # Daily cost per workload with one column per window.
+        wide = costs.pivot_table(index=["cluster_id"] + WORKLOAD_KEYS, columns="window", values="cost",
+                                 aggfunc="sum", fill_value=0.0, observed=True)
+        wide = wide.reindex(columns=[w[0] for w in windows], fill_value=0.0)
+        for cluster_id, label in failed_windows:
+            wide.loc[wide.index.get_level_values("cluster_id") == cluster_id, label] = np.nan
+        for label in before_labels:
+            wide[f"delta_vs_{label}"] = wide[after_label] - wide[label]
+            wide[f"pct_vs_{label}"] = (wide[f"delta_vs_{label}"] / wide[label].where(wide[label] != 0) * 100).round(2)
+        wide = wide.reset_index()
+        wide.insert(1, "cluster_name", wide["cluster_id"].astype(str).map(cluster_names))
+    with runProfiler.stage("write"):
+        wide.to_csv(workloads_output_csv, index=False, float_format="%.4f")
+    print(f"WOOP workload savings saved to {workloads_output_csv}")
+
+    with runProfiler.stage("aggregate"):
+        summary = costs.groupby(["cluster_id", "window"], observed=True)["cost"].sum().unstack("window")
+        summary = summary.reindex(columns=[w[0] for w in windows]).fillna(0.0)
+        for cluster_id, label in failed_windows:
+            if cluster_id in summary.index:
+                summary.loc[cluster_id, label] = np.nan
+        for label in before_labels:
+            # Positive values are daily savings of the newest window against that older window.
+            summary[f"daily_savings_vs_{label}"] = summary[label] - summary[after_label]
+        summary = summary.reset_index()
+        summary.insert(1, "cluster_name", summary["cluster_id"].astype(str).map(cluster_names))
+        summary.insert(2, "woop_enabled_pct", summary["cluster_id"].astype(str).map(woop_pct))
+    with runProfiler.stage("write"):
+        summary.to_csv(summary_output_csv, index=False, float_format="%.4f")
+    print(f"WOOP savings summary saved to {summary_output_csv}")
+
+def process_org(selected_org, org_row):
+    api_key = org_row["key"]
+    org_dir = os.path.join("outputs", selected_org.replace(" ", "_"))
+    csv_dir = os.path.join(org_dir, "csv")
+    details_csv = os.path.join(csv_dir, "cluster_details.csv")
+    if not os.path.exists(details_csv):
+        print(f"cluster_details.csv not found for {selected_org}. Running orgClusterDetails.py...", flush=True)
+        try:
+            if save_json == "on":
+                subprocess.run(["python", "orgClusterDetails.py", selected_org, "on"] + cluster_filter.to_argv() + runProfiler.to_argv(), check=True)
+            else:
+                subprocess.run(["python", "orgClusterDetails.py", selected_org] + cluster_filter.to_argv() + runProfiler.to_argv(), check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Error running orgClusterDetails.py for {selected_org}: {e}", flush=True)
+            sys.exit(1)
+        # A filtered orgClusterDetails run writes its own, already filtered, file.
+        details_csv = os.path.join(csv_dir, cluster_filter.output_name("cluster_details.csv"))
+        if not os.path.exists(details_csv):
+            print("Failed to generate cluster_details.csv.", flush=True)
+            sys.exit(1)
+    else:
+        print(f"Found cluster_details.csv for {selected_org}.", flush=True)
+    castaiApi.set_org_context(org_dir, save_json)
+    castaiApi.configure_org_limits(api_key, org_row)
+    workloads_output_csv = os.path.join(csv_dir, cluster_filter.output_name("woop_workload_savings.csv"))
+    summary_output_csv = os.path.join(csv_dir, cluster_filter.output_name("woop_savings_summary.csv"))
+    with runProfiler.org_profile(org_dir, "woopSavingsReport"):
+        generate_woop_savings_report(api_key, details_csv, workloads_output_csv, summary_output_csv, cluster_filter)
+
+def main():
+    global save_json, cluster_filter
+    if "--hedge" in sys.argv:
+        castaiApi.enable_hedging()
+    if "--http2" in sys.argv:
+        castaiApi.enable_http2()
+    if "--profile" in sys.argv:
+        runProfiler.enable()
+    try:
+        cluster_filter, argv = clusterFilters.parse_filter_args([arg for arg in sys.argv if arg not in ("--hedge", "--http2", "--profile")])
+    except ValueError as e:
+        print(e, flush=True)
+        sys.exit(1)
+    if len(argv) < 2:
+        print(f"Usage: python woopSavingsReport.py <Organization | all> <on> (If you want to save resulting jsons) [--hedge] [--http2] [--profile] {clusterFilters.FILTER_USAGE}", flush=True)
+        sys.exit(1)
+    elif len(argv) == 2:
+        save_json="off"
+    elif len(argv) == 3:
+        save_json = argv[2].strip()
+
+    selected_arg = argv[1].strip()
+    if cluster_filter.active:
+        print(f"Only clusters with {cluster_filter.describe()}", flush=True)
+    try:
+        orgs_df = pd.read_csv("orgs.csv")
+    except Exception as e:
+        print(f"Error loading orgs.csv: {e}", flush=True)
+        sys.exit(1)
+    if selected_arg.lower() == "all":
+        # Orgs run side by side; one failing must not abort the rest of the run.
+        failed_orgs = []
+        with ThreadPoolExecutor(max_workers=ORG_WORKERS) as executor:
+            futures = {}
+            for idx, org_row in orgs_df.iterrows():
+                selected_org = org_row["org"]
+                print(f"Processing organization: {selected_org}", flush=True)
+                futures[castaiApi.submit_in_context(executor, process_org, selected_org, org_row)] = selected_org
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except (Exception, SystemExit) as e:
+                    print(f"Error processing organization {futures[future]}: {e!r}", flush=True)
+                    failed_orgs.append(futures[future])
+        castaiApi.report_coalesced()
+        if failed_orgs:
+            print(f"Failed organizations: {', '.join(failed_orgs)}", flush=True)
+            sys.exit(1)
+    else:
+        try:
+            org_row = orgs_df[orgs_df["org"] == selected_arg].iloc[0]
+        except Exception as e:
+            print(f"Organization '{selected_arg}' not found: {e}", flush=True)
+            sys.exit(1)
+        process_org(selected_arg, org_row)
+        castaiApi.report_coalesced()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import subprocess
+import pandas as pd
+
+QUEUE_PATH = os.path.join("outputs", "_queue", "jobs.db")
+
+# report name -> script run for each job
+REPORTS = {
+    "details": "orgClusterDetails.py",
+    "cpu": "monthlyClusterCPUReport.py",
+    "savings": "monthlySavingsReport.py",
+    "woop": "woopSavingsReport.py",
+}
+
+LEASE_SECONDS = 300
+HEARTBEAT_SECONDS = 60
+POLL_SECONDS = 10
+MAX_ATTEMPTS = 3
+
+# -------------------------
+# Store
+# -------------------------
+def connect(path=QUEUE_PATH):
+    # The default rollback journal (not WAL) keeps the locking usable on shared filesystems.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            org TEXT NOT NULL,
+            report TEXT NOT NULL,
+            args TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            lease_until REAL,
+            enqueued_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            exit_code INTEGER
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)")
+    return conn
+
+def enqueue(conn, orgs, reports, args):
+    """Queue one job per (org, report); pairs already queued or running are skipped."""
+    added = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for org in orgs:
+            for report in reports:
+                exists = conn.execute(
+                    "SELECT 1 FROM jobs WHERE org = ? AND report = ? AND status IN ('queued', 'running')",
+                    (org, report)).fetchone()
+                if exists:
+                    continue
+                conn.execute(
+                    "INSERT INTO jobs (org, report, args, status, enqueued_at) VALUES (?, ?, ?, 'queued', ?)",
+                    (org, report, json.dumps(args), time.time()))
+                added += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return added
+
+def claim(conn, worker_id):
+    """
+    Lease the oldest queued job, or a running job whose worker stopped
+    heartbeating. Jobs that already used MAX_ATTEMPTS leases are failed
+    instead. Returns the job row as a dict, or None when nothing is claimable.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ? "
+            "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+            (now, now, MAX_ATTEMPTS))
+        # A report whose org's latest earlier details job failed would read a
+        # missing or stale cluster_details.csv; it fails with it, and
+        # requeue-failed queues both again in order.
+        dependents = conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ? "
+            "WHERE status = 'queued' AND report != 'details' "
+            "AND (SELECT d.status FROM jobs d WHERE d.org = jobs.org AND d.report = 'details' AND d.id < jobs.id "
+            "ORDER BY d.id DESC LIMIT 1) = 'failed'", (now,)).rowcount
+        # The other reports read cluster_details.csv, so they wait for an earlier details job of their org.
+        row = conn.execute(
+            "SELECT id, org, report, args, attempts FROM jobs "
+            "WHERE (status = 'queued' OR (status = 'running' AND lease_until < ?)) "
+            "AND NOT EXISTS (SELECT 1 FROM jobs d WHERE d.org = jobs.org AND d.report = 'details' "
+            "AND d.id < jobs.id AND d.status IN ('queued', 'running')) "
+            "ORDER BY id LIMIT 1", (now,)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            if dependents:
+                print(f"Failed {dependents} jobs whose organization's details job failed", flush=True)
+            return None
+        job_id, org, report, args, attempts = row
+        conn.execute(
+            "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, started_at = ? "
+            "WHERE id = ?", (worker_id, now + LEASE_SECONDS, now, job_id))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if dependents:
+        print(f"Failed {dependents} jobs whose organization's details job failed", flush=True)
+    if attempts:
+        print(f"Reclaimed job {job_id} ({report} for {org}) after an expired lease", flush=True)
+    return {"id": job_id, "org": org, "report": report, "args": json.loads(args), "attempt": attempts + 1}
+
+def heartbeat(conn, job_id, worker_id):
+    """Extend the lease; False when another worker has taken the job over."""
+    cur = conn.execute(
+        "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+        (time.time() + LEASE_SECONDS, job_id, worker_id))
+    return cur.rowcount == 1
+
+def finish(conn, job_id, worker_id, exit_code):
+    """Record the job's result; None when another worker has taken the job over."""
+    status = "done" if exit_code == 0 else "failed"
+    cur = conn.execute(
+        "UPDATE jobs SET status = ?, exit_code = ?, finished_at = ?, lease_until = NULL "
+        "WHERE id = ? AND worker = ?",
+        (status, exit_code, time.time(), job_id, worker_id))
+    return status if cur.rowcount == 1 else None
+
+# -------------------------
+# Worker
+# -------------------------
+def run_job(job, worker_id, queue_path):
+    """Run the report script for a job, heartbeating its lease until the script exits."""
+    script = REPORTS[job["report"]]
+    cmd = [sys.executable, script, job["org"]] + job["args"]
+    print(f"[{worker_id}] Job {job['id']} attempt {job['attempt']}: {' '.join(cmd)}", flush=True)
+    proc = subprocess.Popen(cmd)
+    stop = threading.Event()
+
+    def keep_lease():
+        # sqlite3 connections stay in the thread that opened them.
+        conn = connect(queue_path)
+        try:
+            while not stop.wait(HEARTBEAT_SECONDS):
+                if not heartbeat(conn, job["id"], worker_id):
+                    print(f"[{worker_id}] Lost the lease on job {job['id']}, stopping it", flush=True)
+                    proc.terminate()
+                    return
+        finally:
+            conn.close()
+
+    lease_thread = threading.Thread(target=keep_lease, daemon=True)
+    lease_thread.start()
+    try:
+        exit_code = proc.wait()
+    finally:
+        stop.set()
+        lease_thread.join()
+    return exit_code
+
+def work(queue_path, worker_id, exit_when_empty):
+    conn = connect(queue_path)
+    try:
+        while True:
+            job = claim(conn, worker_id)
+            if job is None:
+                if exit_when_empty:
+                    print(f"[{worker_id}] Queue is empty", flush=True)
+                    return
+                time.sleep(POLL_SECONDS)
+                continue
+            exit_code = run_job(job, worker_id, queue_path)
+            status = finish(conn, job["id"], worker_id, exit_code)
+            if status is None:
+                print(f"[{worker_id}] Job {job['id']} ({job['report']} for {job['org']}) lost its lease to another worker; result not recorded", flush=True)
+                continue
+            print(f"[{worker_id}] Job {job['id']} ({job['report']} for {job['org']}) {status}", flush=True)
+    finally:
+        conn.close()
+
+def status_frame(conn):
+    return pd.read_sql_query(
+        "SELECT id, org, report, status, attempts, worker, exit_code, "
+        "datetime(enqueued_at, 'unixepoch') AS enqueued, datetime(finished_at, 'unixepoch') AS finished "
+        "FROM jobs ORDER BY id", conn)
+
+def main():
+    parser = argparse.ArgumentParser(description="Work queue for running the reports of many organizations on several machines.")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="Path of the shared SQLite queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    enq = sub.add_parser("enqueue", help="Queue report jobs")
+    enq.add_argument("org", help="Organization name or 'all' (orgs.csv)")
+    enq.add_argument("--reports", default="details,savings", help=f"Comma separated: {', '.join(REPORTS)}")
+    enq.add_argument("--args", default="", help="Extra arguments for the scripts, e.g. \"on --resume\"")
+    worker = sub.add_parser("work", help="Claim and run jobs")
+    worker.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    worker.add_argument("--exit-when-empty", action="store_true", help="Stop instead of polling once the queue is empty")
+    sub.add_parser("status", help="List the jobs")
+    requeue = sub.add_parser("requeue-failed", help="Queue the failed jobs again")
+    requeue.add_argument("--org")
+    args = parser.parse_args()
+
+    if args.command == "work":
+        work(args.queue, args.worker_id, args.exit_when_empty)
+        return
+    conn = connect(args.queue)
+    try:
+        if args.command == "enqueue":
+            reports = [r.strip() for r in args.reports.split(",") if r.strip()]
+            unknown = [r for r in reports if r not in REPORTS]
+            if unknown:
+                print(f"Unknown reports: {', '.join(unknown)}. Choose from: {', '.join(REPORTS)}", flush=True)
+                sys.exit(1)
+            if args.org.lower() == "all":
+                try:
+                    orgs = pd.read_csv("orgs.csv")["org"].tolist()
+                except Exception as e:
+                    print(f"Error loading orgs.csv: {e}", flush=True)
+                    sys.exit(1)
+            else:
+                orgs = [args.org]
+            added = enqueue(conn, orgs, reports, args.args.split())
+            print(f"Queued {added} jobs in {args.queue}", flush=True)
+        elif args.command == "requeue-failed":
+            sql = "UPDATE jobs SET status = 'queued', attempts = 0, worker = NULL, exit_code = NULL WHERE status = 'failed'"
+            params = ()
+            if args.org:
+                sql += " AND org = ?"
+                params = (args.org,)
+            count = conn.execute(sql, params).rowcount
+            print(f"Requeued {count} jobs", flush=True)
+        else:
+            df = status_frame(conn)
+            if df.empty:
+                print("No jobs.", flush=True)
+                return
+            print(df.groupby("status").size().to_string())
+            print()
+            with pd.option_context("display.max_rows", None, "display.width", 200):
+                print(df.to_string(index=False))
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()